@@ -1,28 +1,203 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from jose import jwt, JWTError
-import requests
+from jose import jwt, jwk, JWTError
+import hashlib
+import json
+import logging
 import os
-from typing import Dict, Any
+import threading
+import time
+from typing import Dict, Any, Optional
+from backend.utils.cache import MISSING
+from backend.utils.monitoring import monitoring_service
+from backend.utils.metrics import registry, track_dependency
+from backend.utils.shared_cache import TieredCache, shared_cache_store
+from backend.utils.tracing import span
+from backend.utils.profiling import tag_user
+
+logger = logging.getLogger(__name__)
 
 security = HTTPBearer()
 
 SUPABASE_PROJECT_REF = os.getenv("SUPABASE_PROJECT_REF", "jzdikonmvsxtlheskhjl")
-JWKS_URL = f"https://{SUPABASE_PROJECT_REF}.supabase.co/auth/v1/.well-known/jwks.json"
+# Token issuer, and where its signing keys are published
+SUPABASE_AUTH_URL = os.getenv("SUPABASE_AUTH_URL", f"https://{SUPABASE_PROJECT_REF}.supabase.co/auth/v1")
+JWKS_URL = f"{SUPABASE_AUTH_URL}/.well-known/jwks.json"
+
+# JWKS loading: a local file (tests/benchmarks) takes precedence over the URL
+JWKS_FILE = os.getenv("JWKS_FILE")
+JWKS_TIMEOUT = float(os.getenv("JWKS_TIMEOUT", "5"))
+JWKS_REFRESH_INTERVAL = float(os.getenv("JWKS_REFRESH_INTERVAL", "3600"))
+JWKS_MIN_REFETCH_INTERVAL = float(os.getenv("JWKS_MIN_REFETCH_INTERVAL", "30"))
+
+class JWKSManager:
+    """Load, parse and periodically refresh the signing keys used to verify tokens.
+
+    Keys are fetched lazily on first use or by a background refresh thread, so
+    worker startup never waits on the network. A token signed with an unknown
+    kid triggers a refetch (at most once every min_refetch_interval seconds) to
+    pick up key rotations without a restart.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        file_path: Optional[str] = None,
+        timeout: float = JWKS_TIMEOUT,
+        refresh_interval: float = JWKS_REFRESH_INTERVAL,
+        min_refetch_interval: float = JWKS_MIN_REFETCH_INTERVAL,
+    ):
+        self.url = url
+        self.file_path = file_path
+        self.timeout = timeout
+        self.refresh_interval = refresh_interval
+        self.min_refetch_interval = min_refetch_interval
+        # kid -> parsed public key; replaced as a whole on every refresh
+        self._keys: Dict[str, Any] = {}
+        self._loaded = False
+        self._last_attempt: Optional[float] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _fetch(self) -> Dict[str, Any]:
+        if self.file_path:
+            with open(self.file_path) as f:
+                return json.load(f)
+        import requests
+        with track_dependency("jwks", "fetch"):
+            response = requests.get(self.url, timeout=self.timeout)
+            response.raise_for_status()
+            return response.json()
+
+    def _load_locked(self) -> bool:
+        self._last_attempt = time.monotonic()
+        try:
+            data = self._fetch()
+        except Exception as e:
+            logger.error(f"Error fetching JWKS: {e}")
+            return False
+
+        keys = {}
+        for key_data in data.get("keys", []):
+            kid = key_data.get("kid")
+            if not kid:
+                continue
+            try:
+                keys[kid] = jwk.construct(key_data, algorithm=key_data.get("alg", "RS256"))
+            except Exception as e:
+                logger.warning(f"Skipping JWKS key {kid}: {e}")
+
+        self._keys = keys
+        self._loaded = True
+        logger.info(f"JWKS loaded with {len(keys)} key(s)")
+        return True
+
+    def load(self) -> bool:
+        """Fetch the key set now, keeping the previous keys on failure."""
+        with self._lock:
+            return self._load_locked()
+
+    def _refetch_if_allowed(self):
+        with self._lock:
+            if self._last_attempt is not None:
+                if time.monotonic() - self._last_attempt < self.min_refetch_interval:
+                    return
+            self._load_locked()
+
+    def get_key(self, kid: str) -> Optional[Any]:
+        """Return the parsed public key for a key ID, or None if unknown."""
+        key = self._keys.get(kid)
+        if key is None:
+            # First use or a rotated key: refetch, rate limited
+            self._refetch_if_allowed()
+            key = self._keys.get(kid)
+        return key
+
+    def _run(self):
+        while not self._stop.is_set():
+            success = self.load()
+            # Retry failed loads sooner than the regular refresh
+            interval = self.refresh_interval if success else self.min_refetch_interval
+            self._stop.wait(interval)
+
+    def start(self):
+        """Start refreshing the keys in a background thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="jwks-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background refresh thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.timeout)
+            self._thread = None
 
-# Fetch JWKS once at startup
-try:
-    jwks = requests.get(JWKS_URL).json()
-except requests.RequestException as e:
-    print(f"Error fetching JWKS: {e}")
-    jwks = {"keys": []}
+# Global JWKS manager instance
+jwks_manager = JWKSManager(JWKS_URL, file_path=JWKS_FILE)
+
+# Verified claims keyed by token hash, kept until the token's exp
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+TOKEN_CACHE_MAX_TTL = float(os.getenv("TOKEN_CACHE_MAX_TTL", "3600"))
+
+token_cache = TieredCache(
+    "verified_token", maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_MAX_TTL, shared=shared_cache_store
+)
+
+class VerificationStats:
+    """Counters for full (uncached) token verifications."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total_seconds = 0.0
+
+    def record(self, seconds: float):
+        with self._lock:
+            self.count += 1
+            self.total_seconds += seconds
+
+    def average_ms(self) -> float:
+        return self.total_seconds / self.count * 1000 if self.count else 0.0
+
+verification_stats = VerificationStats()
+
+TOKEN_VERIFICATION_LATENCY = registry.histogram(
+    "fynace_token_verification_duration_seconds", "Full (uncached) JWT verification time.",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+
+def _token_cache_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def get_auth_cache_stats() -> Dict[str, Any]:
+    """Return token cache hit rate and verification timings."""
+    stats = token_cache.stats()
+    stats["verifications"] = verification_stats.count
+    stats["avg_verification_ms"] = verification_stats.average_ms()
+    return stats
 
 def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
 ) -> Dict[str, Any]:
-    token = credentials.credentials
+    with span("auth"):
+        user = _authenticate(credentials.credentials)
+    tag_user(user.get("id"))
+    return user
+
+def _authenticate(token: str) -> Dict[str, Any]:
+    """Validate a bearer token and return the user it belongs to."""
+    # Repeat requests with an already verified token skip the RSA check
+    cache_key = _token_cache_key(token)
+    cached = token_cache.get(cache_key)
+    if cached is not MISSING:
+        return dict(cached)
 
     try:
+        started = time.perf_counter()
         header = jwt.get_unverified_header(token)
         kid = header.get("kid")
 
@@ -32,8 +207,8 @@ def get_current_user(
                 detail="Token inválido - kid não encontrado",
             )
 
-        key = next((k for k in jwks["keys"] if k["kid"] == kid), None)
-        if not key:
+        key = jwks_manager.get_key(kid)
+        if key is None:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Token inválido - chave não encontrada",
@@ -44,7 +219,7 @@ def get_current_user(
             key,
             algorithms=["RS256"],
             audience="authenticated",
-            issuer=f"https://{SUPABASE_PROJECT_REF}.supabase.co/auth/v1"
+            issuer=SUPABASE_AUTH_URL
         )
 
         # Extract user ID and email from the JWT payload
@@ -59,8 +234,31 @@ def get_current_user(
             "email": email,
         }
 
-        return user_data
+        elapsed = time.perf_counter() - started
+        verification_stats.record(elapsed)
+        TOKEN_VERIFICATION_LATENCY.observe(elapsed)
+
+        # Cache the verified claims until the token expires
+        exp = payload.get("exp")
+        if exp:
+            ttl = min(float(exp) - time.time(), TOKEN_CACHE_MAX_TTL)
+            if ttl > 0:
+                token_cache.set(cache_key, user_data, ttl=ttl)
+
+        monitoring_service.log_auth_event(
+            user_id=user_id,
+            event_type="token_verified",
+            success=True,
+            details={
+                "verification_ms": round(elapsed * 1000, 3),
+                "cache_hit_rate": round(token_cache.stats()["hit_rate"], 4),
+            }
+        )
+
+        return dict(user_data)
 
+    except HTTPException:
+        raise
     except JWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -1,5 +1,8 @@
 import os
 
+# Variables the backend cannot run without; checked by validate_config()
+REQUIRED_ENV_VARS = ["SUPABASE_URL", "SUPABASE_ANON_KEY", "SUPABASE_JWT_SECRET"]
+
 
 def get_env_or_raise(name: str) -> str:
     value = os.getenv(name)
@@ -8,10 +11,17 @@ def get_env_or_raise(name: str) -> str:
     return value
 
 
-SUPABASE_URL = get_env_or_raise("SUPABASE_URL")
-SUPABASE_ANON_KEY = get_env_or_raise("SUPABASE_ANON_KEY")
-SUPABASE_JWT_SECRET = get_env_or_raise("SUPABASE_JWT_SECRET")
+def validate_config():
+    """Fail fast on missing configuration. Called once at application startup."""
+    for name in REQUIRED_ENV_VARS:
+        get_env_or_raise(name)
+
+
+# Reading the environment has no side effects; validation happens at startup
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_ANON_KEY = os.getenv("SUPABASE_ANON_KEY")
+SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
 
 # Mercado Pago token
 MERCADOPAGO_ACCESS_TOKEN = os.getenv("MERCADOPAGO_ACCESS_TOKEN")  #Not required for core functionality
-FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:8501")
\ No newline at end of file
+FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:8501")
@@ -4,16 +4,10 @@ from typing import List
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
 import logging
 
 logger = logging.getLogger(__name__)
 
-# Rate limiting
-limiter = Limiter(key_func=get_remote_address)
-
 def setup_security_headers(app: FastAPI):
     """Setup security-related configurations for the FastAPI app."""
     
@@ -27,7 +21,7 @@ def setup_security_headers(app: FastAPI):
         allow_methods=["*"],
         allow_headers=["*"],
         # Don't expose sensitive headers
-        expose_headers=["X-Process-Time"]
+        expose_headers=["X-Process-Time", "Server-Timing", "X-Fynace-Profile-Id", "Retry-After"]
     )
     
     # Trusted host middleware to prevent HTTP Host Header attacks
@@ -35,9 +29,15 @@ def setup_security_headers(app: FastAPI):
     app.add_middleware(TrustedHostMiddleware, allowed_hosts=allowed_hosts)
 
 def setup_rate_limiting(app: FastAPI):
-    """Setup rate limiting for the application."""
-    app.state.limiter = limiter
-    app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+    """Enable the per-user rate limiters declared on the routes."""
+    from backend.utils.rate_limit import configure_rate_limiting
+
+    config = get_security_config()
+    configure_rate_limiting(
+        enabled=config["RATE_LIMIT_ENABLED"],
+        backend=config["RATE_LIMIT_BACKEND"],
+        sqlite_path=config["RATE_LIMIT_SQLITE_PATH"],
+    )
 
 def get_security_config():
     """Get security configuration values."""
@@ -50,7 +50,11 @@ def get_security_config():
         "SECURE_BROWSER_XSS_FILTER": os.getenv("SECURE_BROWSER_XSS_FILTER", "true").lower() == "true",
         "SECURE_CROSS_ORIGIN_EMBEDDER_POLICY": os.getenv("SECURE_CROSS_ORIGIN_EMBEDDER_POLICY", "require-corp"),
         
-        # Rate limiting
+        # Rate limiting (per user; windows in memory or in a SQLite file shared by workers)
+        "RATE_LIMIT_ENABLED": os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true",
+        "RATE_LIMIT_BACKEND": os.getenv("RATE_LIMIT_BACKEND", "memory"),
+        "RATE_LIMIT_SQLITE_PATH": os.getenv("RATE_LIMIT_SQLITE_PATH"),
+        "RATE_LIMIT_SHEETS_READ": os.getenv("RATE_LIMIT_SHEETS_READ", "60/minute"),
         "RATE_LIMIT_DEFAULT": os.getenv("RATE_LIMIT_DEFAULT", "100/hour"),
         "RATE_LIMIT_TRANSACTIONS": os.getenv("RATE_LIMIT_TRANSACTIONS", "10/minute"),
         "RATE_LIMIT_AUTH": os.getenv("RATE_LIMIT_AUTH", "5/minute"),
@@ -64,10 +68,10 @@ def get_security_config():
         "LOG_SENSITIVE_DATA": os.getenv("LOG_SENSITIVE_DATA", "false").lower() == "true",
     }
 
-# Example of how to apply rate limiting to specific routes
-# This would be used in route definitions:
-# 
-# @limiter.limit("10/minute")
-# @app.get("/api/transactions")
-# def get_transactions(request: Request):
-#     ...
\ No newline at end of file
+# Routes that call Google Sheets declare a limiter as a route dependency, so it
+# runs before the spreadsheet is resolved. A route making n Sheets calls per
+# request uses sheets_read_limit.costing(n) instead:
+#
+# @router.get("/", dependencies=[Depends(sheets_read_limit)])
+# def get_transacoes(...):
+#     ...
@@ -1,34 +1,97 @@
 """Database service for interacting with Supabase."""
 import os
 import logging
-from typing import Optional, Dict, Any
-from supabase import create_client, Client
-from backend.config import SUPABASE_URL, SUPABASE_ANON_KEY
+import threading
+from typing import Optional, Dict, Any, TYPE_CHECKING
+from backend import config
+from backend.utils.cache import MISSING
+from backend.utils.metrics import track_dependency
+from backend.utils.shared_cache import TieredCache, shared_cache_store
+
+if TYPE_CHECKING:
+    from supabase import Client
 
 logger = logging.getLogger(__name__)
 
-def get_supabase_client() -> Client:
-    """Get a Supabase client instance."""
-    try:
-        client = create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
-        return client
-    except Exception as e:
-        logger.error(f"Error initializing Supabase client: {e}")
-        raise
+# Cache of user ID -> spreadsheet ID. Missing profiles are cached as None
+# with a shorter TTL so a freshly provisioned user is picked up quickly.
+SPREADSHEET_ID_CACHE_TTL = float(os.getenv("SPREADSHEET_ID_CACHE_TTL", "3600"))
+SPREADSHEET_ID_NEGATIVE_TTL = float(os.getenv("SPREADSHEET_ID_NEGATIVE_TTL", "30"))
+SPREADSHEET_ID_CACHE_SIZE = int(os.getenv("SPREADSHEET_ID_CACHE_SIZE", "10000"))
+
+spreadsheet_id_cache = TieredCache(
+    "spreadsheet_id",
+    maxsize=SPREADSHEET_ID_CACHE_SIZE,
+    ttl=SPREADSHEET_ID_CACHE_TTL,
+    shared=shared_cache_store,
+)
+
+# Connection pool settings for the shared Supabase HTTP client
+SUPABASE_MAX_CONNECTIONS = int(os.getenv("SUPABASE_MAX_CONNECTIONS", "20"))
+SUPABASE_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("SUPABASE_MAX_KEEPALIVE_CONNECTIONS", "10"))
+SUPABASE_KEEPALIVE_EXPIRY = float(os.getenv("SUPABASE_KEEPALIVE_EXPIRY", "60"))
+SUPABASE_TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT", "10"))
+SUPABASE_HTTP2 = os.getenv("SUPABASE_HTTP2", "true").lower() == "true"
+
+_supabase_client: Optional["Client"] = None
+_supabase_lock = threading.Lock()
+
+def create_supabase_client() -> "Client":
+    """Create a Supabase client backed by a keep-alive connection pool."""
+    # Imported here to keep the SDK off the worker's startup path
+    import httpx
+    from supabase import create_client, ClientOptions
+
+    http_client = httpx.Client(
+        limits=httpx.Limits(
+            max_connections=SUPABASE_MAX_CONNECTIONS,
+            max_keepalive_connections=SUPABASE_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=SUPABASE_KEEPALIVE_EXPIRY,
+        ),
+        timeout=SUPABASE_TIMEOUT,
+        http2=SUPABASE_HTTP2,
+        follow_redirects=True,
+    )
+    options = ClientOptions(httpx_client=http_client)
+    return create_client(config.SUPABASE_URL, config.SUPABASE_ANON_KEY, options=options)
+
+def init_supabase_client() -> "Client":
+    """Initialize the shared Supabase client for this worker."""
+    global _supabase_client
+    with _supabase_lock:
+        if _supabase_client is None:
+            try:
+                _supabase_client = create_supabase_client()
+                logger.info("Supabase client initialized successfully")
+            except Exception as e:
+                logger.error(f"Error initializing Supabase client: {e}")
+                raise
+        return _supabase_client
+
+def close_supabase_client():
+    """Close the shared Supabase client and its connection pool."""
+    global _supabase_client
+    with _supabase_lock:
+        if _supabase_client is not None:
+            _supabase_client.options.httpx_client.close()
+            _supabase_client = None
+
+def get_supabase_client() -> "Client":
+    """Get the shared Supabase client instance."""
+    # Normally created by the app lifespan; scripts get it lazily
+    if _supabase_client is None:
+        return init_supabase_client()
+    return _supabase_client
 
 class DatabaseService:
-    def __init__(self):
-        try:
-            self.supabase: Client = create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
-            logger.info("Supabase client initialized successfully")
-        except Exception as e:
-            logger.error(f"Error initializing Supabase client: {e}")
-            raise
+    def __init__(self, supabase: Optional["Client"] = None):
+        self.supabase: "Client" = supabase or get_supabase_client()
 
     def get_user_profile(self, user_id: str) -> Optional[Dict[str, Any]]:
         """Get user profile from the database."""
         try:
-            response = self.supabase.table("user_profiles").select("*").eq("id", user_id).single().execute()
+            with track_dependency("supabase", "get_profile"):
+                response = self.supabase.table("user_profiles").select("*").eq("id", user_id).single().execute()
             return response.data if response.data else None
         except Exception as e:
             logger.error(f"Error getting user profile: {e}")
@@ -37,7 +100,10 @@ class DatabaseService:
     def update_user_profile(self, user_id: str, updates: Dict[str, Any]) -> bool:
         """Update user profile in the database."""
         try:
-            response = self.supabase.table("user_profiles").update(updates).eq("id", user_id).execute()
+            with track_dependency("supabase", "update_profile"):
+                response = self.supabase.table("user_profiles").update(updates).eq("id", user_id).execute()
+            if "spreadsheet_id" in updates:
+                spreadsheet_id_cache.invalidate(user_id)
             return len(response.data) > 0
         except Exception as e:
             logger.error(f"Error updating user profile: {e}")
@@ -47,18 +113,64 @@ class DatabaseService:
         """Save Google Sheets spreadsheet ID for a user."""
         try:
             updates = {"spreadsheet_id": spreadsheet_id}
-            return self.update_user_profile(user_id, updates)
+            success = self.update_user_profile(user_id, updates)
+            if success:
+                spreadsheet_id_cache.set(user_id, spreadsheet_id)
+            return success
         except Exception as e:
             logger.error(f"Error saving spreadsheet ID: {e}")
             return False
 
-    def get_spreadsheet_id(self, user_id: str) -> Optional[str]:
-        """Get Google Sheets spreadsheet ID for a user."""
+    def claim_spreadsheet_id(self, user_id: str, spreadsheet_id: str) -> Optional[str]:
+        """Save a spreadsheet ID only if the user has none yet.
+
+        Returns the spreadsheet ID the user ends up with, which is the one saved
+        by a concurrent request (possibly in another worker) if it got there
+        first, or None if the profile could not be updated.
+        """
         try:
-            profile = self.get_user_profile(user_id)
-            if profile:
-                return profile.get("spreadsheet_id")
+            with track_dependency("supabase", "claim_spreadsheet_id"):
+                response = (
+                    self.supabase.table("user_profiles")
+                    .update({"spreadsheet_id": spreadsheet_id})
+                    .eq("id", user_id)
+                    # Profiles created with an empty string count as unset too
+                    .or_("spreadsheet_id.is.null,spreadsheet_id.eq.")
+                    .execute()
+                )
+        except Exception as e:
+            logger.error(f"Error claiming spreadsheet ID: {e}")
             return None
+
+        if response.data:
+            spreadsheet_id_cache.set(user_id, spreadsheet_id)
+            return spreadsheet_id
+        return self.get_spreadsheet_id(user_id, refresh=True)
+
+    def get_spreadsheet_id(self, user_id: str, refresh: bool = False) -> Optional[str]:
+        """Get Google Sheets spreadsheet ID for a user."""
+        if not refresh:
+            cached = spreadsheet_id_cache.get(user_id)
+            if cached is not MISSING:
+                return cached
+
+        try:
+            with track_dependency("supabase", "get_spreadsheet_id"):
+                response = (
+                    self.supabase.table("user_profiles")
+                    .select("spreadsheet_id")
+                    .eq("id", user_id)
+                    .limit(1)
+                    .execute()
+                )
         except Exception as e:
+            # Don't cache lookup failures, only confirmed results
             logger.error(f"Error getting spreadsheet ID: {e}")
-            return None
\ No newline at end of file
+            return None
+
+        spreadsheet_id = (response.data[0].get("spreadsheet_id") if response.data else None) or None
+        if spreadsheet_id:
+            spreadsheet_id_cache.set(user_id, spreadsheet_id)
+        else:
+            spreadsheet_id_cache.set(user_id, None, ttl=SPREADSHEET_ID_NEGATIVE_TTL)
+        return spreadsheet_id
\ No newline at end of file
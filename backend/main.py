@@ -1,10 +1,13 @@
 from fastapi import FastAPI, Depends, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
+from contextlib import asynccontextmanager
 from backend.utils.logging import setup_logging
 from backend.utils.monitoring import monitoring_service
+from backend.utils.metrics import registry as metrics_registry
+from backend.utils.middleware import RequestMonitoringMiddleware
 from backend.config_modules.security_config import setup_security_headers, setup_rate_limiting, get_security_config
-import time
 import logging
+import threading
 import os
 from dotenv import load_dotenv
 
@@ -12,11 +15,41 @@ load_dotenv()
 # Setup logging before creating the app
 setup_logging()
 
-from backend.routes import transacoes, resumo, pagamentos
-from backend.auth_utils import get_current_user
+from backend.routes import transacoes, resumo, dashboard, eventos, pagamentos
+from backend.auth_utils import get_current_user, jwks_manager
+from backend.database.database_service import init_supabase_client, close_supabase_client
+from backend.payments.mercado_pago_service import close_mercado_pago_service
+from backend.payments.webhook_queue import webhook_queue
+from backend.services.ledger_sync import ledger_sync
+from backend.config import validate_config
 
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create long-lived clients on startup and release them on shutdown."""
+    validate_config()
+    # Write monitoring events from a background thread from now on
+    monitoring_service.start()
+    metrics_registry.start()
+    # One Supabase client (and connection pool) per worker process, created
+    # off the startup path so the SDK import doesn't delay the first request
+    threading.Thread(target=init_supabase_client, name="supabase-init", daemon=True).start()
+    # Load signing keys in the background instead of blocking startup
+    jwks_manager.start()
+    # Process queued payment notifications in the background
+    webhook_queue.start()
+    # Push ledger changes made outside this worker to open event streams
+    ledger_sync.start()
+    yield
+    ledger_sync.stop()
+    webhook_queue.stop()
+    jwks_manager.stop()
+    close_supabase_client()
+    close_mercado_pago_service()
+    monitoring_service.stop()
+    metrics_registry.stop()
+
 # Create FastAPI app with security considerations
 app = FastAPI(
     title=os.getenv("APP_NAME", "Fynace"),
@@ -25,71 +58,16 @@ app = FastAPI(
     # Don't expose sensitive information in docs in production
     docs_url="/docs" if os.getenv("ENVIRONMENT") != "production" else None,
     redoc_url="/redoc" if os.getenv("ENVIRONMENT") != "production" else None,
+    lifespan=lifespan,
 )
 
 # Setup security configurations
 setup_security_headers(app)
-# setup_rate_limiting(app)  # Uncomment when slowapi is installed
-
-# Add middleware for request logging and monitoring
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    start_time = time.time()
-
-    # Get user ID if available (from JWT token)
-    user_id = "unknown"
-    try:
-        # Try to extract user ID from the authorization header
-        auth_header = request.headers.get("authorization")
-        if auth_header and auth_header.startswith("Bearer "):
-            # In a real implementation, you would decode the JWT to get the user ID
-            # For now, we'll just log that there's an auth header
-            user_id = "authenticated_user"
-    except:
-        pass
-
-    # Log the incoming request
-    monitoring_service.log_api_call(
-        user_id=user_id,
-        endpoint=request.url.path,
-        method=request.method,
-        success=True,
-        details={
-            "client_host": request.client.host,
-            "user_agent": request.headers.get("user-agent", "unknown"),
-            "content_type": request.headers.get("content-type", "unknown")
-        }
-    )
-
-    response = await call_next(request)
+# Per-user limits on routes that spend the shared Google Sheets quota
+setup_rate_limiting(app)
 
-    process_time = time.time() - start_time
-
-    # Add process time to response headers
-    response.headers["X-Process-Time"] = str(process_time)
-
-    # Apply security headers to response
-    from backend.utils.security import SecurityMiddleware
-    response = SecurityMiddleware.add_security_headers(response)
-
-    # Log the response
-    from backend.utils.monitoring import MonitoringEvent
-    from datetime import datetime
-    monitoring_service.log_event(
-        MonitoringEvent(
-            timestamp=datetime.now(),
-            event_type="api_response",
-            user_id=user_id,
-            action=f"{request.method} {request.url.path}",
-            details={
-                "status_code": response.status_code,
-                "process_time": process_time
-            },
-            success=response.status_code < 400
-        )
-    )
-
-    return response
+# Request logging, timing and security headers (outermost middleware)
+app.add_middleware(RequestMonitoringMiddleware)
 
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
@@ -120,12 +98,23 @@ async def global_exception_handler(request: Request, exc: Exception):
 
 app.include_router(transacoes.router, prefix="/transacoes", tags=["Transações"])
 app.include_router(resumo.router, prefix="/resumo", tags=["Resumo"])
+app.include_router(dashboard.router, prefix="/dashboard", tags=["Dashboard"])
+app.include_router(eventos.router, prefix="/eventos", tags=["Eventos"])
 app.include_router(pagamentos.router)
 
 @app.get("/saudez")
 def health():
     return {"status": "ok"}
 
+@app.get("/metrics", include_in_schema=False)
+def metrics(request: Request):
+    """Expose metrics in the Prometheus text exposition format."""
+    # Optional shared secret so metrics aren't public on the internet
+    metrics_token = os.getenv("METRICS_TOKEN")
+    if metrics_token and request.headers.get("authorization") != f"Bearer {metrics_token}":
+        return JSONResponse(status_code=401, content={"detail": "Não autorizado"})
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/me")
 def me(user=Depends(get_current_user)):
     return user
@@ -0,0 +1,75 @@
+"""Pooled HTTP transport for the Mercado Pago SDK.
+
+The SDK's default HttpClient opens a new requests.Session, and so a new
+TCP/TLS connection, for every call. This client keeps one session per retry
+policy and reuses its keep-alive connections. It imports the SDK, so it is
+only imported when the Mercado Pago client is first created.
+"""
+import threading
+from typing import Any, Dict, Optional, Tuple
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+from mercadopago.errors.exceptions import MPServerError
+from mercadopago.http import HttpClient
+
+# Status codes the SDK retries by default
+DEFAULT_RETRY_ON = (429, 500, 502, 503, 504)
+
+# Root of every URL the SDK builds
+SDK_API_URL = "https://api.mercadopago.com"
+
+class PooledHttpClient(HttpClient):
+    """HttpClient reusing keep-alive connections across calls and threads."""
+
+    def __init__(self, pool_maxsize: int = 10, base_url: Optional[str] = None):
+        self.pool_maxsize = pool_maxsize
+        # Sends the SDK's calls to another API root instead
+        self.base_url = base_url.rstrip("/") if base_url else None
+        self._sessions: Dict[Tuple, requests.Session] = {}
+        self._lock = threading.Lock()
+
+    def _session(self, maxretries: Optional[int], retry_on, backoff_factor: Optional[float]) -> requests.Session:
+        # The SDK passes the same retry policy on every call, so this is one session in practice
+        key = (maxretries, tuple(retry_on) if retry_on is not None else None, backoff_factor)
+        session = self._sessions.get(key)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(key)
+                if session is None:
+                    retry = Retry(
+                        total=maxretries,
+                        status_forcelist=retry_on if retry_on is not None else DEFAULT_RETRY_ON,
+                        backoff_factor=backoff_factor or 0,
+                    )
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize, max_retries=retry)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._sessions[key] = session
+        return session
+
+    def request(self, method, url, maxretries=None, **kwargs) -> Dict[str, Any]:
+        retry_on = kwargs.pop("retry_on", None)
+        backoff_factor = kwargs.pop("backoff_factor", None)
+        if self.base_url and url.startswith(SDK_API_URL):
+            url = self.base_url + url[len(SDK_API_URL):]
+        api_result = self._session(maxretries, retry_on, backoff_factor).request(method, url, **kwargs)
+        response = {"status": api_result.status_code, "response": None}
+        if api_result.status_code != 204 and api_result.content:
+            try:
+                response["response"] = api_result.json()
+            except ValueError as exc:
+                # As the SDK's client does: e.g. a proxy's HTML error page
+                raise MPServerError(
+                    api_result.status_code,
+                    {"message": "Invalid JSON in response body", "error": "invalid_response"},
+                ) from exc
+        return response
+
+    def close(self):
+        """Close every pooled connection."""
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
@@ -1,16 +1,39 @@
-import mercadopago
 import os
-from typing import Dict, Any
+import logging
+import threading
+from typing import Dict, Any, Optional
 from dotenv import load_dotenv
+from backend.utils.metrics import track_dependency
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Connection pool and timeout for calls to the Mercado Pago API
+MERCADOPAGO_POOL_SIZE = int(os.getenv("MERCADOPAGO_POOL_SIZE", "10"))
+MERCADOPAGO_TIMEOUT = float(os.getenv("MERCADOPAGO_TIMEOUT", "10"))
+# Alternative API root, e.g. a local stand-in for benchmarks
+MERCADOPAGO_API_URL = os.getenv("MERCADOPAGO_API_URL")
+
 class MercadoPagoService:
     def __init__(self):
         self.access_token = os.getenv("MERCADOPAGO_ACCESS_TOKEN")
         if not self.access_token:
             raise ValueError("MERCADOPAGO_ACCESS_TOKEN environment variable is required")
-        self.sdk = mercadopago.SDK(self.access_token)
+        # Imported on first use to keep the SDK off the startup path
+        import mercadopago
+        from mercadopago.config import RequestOptions
+        from backend.payments.http_client import PooledHttpClient
+        self.http_client = PooledHttpClient(pool_maxsize=MERCADOPAGO_POOL_SIZE, base_url=MERCADOPAGO_API_URL)
+        self.sdk = mercadopago.SDK(
+            self.access_token,
+            http_client=self.http_client,
+            request_options=RequestOptions(connection_timeout=MERCADOPAGO_TIMEOUT),
+        )
+
+    def close(self):
+        """Close the pooled connections to the Mercado Pago API."""
+        self.http_client.close()
 
     def create_preference(self, payment_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -39,7 +62,8 @@ class MercadoPagoService:
                 "notification_url": f"{os.getenv('BASE_URL', 'http://localhost:8000')}/pagamentos/webhook"
             }
             
-            preference_response = self.sdk.preference().create(preference_data)
+            with track_dependency("mercadopago", "create_preference"):
+                preference_response = self.sdk.preference().create(preference_data)
             return preference_response["response"]
         except Exception as e:
             raise Exception(f"Error creating Mercado Pago preference: {str(e)}")
@@ -49,11 +73,23 @@ class MercadoPagoService:
         Get payment status by payment ID
         """
         try:
-            payment_response = self.sdk.payment().get(payment_id)
+            with track_dependency("mercadopago", "get_payment"):
+                payment_response = self.sdk.payment().get(payment_id)
             return payment_response["response"]
         except Exception as e:
             raise Exception(f"Error getting payment status: {str(e)}")
 
+    def search_payments(self, filters: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Search payments; returns {"paging": {...}, "results": [...]}
+        """
+        try:
+            with track_dependency("mercadopago", "search_payments"):
+                search_response = self.sdk.payment().search(filters)
+            return search_response["response"]
+        except Exception as e:
+            raise Exception(f"Error searching payments: {str(e)}")
+
     def validate_webhook(self, topic: str, resource_id: str) -> Dict[str, Any]:
         """
         Validate webhook notification from Mercado Pago
@@ -65,4 +101,25 @@ class MercadoPagoService:
             else:
                 raise Exception(f"Unsupported topic: {topic}")
         except Exception as e:
-            raise Exception(f"Error validating webhook: {str(e)}")
\ No newline at end of file
+            raise Exception(f"Error validating webhook: {str(e)}")
+
+_mercado_pago_service: Optional[MercadoPagoService] = None
+_mercado_pago_lock = threading.Lock()
+
+def get_mercado_pago_service() -> MercadoPagoService:
+    """Get the Mercado Pago client shared by every request of this worker."""
+    global _mercado_pago_service
+    if _mercado_pago_service is None:
+        with _mercado_pago_lock:
+            if _mercado_pago_service is None:
+                _mercado_pago_service = MercadoPagoService()
+                logger.info("Mercado Pago client initialized successfully")
+    return _mercado_pago_service
+
+def close_mercado_pago_service():
+    """Close the shared Mercado Pago client, if it was created."""
+    global _mercado_pago_service
+    with _mercado_pago_lock:
+        if _mercado_pago_service is not None:
+            _mercado_pago_service.close()
+            _mercado_pago_service = None
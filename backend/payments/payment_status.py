@@ -0,0 +1,183 @@
+"""Local store of Mercado Pago payment statuses.
+
+Statuses are recorded by the webhook workers and by status lookups, in a
+SQLite file shared by the worker processes of the host. Once a payment
+reaches a final status it is answered from the store without calling
+Mercado Pago again; other statuses are looked up again at most once every
+PAYMENT_STATUS_TTL seconds, however many clients are polling.
+"""
+import asyncio
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, Optional, Set, Tuple
+from fastapi import HTTPException, status
+from backend.utils.locks import KeyedLock
+from backend.utils.metrics import registry, track_dependency
+from backend.utils.sqlite import SQLiteDatabase
+
+logger = logging.getLogger(__name__)
+
+PAYMENT_STATUS_PATH = os.getenv("PAYMENT_STATUS_PATH", "data/payment_status.db")
+PAYMENT_STATUS_TTL = float(os.getenv("PAYMENT_STATUS_TTL", "10"))
+
+# Statuses Mercado Pago never changes again
+FINAL_STATUSES = {"approved", "rejected", "cancelled", "refunded", "charged_back"}
+
+STATUS_LOOKUPS = registry.counter(
+    "fynace_payment_status_lookups_total", "Payment status reads, by where the answer came from.", ["source"]
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS payment_status (
+    payment_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    external_reference TEXT,
+    checked_at REAL NOT NULL,
+    changed_at REAL NOT NULL
+);
+"""
+
+_UUID_PREFIX = re.compile(r"^([0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12})(?:-|$)")
+
+def user_id_from_reference(external_reference: str) -> str:
+    """Extract the user ID from an external_reference ("<user_id>-<reference>").
+
+    Supabase user IDs are UUIDs, which contain dashes themselves.
+    """
+    match = _UUID_PREFIX.match(external_reference)
+    if match:
+        return match.group(1)
+    return external_reference.split('-')[0] if '-' in external_reference else external_reference
+
+def plan_for_status(payment_status: str) -> str:
+    return 'premium' if payment_status == 'approved' else 'free'
+
+class PaymentStatusStore:
+    """Payment statuses by payment ID, with change notifications for long polls."""
+
+    def __init__(self, path: str):
+        self.db = SQLiteDatabase(path, _SCHEMA)
+        # payment ID -> events of requests in this process waiting for a change
+        self._listeners: Dict[str, Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]]] = {}
+        self._listeners_lock = threading.Lock()
+
+    def get(self, payment_id: str) -> Optional[Dict[str, Any]]:
+        row = self.db.connect().execute(
+            "SELECT payment_id, user_id, status, external_reference, checked_at, changed_at "
+            "FROM payment_status WHERE payment_id = ?",
+            (payment_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        keys = ("payment_id", "user_id", "status", "external_reference", "checked_at", "changed_at")
+        return dict(zip(keys, row))
+
+    def put(self, payment_id: str, user_id: str, payment_status: str, external_reference: Optional[str]) -> bool:
+        """Record a status just read from Mercado Pago; return True if it changed."""
+        now = time.time()
+        with self.db.transaction() as conn:
+            row = conn.execute("SELECT status FROM payment_status WHERE payment_id = ?", (payment_id,)).fetchone()
+            changed = row is None or row[0] != payment_status
+            conn.execute(
+                "INSERT INTO payment_status (payment_id, user_id, status, external_reference, checked_at, changed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (payment_id) DO UPDATE SET "
+                "status = excluded.status, external_reference = excluded.external_reference, "
+                "checked_at = excluded.checked_at, "
+                "changed_at = CASE WHEN status = excluded.status THEN changed_at ELSE excluded.changed_at END",
+                (payment_id, user_id, payment_status, external_reference, now, now),
+            )
+        if changed:
+            self._notify(payment_id)
+        return changed
+
+    def _notify(self, payment_id: str):
+        with self._listeners_lock:
+            listeners = list(self._listeners.get(payment_id, ()))
+        for loop, event in listeners:
+            loop.call_soon_threadsafe(event.set)
+
+    async def wait_for_change(self, payment_id: str, timeout: float) -> bool:
+        """Wait until this process records a new status for the payment."""
+        listener = (asyncio.get_running_loop(), asyncio.Event())
+        with self._listeners_lock:
+            self._listeners.setdefault(payment_id, set()).add(listener)
+        try:
+            await asyncio.wait_for(listener[1].wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._listeners_lock:
+                listeners = self._listeners.get(payment_id)
+                if listeners is not None:
+                    listeners.discard(listener)
+                    if not listeners:
+                        del self._listeners[payment_id]
+
+# Global store shared by the routes and the webhook workers
+payment_status_store = PaymentStatusStore(PAYMENT_STATUS_PATH)
+
+_lookup_locks = KeyedLock()
+
+def resolve_payment_status(payment_id: str, user_id: str, mercado_pago_service, supabase) -> Dict[str, Any]:
+    """Return a payment's status for its owner, calling Mercado Pago only when needed."""
+    entry = payment_status_store.get(payment_id)
+    if entry is not None:
+        _check_owner(entry["user_id"], user_id)
+    if not _is_fresh(entry):
+        # Concurrent polls of the same payment share one lookup
+        with _lookup_locks.acquire(payment_id):
+            entry = payment_status_store.get(payment_id)
+            if not _is_fresh(entry):
+                entry = _lookup(payment_id, user_id, mercado_pago_service, supabase)
+                STATUS_LOOKUPS.inc(source="mercadopago")
+            else:
+                STATUS_LOOKUPS.inc(source="store")
+    else:
+        STATUS_LOOKUPS.inc(source="store")
+
+    return {
+        "payment_id": payment_id,
+        "status": entry["status"],
+        "plan": plan_for_status(entry["status"]),
+        "external_reference": entry["external_reference"],
+    }
+
+def _check_owner(owner_id: str, user_id: str):
+    """Verify that a payment belongs to the current user."""
+    if owner_id != user_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You don't have permission to access this payment"
+        )
+
+def _is_fresh(entry: Optional[Dict[str, Any]]) -> bool:
+    if entry is None:
+        return False
+    return entry["status"] in FINAL_STATUSES or time.time() - entry["checked_at"] < PAYMENT_STATUS_TTL
+
+def _lookup(payment_id: str, user_id: str, mercado_pago_service, supabase) -> Dict[str, Any]:
+    payment_info = mercado_pago_service.get_payment_status(payment_id)
+    external_reference = payment_info.get('external_reference', '')
+    owner_id = user_id_from_reference(external_reference)
+    # Nothing is recorded for a payment polled by someone else
+    _check_owner(owner_id, user_id)
+    payment_status = payment_info.get('status', 'pending')
+
+    previous = payment_status_store.get(payment_id)
+    if previous is None or previous["status"] != payment_status:
+        # Only write the profile when the status actually moved. It is written
+        # before the store: a final status in the store is never looked up
+        # again, so a failed write must leave the lookup to be retried
+        with track_dependency("supabase", "update_payment"):
+            supabase.table('user_profiles').update({
+                'plano': plan_for_status(payment_status),
+                'pagamento_status': payment_status,
+                'updated_at': 'now()'
+            }).eq('user_id', owner_id).execute()
+    payment_status_store.put(payment_id, owner_id, payment_status, external_reference)
+    return payment_status_store.get(payment_id)
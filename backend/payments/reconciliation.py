@@ -0,0 +1,174 @@
+"""Reconcile payments whose webhook was missed.
+
+Profiles left at pagamento_status 'initiated' (or another non-final status)
+are matched against the payments Mercado Pago has for their users and
+updated in bulk:
+
+1. Search Mercado Pago for every payment updated in the lookback window,
+   fetching result pages concurrently (at most --concurrency calls at once),
+   and keep the most relevant payment per user (parsed from external_reference).
+2. Page through pending profiles by user_id and upsert the changed ones, one
+   request per page.
+
+Usage:
+    python -m backend.payments.reconciliation --lookback-days 30 --concurrency 4 --dry-run
+"""
+import argparse
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional
+from backend.payments.payment_status import FINAL_STATUSES, payment_status_store, plan_for_status, user_id_from_reference
+from backend.utils.metrics import track_dependency
+
+logger = logging.getLogger(__name__)
+
+RECONCILE_LOOKBACK_DAYS = int(os.getenv("RECONCILE_LOOKBACK_DAYS", "30"))
+RECONCILE_CONCURRENCY = int(os.getenv("RECONCILE_CONCURRENCY", "4"))
+RECONCILE_PAGE_SIZE = int(os.getenv("RECONCILE_PAGE_SIZE", "500"))
+
+# Profile statuses still waiting for a final answer
+PENDING_PROFILE_STATUSES = ["initiated", "pending", "in_process", "authorized", "in_mediation"]
+
+# Largest page the payments search returns
+SEARCH_PAGE_LIMIT = 100
+
+def _rank(payment: Dict[str, Any]) -> tuple:
+    # An approved payment wins; otherwise the most recently updated one
+    return (payment.get("status") == "approved", payment.get("date_last_updated") or "")
+
+class PaymentReconciler:
+    """Bring pending user profiles in line with Mercado Pago."""
+
+    def __init__(self, supabase, mercado_pago_service, concurrency: int = RECONCILE_CONCURRENCY,
+                 page_size: int = RECONCILE_PAGE_SIZE, dry_run: bool = False):
+        self.supabase = supabase
+        self.mercado_pago_service = mercado_pago_service
+        self.concurrency = concurrency
+        self.page_size = page_size
+        self.dry_run = dry_run
+        self.stats: Dict[str, Any] = {
+            "search_calls": 0, "payments_seen": 0, "profiles_scanned": 0,
+            "profiles_updated": 0, "upsert_calls": 0,
+        }
+
+    def run(self, lookback_days: int = RECONCILE_LOOKBACK_DAYS) -> Dict[str, Any]:
+        started = time.perf_counter()
+        payments = self.fetch_payments(datetime.now(timezone.utc) - timedelta(days=lookback_days))
+        self.reconcile_profiles(payments)
+        elapsed = time.perf_counter() - started
+        self.stats["elapsed_seconds"] = round(elapsed, 3)
+        self.stats["profiles_per_second"] = round(self.stats["profiles_scanned"] / elapsed, 1) if elapsed else 0.0
+        return self.stats
+
+    def _search(self, filters: Dict[str, Any], offset: int) -> Dict[str, Any]:
+        return self.mercado_pago_service.search_payments(dict(filters, limit=SEARCH_PAGE_LIMIT, offset=offset))
+
+    def fetch_payments(self, since: datetime) -> Dict[str, Dict[str, Any]]:
+        """Return the most relevant payment per user updated since the given time."""
+        filters = {
+            "sort": "date_last_updated",
+            "criteria": "desc",
+            "range": "date_last_updated",
+            "begin_date": since.strftime("%Y-%m-%dT%H:%M:%S.000-00:00"),
+            "end_date": "NOW",
+        }
+        # The first page tells how many there are; the rest are fetched concurrently
+        first = self._search(filters, 0)
+        results: List[Dict[str, Any]] = list(first.get("results", []))
+        total = first.get("paging", {}).get("total", len(results))
+        offsets = range(SEARCH_PAGE_LIMIT, total, SEARCH_PAGE_LIMIT)
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for page in executor.map(lambda offset: self._search(filters, offset), offsets):
+                results.extend(page.get("results", []))
+        self.stats["search_calls"] = 1 + len(offsets)
+
+        by_user: Dict[str, Dict[str, Any]] = {}
+        for payment in results:
+            external_reference = payment.get("external_reference")
+            if not external_reference:
+                continue
+            user_id = user_id_from_reference(external_reference)
+            current = by_user.get(user_id)
+            if current is None or _rank(payment) > _rank(current):
+                by_user[user_id] = payment
+        self.stats["payments_seen"] = len(results)
+        return by_user
+
+    def _pending_profiles(self) -> Iterator[List[Dict[str, Any]]]:
+        """Yield pages of pending profiles, keyset-paginated on user_id."""
+        last_user_id: Optional[str] = None
+        while True:
+            query = (
+                self.supabase.table("user_profiles")
+                .select("user_id, pagamento_status, pagamento_id")
+                .in_("pagamento_status", PENDING_PROFILE_STATUSES)
+            )
+            if last_user_id is not None:
+                query = query.gt("user_id", last_user_id)
+            with track_dependency("supabase", "list_pending_payments"):
+                page = query.order("user_id").limit(self.page_size).execute().data
+            if not page:
+                return
+            yield page
+            if len(page) < self.page_size:
+                return
+            last_user_id = page[-1]["user_id"]
+
+    def reconcile_profiles(self, payments: Dict[str, Dict[str, Any]]):
+        for page in self._pending_profiles():
+            self.stats["profiles_scanned"] += len(page)
+            updates, final = [], []
+            for profile in page:
+                payment = payments.get(profile["user_id"])
+                if payment is None or payment.get("status") == profile.get("pagamento_status"):
+                    continue
+                payment_status = payment.get("status", "pending")
+                updates.append({
+                    "user_id": profile["user_id"],
+                    "plano": plan_for_status(payment_status),
+                    "pagamento_status": payment_status,
+                    "pagamento_id": str(payment.get("id", "")),
+                    "updated_at": "now()",
+                })
+                if payment_status in FINAL_STATUSES:
+                    final.append((profile["user_id"], payment))
+            if updates and not self.dry_run:
+                with track_dependency("supabase", "bulk_update_payments"):
+                    self.supabase.table("user_profiles").upsert(updates, on_conflict="user_id").execute()
+                self.stats["upsert_calls"] += 1
+                # Final statuses are never looked up again, so they are only
+                # recorded once the profiles have them
+                for user_id, payment in final:
+                    payment_status_store.put(
+                        str(payment.get("id")), user_id, payment["status"], payment.get("external_reference")
+                    )
+            self.stats["profiles_updated"] += len(updates)
+            logger.info(f"Reconciled page of {len(page)} profiles, {len(updates)} updated")
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconcile pending payments with Mercado Pago")
+    parser.add_argument("--lookback-days", type=int, default=RECONCILE_LOOKBACK_DAYS)
+    parser.add_argument("--concurrency", type=int, default=RECONCILE_CONCURRENCY)
+    parser.add_argument("--page-size", type=int, default=RECONCILE_PAGE_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="Report changes without writing them")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    from backend.utils.logging import setup_logging
+    setup_logging()
+    from backend.database.database_service import get_supabase_client
+    from backend.payments.mercado_pago_service import get_mercado_pago_service
+
+    reconciler = PaymentReconciler(
+        get_supabase_client(), get_mercado_pago_service(),
+        concurrency=args.concurrency, page_size=args.page_size, dry_run=args.dry_run,
+    )
+    stats = reconciler.run(args.lookback_days)
+    logger.info(f"Reconciliation finished: {stats}")
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,11 @@
 import logging
 from fastapi import Request, HTTPException, status
-from supabase import Client
-from ..payments.mercado_pago_service import MercadoPagoService
+from fastapi.concurrency import run_in_threadpool
+from ..payments.mercado_pago_service import get_mercado_pago_service
+from ..payments.webhook_queue import webhook_queue
+from ..payments.payment_status import payment_status_store, user_id_from_reference
 from ..database.database_service import get_supabase_client
+from ..utils.metrics import track_dependency
 
 logger = logging.getLogger(__name__)
 
@@ -24,53 +27,70 @@ async def handle_webhook(request: Request):
                 detail="Missing topic or resource_id in webhook payload"
             )
         
-        # Initialize Mercado Pago service
-        mercado_pago_service = MercadoPagoService()
-        
-        # Validate the webhook data
-        payment_info = mercado_pago_service.validate_webhook(topic, resource_id)
-        
-        # Connect to Supabase
-        supabase: Client = get_supabase_client()
-        
-        # Update user profile based on payment status
-        external_reference = payment_info.get('external_reference')
-        if external_reference:
-            # Extract user_id from external_reference (format: user_id-payment_id)
-            user_id = external_reference.split('-')[0] if '-' in external_reference else external_reference
-            
-            # Get payment status
-            payment_status = payment_info.get('status', 'pending')
-            mercado_pago_payment_id = payment_info.get('id')
-            
-            # Determine plan based on payment status
-            if payment_status == 'approved':
-                plan = 'premium'
-            elif payment_status in ['cancelled', 'refunded', 'charged_back']:
-                plan = 'free'
-            else:
-                plan = 'free'  # Default to free for pending, in_process, etc.
-            
-            # Update user profile in Supabase
+        # Store the notification and answer right away; background workers
+        # look the payment up, so Mercado Pago doesn't time out and resend
+        outcome = await run_in_threadpool(webhook_queue.enqueue, str(topic), str(resource_id))
+        logger.info(f"Webhook {topic}/{resource_id} {outcome}")
+        return {"status": "accepted", "message": "Webhook received"}
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error processing webhook: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error processing webhook: {str(e)}"
+        )
+
+def process_notification(topic: str, resource_id: str):
+    """
+    Look up a notified payment and apply its status to the user's profile
+
+    Called by the webhook queue workers.
+    """
+    mercado_pago_service = get_mercado_pago_service()
+
+    # Validate the webhook data
+    payment_info = mercado_pago_service.validate_webhook(topic, resource_id)
+
+    supabase = get_supabase_client()
+
+    # Update user profile based on payment status
+    external_reference = payment_info.get('external_reference')
+    if external_reference:
+        # Extract user_id from external_reference (format: user_id-payment_id)
+        user_id = user_id_from_reference(external_reference)
+
+        # Get payment status
+        payment_status = payment_info.get('status', 'pending')
+        mercado_pago_payment_id = payment_info.get('id')
+
+        # Determine plan based on payment status
+        if payment_status == 'approved':
+            plan = 'premium'
+        elif payment_status in ['cancelled', 'refunded', 'charged_back']:
+            plan = 'free'
+        else:
+            plan = 'free'  # Default to free for pending, in_process, etc.
+
+        # Update user profile in Supabase
+        with track_dependency("supabase", "update_payment"):
             response = supabase.table('user_profiles').update({
                 'plano': plan,
                 'pagamento_status': payment_status,
                 'pagamento_id': str(mercado_pago_payment_id),
                 'updated_at': 'now()'
             }).eq('user_id', user_id).execute()
-            
-            logger.info(f"Webhook processed successfully for user {user_id}. Payment status: {payment_status}")
-            return {"status": "success", "message": "Webhook processed successfully"}
-        else:
-            logger.warning(f"No external_reference found in payment info: {payment_info}")
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="No external_reference found in payment information"
-            )
-    
-    except Exception as e:
-        logger.error(f"Error processing webhook: {str(e)}")
+
+        # Answer status polls from the local store from now on. Recorded only
+        # once the profile has the status, so a failed update is retried
+        payment_status_store.put(str(mercado_pago_payment_id), user_id, payment_status, external_reference)
+
+        logger.info(f"Webhook processed successfully for user {user_id}. Payment status: {payment_status}")
+        return {"status": "success", "message": "Webhook processed successfully"}
+    else:
+        logger.warning(f"No external_reference found in payment info: {payment_info}")
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_ERROR,
-            detail=f"Error processing webhook: {str(e)}"
-        )
\ No newline at end of file
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No external_reference found in payment information"
+        )
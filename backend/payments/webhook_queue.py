@@ -0,0 +1,252 @@
+"""Durable queue of Mercado Pago webhook notifications.
+
+The webhook handler only records the notification in a local SQLite file and
+answers 200 right away; a pool of background workers then looks the payment
+up and updates the user's profile, retrying failures with exponential backoff.
+
+Notifications are keyed on (topic, resource_id). A notification for a key
+that is already queued or being processed is merged into it. Mercado Pago
+reuses the payment ID when a payment's status changes, so a notification for
+a key already processed is queued again; it is only dropped as a retry when
+it arrives within WEBHOOK_DEDUP_WINDOW seconds and the payment had already
+reached a final status. Processing is idempotent, since the worker reads the
+payment's current status anyway. Processed notifications are deleted once
+they are older than that window; failed ones are kept for inspection.
+"""
+import logging
+import os
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+from fastapi import HTTPException
+from backend.payments.payment_status import FINAL_STATUSES, payment_status_store
+from backend.utils.metrics import registry
+from backend.utils.sqlite import SQLiteDatabase
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_QUEUE_PATH = os.getenv("WEBHOOK_QUEUE_PATH", "data/webhook_queue.db")
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "2"))
+WEBHOOK_DEDUP_WINDOW = float(os.getenv("WEBHOOK_DEDUP_WINDOW", "300"))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "8"))
+WEBHOOK_BACKOFF_BASE = float(os.getenv("WEBHOOK_BACKOFF_BASE", "2"))
+WEBHOOK_BACKOFF_MAX = float(os.getenv("WEBHOOK_BACKOFF_MAX", "600"))
+# A notification claimed by a worker that died is picked up again after this
+WEBHOOK_LEASE_SECONDS = float(os.getenv("WEBHOOK_LEASE_SECONDS", "300"))
+WEBHOOK_POLL_INTERVAL = float(os.getenv("WEBHOOK_POLL_INTERVAL", "1"))
+# Processed notifications past the dedup window are deleted this often
+WEBHOOK_PRUNE_INTERVAL = float(os.getenv("WEBHOOK_PRUNE_INTERVAL", "60"))
+
+PENDING = "pending"
+PROCESSING = "processing"
+DONE = "done"
+FAILED = "failed"
+
+WEBHOOK_EVENTS = registry.counter(
+    "fynace_webhook_events_total", "Webhook notifications by what happened to them.", ["outcome"]
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS webhook_events (
+    topic TEXT NOT NULL,
+    resource_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    lease_expires_at REAL,
+    processed_at REAL,
+    -- Set when a notification arrives while the key is being processed
+    renotified INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    received_at REAL NOT NULL,
+    PRIMARY KEY (topic, resource_id)
+);
+CREATE INDEX IF NOT EXISTS webhook_events_due ON webhook_events (status, next_attempt_at);
+"""
+
+class WebhookQueue:
+    """SQLite-backed notification queue drained by a pool of worker threads."""
+
+    def __init__(self, path: str, handler: Callable[[str, str], object], workers: int = 2,
+                 is_final: Optional[Callable[[str, str], bool]] = None):
+        self.db = SQLiteDatabase(path, _SCHEMA)
+        self.handler = handler
+        # Whether the resource already reached a status that can't change
+        self.is_final = is_final
+        self.workers = workers
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._next_prune = 0.0
+
+    def enqueue(self, topic: str, resource_id: str) -> str:
+        """Record a notification; return "enqueued", "merged" or "duplicate"."""
+        now = time.time()
+        with self.db.transaction() as conn:
+            row = conn.execute(
+                "SELECT status, processed_at FROM webhook_events WHERE topic = ? AND resource_id = ?",
+                (topic, resource_id),
+            ).fetchone()
+            if row is None:
+                conn.execute(
+                    "INSERT INTO webhook_events (topic, resource_id, status, next_attempt_at, received_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (topic, resource_id, PENDING, now, now),
+                )
+                outcome = "enqueued"
+            else:
+                status, processed_at = row
+                if status == PENDING:
+                    outcome = "merged"
+                elif status == PROCESSING:
+                    # Process again once the running attempt finishes
+                    conn.execute(
+                        "UPDATE webhook_events SET renotified = 1 WHERE topic = ? AND resource_id = ?",
+                        (topic, resource_id),
+                    )
+                    outcome = "merged"
+                elif (status == DONE and processed_at is not None and now - processed_at < WEBHOOK_DEDUP_WINDOW
+                      and self.is_final is not None and self.is_final(topic, resource_id)):
+                    outcome = "duplicate"
+                else:
+                    conn.execute(
+                        "UPDATE webhook_events SET status = ?, attempts = 0, next_attempt_at = ?, "
+                        "last_error = NULL, received_at = ? WHERE topic = ? AND resource_id = ?",
+                        (PENDING, now, now, topic, resource_id),
+                    )
+                    outcome = "enqueued"
+        WEBHOOK_EVENTS.inc(outcome=outcome)
+        if outcome == "enqueued":
+            self._wakeup.set()
+        return outcome
+
+    def _claim(self) -> Optional[tuple]:
+        """Take the next due notification, or None if there is nothing to do."""
+        now = time.time()
+        with self.db.transaction() as conn:
+            row = conn.execute(
+                "SELECT topic, resource_id, attempts FROM webhook_events "
+                "WHERE (status = ? AND next_attempt_at <= ?) OR (status = ? AND lease_expires_at <= ?) "
+                "ORDER BY next_attempt_at LIMIT 1",
+                (PENDING, now, PROCESSING, now),
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE webhook_events SET status = ?, attempts = attempts + 1, lease_expires_at = ?, "
+                    "renotified = 0 WHERE topic = ? AND resource_id = ?",
+                    (PROCESSING, now + WEBHOOK_LEASE_SECONDS, row[0], row[1]),
+                )
+        return row
+
+    def _complete(self, topic: str, resource_id: str):
+        now = time.time()
+        # A notification that arrived meanwhile may carry a newer status
+        self.db.connect().execute(
+            "UPDATE webhook_events SET status = CASE renotified WHEN 1 THEN ? ELSE ? END, "
+            "processed_at = ?, next_attempt_at = ?, attempts = 0, lease_expires_at = NULL, last_error = NULL "
+            "WHERE topic = ? AND resource_id = ?",
+            (PENDING, DONE, now, now, topic, resource_id),
+        )
+        WEBHOOK_EVENTS.inc(outcome="processed")
+
+    def _fail(self, topic: str, resource_id: str, attempts: int, error: str, retryable: bool):
+        if retryable and attempts < WEBHOOK_MAX_ATTEMPTS:
+            delay = min(WEBHOOK_BACKOFF_MAX, WEBHOOK_BACKOFF_BASE ** attempts)
+            delay *= random.uniform(0.5, 1.0)
+            status, outcome = PENDING, "retried"
+            logger.warning(f"Webhook {topic}/{resource_id} failed (attempt {attempts}), retrying in {delay:.0f}s: {error}")
+        else:
+            delay, status, outcome = 0.0, FAILED, "failed"
+            logger.error(f"Webhook {topic}/{resource_id} failed permanently after {attempts} attempts: {error}")
+        self.db.connect().execute(
+            "UPDATE webhook_events SET status = ?, next_attempt_at = ?, lease_expires_at = NULL, last_error = ? "
+            "WHERE topic = ? AND resource_id = ?",
+            (status, time.time() + delay, error[:1000], topic, resource_id),
+        )
+        WEBHOOK_EVENTS.inc(outcome=outcome)
+
+    def prune(self) -> int:
+        """Delete notifications processed more than WEBHOOK_DEDUP_WINDOW ago; return how many."""
+        with self.db.transaction() as conn:
+            deleted = conn.execute(
+                "DELETE FROM webhook_events WHERE status = ? AND processed_at < ?",
+                (DONE, time.time() - WEBHOOK_DEDUP_WINDOW),
+            ).rowcount
+        if deleted:
+            logger.info(f"Pruned {deleted} processed webhook notifications")
+        return deleted
+
+    def process_next(self) -> bool:
+        """Process one due notification; return False if none was due."""
+        row = self._claim()
+        if row is None:
+            return False
+        topic, resource_id, attempts = row
+        attempts += 1
+        try:
+            self.handler(topic, resource_id)
+        except HTTPException as e:
+            # 4xx: the notification itself is unusable, retrying won't help
+            self._fail(topic, resource_id, attempts, str(e.detail), retryable=e.status_code >= 500)
+        except Exception as e:
+            self._fail(topic, resource_id, attempts, str(e), retryable=True)
+        else:
+            self._complete(topic, resource_id)
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if time.monotonic() >= self._next_prune:
+                    self._next_prune = time.monotonic() + WEBHOOK_PRUNE_INTERVAL
+                    self.prune()
+                if self.process_next():
+                    continue
+            except Exception as e:
+                logger.error(f"Error in webhook worker: {e}")
+            # Woken by enqueue(); the timeout picks up retries and other workers' rows
+            self._wakeup.wait(WEBHOOK_POLL_INTERVAL)
+            self._wakeup.clear()
+
+    def start(self):
+        """Start the worker threads."""
+        if self._threads:
+            return
+        self._stop.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"webhook-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the worker threads; unfinished notifications stay queued."""
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def counts(self) -> Dict[str, int]:
+        """Number of notifications by status."""
+        rows = self.db.connect().execute("SELECT status, COUNT(*) FROM webhook_events GROUP BY status")
+        return dict(rows.fetchall())
+
+def _process(topic: str, resource_id: str):
+    # Imported here: webhook.py imports this module for the queue instance
+    from backend.payments.webhook import process_notification
+    process_notification(topic, resource_id)
+
+def _is_final(topic: str, resource_id: str) -> bool:
+    if topic != "payment":
+        return False
+    entry = payment_status_store.get(resource_id)
+    return entry is not None and entry["status"] in FINAL_STATUSES
+
+# Global queue instance, started by the app lifespan
+webhook_queue = WebhookQueue(WEBHOOK_QUEUE_PATH, _process, workers=WEBHOOK_WORKERS, is_final=_is_final)
+
+registry.gauge(
+    "fynace_webhook_queue_events", "Webhook notifications stored in the queue, by status.", ["status"],
+    function=lambda: {(status,): count for status, count in webhook_queue.counts().items()},
+)
@@ -0,0 +1,35 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from backend.auth_utils import get_current_user
+from backend.services import ledger
+from backend.services.spreadsheet_service import get_user_spreadsheet_id
+from backend.services.google_sheets_service import GoogleSheetsService
+from backend.utils.rate_limit import sheets_read_limit
+from datetime import date
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Transactions returned when the client doesn't ask for a number
+DASHBOARD_LATEST = int(os.getenv("DASHBOARD_LATEST", "10"))
+
+# User and spreadsheet are resolved once per request (FastAPI caches the
+# dependencies) and the ledger is read with a single batchGet
+@router.get("/", dependencies=[Depends(sheets_read_limit)])
+def get_dashboard(
+    limite: int = Query(DASHBOARD_LATEST, ge=1, le=500),
+    user=Depends(get_current_user),
+    spreadsheet_id: str = Depends(get_user_spreadsheet_id),
+):
+    """Totals, category breakdown, the month's figures and the latest transactions."""
+    try:
+        rows = GoogleSheetsService().read_ledger(spreadsheet_id)
+        dashboard = ledger.build_dashboard(rows, limite, date.today())
+        return {**dashboard, "user": user["email"]}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting dashboard: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erro ao obter painel: {str(e)}")
@@ -0,0 +1,69 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from backend.auth_utils import get_current_user
+from backend.services.ledger_sync import ledger_sync
+from backend.services.spreadsheet_service import get_user_spreadsheet_id
+from backend.utils.events import Subscription, event_bus, format_event
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# A comment line is sent when nothing else was for this long, so proxies
+# keep the connection open and dead clients are noticed
+EVENTS_HEARTBEAT = float(os.getenv("EVENTS_HEARTBEAT", "15"))
+# How long clients wait before reconnecting after the stream drops
+EVENTS_RETRY_MS = int(os.getenv("EVENTS_RETRY_MS", "5000"))
+
+class EventStreamResponse(StreamingResponse):
+    """Streaming response that closes its subscription however the response ends.
+
+    The body generator may never start (the client can drop while headers are
+    sent), so its own cleanup can't be relied on to unsubscribe.
+    """
+
+    def __init__(self, content, subscription: Subscription, **kwargs):
+        super().__init__(content, **kwargs)
+        self.subscription = subscription
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            event_bus.unsubscribe(self.subscription)
+
+@router.get("/")
+async def eventos(
+    user=Depends(get_current_user),
+    spreadsheet_id: str = Depends(get_user_spreadsheet_id),
+):
+    """Server-Sent Events stream of changes to the user's ledger."""
+    subscription = event_bus.subscribe(user["id"])
+    if subscription is None:
+        raise HTTPException(
+            status_code=429,
+            detail="Muitas conexões de eventos abertas para este usuário",
+            headers={"Retry-After": str(EVENTS_RETRY_MS // 1000)},
+        )
+    try:
+        # Reads the ledger cache, which may query the shared SQLite store
+        await run_in_threadpool(ledger_sync.watch, user["id"], spreadsheet_id)
+    except Exception:
+        event_bus.unsubscribe(subscription)
+        raise
+
+    async def stream():
+        yield f"retry: {EVENTS_RETRY_MS}\n" + format_event("conectado", {"heartbeat": EVENTS_HEARTBEAT})
+        while True:
+            message = await subscription.next(EVENTS_HEARTBEAT)
+            yield message if message is not None else ": ping\n\n"
+
+    return EventStreamResponse(
+        stream(),
+        subscription,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,21 +1,34 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request
-from typing import Dict, Any
+from fastapi import APIRouter, Depends, HTTPException, Query, status, Request
+from fastapi.concurrency import run_in_threadpool
+from typing import Dict, Any, Optional
 from ..auth_utils import get_current_user
-from ..payments.mercado_pago_service import MercadoPagoService
+from ..payments.mercado_pago_service import MercadoPagoService, get_mercado_pago_service
 from ..payments.payment_models import PaymentRequest, PaymentResponse
-from supabase import Client
+from ..payments.payment_status import (
+    FINAL_STATUSES, PAYMENT_STATUS_TTL, payment_status_store, resolve_payment_status
+)
 from ..database.database_service import get_supabase_client
+from ..utils.metrics import track_dependency
+import asyncio
 import logging
+import os
 
 router = APIRouter(prefix="/pagamentos", tags=["pagamentos"])
 
 logger = logging.getLogger(__name__)
 
+# How long a status long-poll is held when nothing changes
+PAYMENT_LONG_POLL_TIMEOUT = float(os.getenv("PAYMENT_LONG_POLL_TIMEOUT", "25"))
+PAYMENT_LONG_POLL_MAX_TIMEOUT = float(os.getenv("PAYMENT_LONG_POLL_MAX_TIMEOUT", "60"))
+
+# Sync handlers: FastAPI runs them in the threadpool, so the blocking SDK
+# calls don't stall the event loop
 @router.post("/criar", response_model=PaymentResponse)
-async def criar_pagamento(
+def criar_pagamento(
     payment_request: PaymentRequest,
     current_user: Dict[str, Any] = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase_client)
+    supabase=Depends(get_supabase_client),
+    mercado_pago_service: MercadoPagoService = Depends(get_mercado_pago_service),
 ):
     """
     Create a new payment preference with Mercado Pago
@@ -43,21 +56,19 @@ async def criar_pagamento(
             "external_reference": external_reference
         }
         
-        # Initialize Mercado Pago service
-        mercado_pago_service = MercadoPagoService()
-        
         # Create preference
         preference = mercado_pago_service.create_preference(payment_data)
         
         # Update user profile to indicate payment initiation
-        supabase.table('user_profiles').upsert({
-            'user_id': current_user.get('id'),
-            'plano': 'free',  # Will be updated by webhook when payment is approved
-            'pagamento_status': 'initiated',
-            'pagamento_id': str(preference.get('id', '')),
-            'created_at': 'now()',
-            'updated_at': 'now()'
-        }).execute()
+        with track_dependency("supabase", "upsert_payment"):
+            supabase.table('user_profiles').upsert({
+                'user_id': current_user.get('id'),
+                'plano': 'free',  # Will be updated by webhook when payment is approved
+                'pagamento_status': 'initiated',
+                'pagamento_id': str(preference.get('id', '')),
+                'created_at': 'now()',
+                'updated_at': 'now()'
+            }).execute()
         
         # Return the init_point for frontend redirection
         return PaymentResponse(
@@ -67,10 +78,12 @@ async def criar_pagamento(
             status="initiated"
         )
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error creating payment: {str(e)}")
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_ERROR,
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error creating payment: {str(e)}"
         )
 
@@ -85,52 +98,64 @@ async def webhook_handler(request: Request):
 
 
 @router.get("/status/{payment_id}")
-async def get_payment_status(
+def get_payment_status(
     payment_id: str,
     current_user: Dict[str, Any] = Depends(get_current_user),
-    supabase: Client = Depends(get_supabase_client)
+    supabase=Depends(get_supabase_client),
+    mercado_pago_service: MercadoPagoService = Depends(get_mercado_pago_service),
 ):
     """
     Get payment status by payment ID
+
+    Final statuses are answered from the local store; others are looked up
+    on Mercado Pago at most once every PAYMENT_STATUS_TTL seconds.
     """
     try:
-        # Initialize Mercado Pago service
-        mercado_pago_service = MercadoPagoService()
-        
-        # Get payment status from Mercado Pago
-        payment_info = mercado_pago_service.get_payment_status(payment_id)
-        
-        # Verify that this payment belongs to the current user
-        external_reference = payment_info.get('external_reference', '')
-        user_id_from_ref = external_reference.split('-')[0] if '-' in external_reference else external_reference
-        
-        if user_id_from_ref != current_user.get('id'):
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="You don't have permission to access this payment"
-            )
-        
-        # Update user profile based on payment status
-        payment_status = payment_info.get('status', 'pending')
-        plan = 'premium' if payment_status == 'approved' else 'free'
-        
-        # Update user profile in Supabase
-        supabase.table('user_profiles').update({
-            'plano': plan,
-            'pagamento_status': payment_status,
-            'updated_at': 'now()'
-        }).eq('user_id', current_user.get('id')).execute()
-        
-        return {
-            "payment_id": payment_id,
-            "status": payment_status,
-            "plan": plan,
-            "external_reference": external_reference
-        }
-    
+        return resolve_payment_status(payment_id, current_user.get('id'), mercado_pago_service, supabase)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting payment status: {str(e)}")
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_ERROR,
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error getting payment status: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+
+@router.get("/status/{payment_id}/aguardar")
+async def wait_payment_status(
+    payment_id: str,
+    status_atual: Optional[str] = None,
+    timeout: float = Query(PAYMENT_LONG_POLL_TIMEOUT, ge=0, le=PAYMENT_LONG_POLL_MAX_TIMEOUT),
+    current_user: Dict[str, Any] = Depends(get_current_user),
+    supabase=Depends(get_supabase_client),
+    mercado_pago_service: MercadoPagoService = Depends(get_mercado_pago_service),
+):
+    """
+    Long-poll a payment's status
+
+    Answers as soon as the status differs from status_atual (the one the
+    client already has) or is final, otherwise after timeout seconds with the
+    unchanged status. Waiting holds no thread.
+    """
+    try:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            result = await run_in_threadpool(
+                resolve_payment_status, payment_id, current_user.get('id'), mercado_pago_service, supabase
+            )
+            remaining = deadline - loop.time()
+            if result["status"] != status_atual or result["status"] in FINAL_STATUSES or remaining <= 0:
+                return result
+            # Woken by a webhook handled in this process; otherwise re-check the
+            # store, which other worker processes and the TTL lookup keep current
+            await payment_status_store.wait_for_change(payment_id, min(remaining, PAYMENT_STATUS_TTL))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error waiting for payment status: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error getting payment status: {str(e)}"
+        )
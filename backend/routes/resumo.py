@@ -1,39 +1,30 @@
 from fastapi import APIRouter, Depends, HTTPException
 from backend.auth_utils import get_current_user
-from backend.services.google_sheets_service import GoogleSheetsService
 from backend.models.transaction import Summary
-from backend.database.database_service import DatabaseService
+from backend.services import ledger
+from backend.services.spreadsheet_service import get_user_spreadsheet_id
 from backend.services.transaction_service import TransactionService
+from backend.utils.rate_limit import sheets_read_limit
 import logging
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-@router.get("/")
-def get_resumo(user=Depends(get_current_user)):
+# One batchGet of the ledger feeds both the summary and the breakdown
+@router.get("/", dependencies=[Depends(sheets_read_limit)])
+def get_resumo(
+    user=Depends(get_current_user),
+    spreadsheet_id: str = Depends(get_user_spreadsheet_id),
+):
     try:
-        # Initialize database service to get user's spreadsheet ID
-        db_service = DatabaseService()
-
-        # Get user's spreadsheet ID from the database
-        spreadsheet_id = db_service.get_spreadsheet_id(user["id"])
-        if not spreadsheet_id:
-            # Create a new spreadsheet if one doesn't exist
-            sheets_service = GoogleSheetsService()
-            spreadsheet_id = sheets_service.create_user_spreadsheet(user["email"])
-
-            # Save the spreadsheet ID to the database
-            success = db_service.save_spreadsheet_id(user["id"], spreadsheet_id)
-            if not success:
-                raise HTTPException(status_code=500, detail="Erro ao salvar ID da planilha no banco de dados")
-
         # Initialize transaction service
         transaction_service = TransactionService(spreadsheet_id)
 
-        # Get summary from Google Sheets using the transaction service
-        summary_data = transaction_service.sheets_service.get_summary(spreadsheet_id)
-        category_breakdown = transaction_service.sheets_service.get_category_breakdown(spreadsheet_id)
+        # Read the ledger once and compute both from it
+        transactions = ledger.to_transactions(transaction_service.sheets_service.read_ledger(spreadsheet_id))
+        summary_data = ledger.summarize(transactions)
+        category_breakdown = ledger.category_breakdown(transactions)
 
         summary = Summary(
             total_ganhos=summary_data["total_ganhos"],
@@ -1,47 +1,43 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from backend.auth_utils import get_current_user
 from backend.models.transaction import TransactionCreate, TransactionType
+from backend.services import ledger
+from backend.services.ledger_sync import ledger_sync
 from backend.services.transaction_service import TransactionService
 from backend.utils.monitoring import monitoring_service
 from backend.utils.security import DataValidator, SecurityUtils
-from backend.database.database_service import DatabaseService
-from typing import Dict, Any
+from backend.services.spreadsheet_service import get_user_spreadsheet_id
+from backend.utils.rate_limit import sheets_read_limit, sheets_write_limit
+from typing import Dict, Any, Optional
 import logging
+import os
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-@router.post("/")
-def criar_transacao(transaction: TransactionCreate, user=Depends(get_current_user)):
+# Largest page of transactions one request can ask for
+MAX_POR_PAGINA = int(os.getenv("TRANSACTIONS_MAX_PAGE_SIZE", "500"))
+
+@router.post("/", dependencies=[Depends(sheets_write_limit)])
+def criar_transacao(
+    transaction: TransactionCreate,
+    user=Depends(get_current_user),
+    spreadsheet_id: str = Depends(get_user_spreadsheet_id),
+):
     try:
         # Validate transaction data
         is_valid, validation_msg = DataValidator.validate_transaction_data(transaction.dict())
         if not is_valid:
             raise HTTPException(status_code=400, detail=validation_msg)
 
-        # Initialize database service to get user's spreadsheet ID
-        db_service = DatabaseService()
-
-        # Get user's spreadsheet ID from the database
-        spreadsheet_id = db_service.get_spreadsheet_id(user["id"])
-        if not spreadsheet_id:
-            # Create a new spreadsheet if one doesn't exist
-            from backend.services.google_sheets_service import GoogleSheetsService
-            sheets_service = GoogleSheetsService()
-            spreadsheet_id = sheets_service.create_user_spreadsheet(user["email"])
-
-            # Save the spreadsheet ID to the database
-            success = db_service.save_spreadsheet_id(user["id"], spreadsheet_id)
-            if not success:
-                raise HTTPException(status_code=500, detail="Erro ao salvar ID da planilha no banco de dados")
-
         # Initialize transaction service
         transaction_service = TransactionService(spreadsheet_id)
 
-        # Create transaction using the service
-        success = transaction_service.create_transaction(transaction)
+        # Create transaction using the service; the result is the row as stored
+        stored = transaction_service.create_transaction(transaction)
+        success = stored is not None
 
         # Log the transaction operation
         monitoring_service.log_transaction_operation(
@@ -58,11 +54,25 @@ def criar_transacao(transaction: TransactionCreate, user=Depends(get_current_use
         if not success:
             raise HTTPException(status_code=500, detail="Erro ao salvar transação no Google Sheets")
 
+        # Updated totals, so the client can show the new state without reading it back.
+        # The ledger is usually cached from the page load, with the new row added.
+        try:
+            resumo = transaction_service.get_aggregates()
+        except Exception as e:
+            # The transaction is saved; the client falls back to reading the totals
+            logger.error(f"Error computing totals after transaction: {str(e)}")
+            resumo = None
+
+        # Open event streams of this user get the row, in the shape LedgerSync
+        # publishes rows read from Sheets, and the new totals
+        ledger_sync.publish_write(user["id"], spreadsheet_id, stored, resumo)
+
         return {
             "message": "Transação criada com sucesso",
             "user_id": user["id"],
             "email": user["email"],
-            "transaction": transaction.dict()
+            "transaction": stored,
+            "resumo": resumo
         }
     except HTTPException:
         # Log the error
@@ -88,26 +98,24 @@ def criar_transacao(transaction: TransactionCreate, user=Depends(get_current_use
         )
         raise HTTPException(status_code=500, detail=f"Erro ao processar criação de transação: {str(e)}")
 
-@router.get("/")
-def get_transacoes(user=Depends(get_current_user)):
-    """Get all transactions for the user."""
+@router.get("/", dependencies=[Depends(sheets_read_limit)])
+def get_transacoes(
+    pagina: Optional[int] = Query(None, ge=1),
+    por_pagina: int = Query(50, ge=1, le=MAX_POR_PAGINA),
+    ordenar: str = Query("data", pattern=f"^({'|'.join(ledger.SORT_FIELDS)})$"),
+    ordem: str = Query("desc", pattern="^(asc|desc)$"),
+    tipo: Optional[TransactionType] = None,
+    categoria: Optional[str] = None,
+    busca: Optional[str] = Query(None, max_length=100),
+    user=Depends(get_current_user),
+    spreadsheet_id: str = Depends(get_user_spreadsheet_id),
+):
+    """Get the user's transactions.
+
+    Without `pagina` every transaction is returned. With it, the
+    transactions are filtered and sorted here and only that page is sent.
+    """
     try:
-        # Initialize database service to get user's spreadsheet ID
-        db_service = DatabaseService()
-
-        # Get user's spreadsheet ID from the database
-        spreadsheet_id = db_service.get_spreadsheet_id(user["id"])
-        if not spreadsheet_id:
-            # Create a new spreadsheet if one doesn't exist
-            from backend.services.google_sheets_service import GoogleSheetsService
-            sheets_service = GoogleSheetsService()
-            spreadsheet_id = sheets_service.create_user_spreadsheet(user["email"])
-
-            # Save the spreadsheet ID to the database
-            success = db_service.save_spreadsheet_id(user["id"], spreadsheet_id)
-            if not success:
-                raise HTTPException(status_code=500, detail="Erro ao salvar ID da planilha no banco de dados")
-
         # Initialize transaction service
         transaction_service = TransactionService(spreadsheet_id)
 
@@ -124,9 +132,26 @@ def get_transacoes(user=Depends(get_current_user)):
             }
         )
 
+        if pagina is None:
+            return {
+                "transactions": transactions,
+                "count": len(transactions),
+                "user_id": user["id"]
+            }
+
+        selected = ledger.filter_transactions(
+            transactions, tipo=tipo.value if tipo else None, categoria=categoria, busca=busca
+        )
+        page = ledger.paginate(
+            ledger.sort_transactions(selected, ordenar, decrescente=ordem == "desc"), pagina, por_pagina
+        )
         return {
-            "transactions": transactions,
-            "count": len(transactions),
+            "transactions": page["items"],
+            "count": len(page["items"]),
+            "total": page["total"],
+            "pagina": page["pagina"],
+            "por_pagina": page["por_pagina"],
+            "paginas": page["paginas"],
             "user_id": user["id"]
         }
     except HTTPException:
@@ -153,26 +178,14 @@ def get_transacoes(user=Depends(get_current_user)):
         )
         raise HTTPException(status_code=500, detail=f"Erro ao obter transações: {str(e)}")
 
-@router.get("/categoria/{categoria}")
-def get_transacoes_por_categoria(categoria: str, user=Depends(get_current_user)):
+@router.get("/categoria/{categoria}", dependencies=[Depends(sheets_read_limit)])
+def get_transacoes_por_categoria(
+    categoria: str,
+    user=Depends(get_current_user),
+    spreadsheet_id: str = Depends(get_user_spreadsheet_id),
+):
     """Get transactions filtered by category."""
     try:
-        # Initialize database service to get user's spreadsheet ID
-        db_service = DatabaseService()
-
-        # Get user's spreadsheet ID from the database
-        spreadsheet_id = db_service.get_spreadsheet_id(user["id"])
-        if not spreadsheet_id:
-            # Create a new spreadsheet if one doesn't exist
-            from backend.services.google_sheets_service import GoogleSheetsService
-            sheets_service = GoogleSheetsService()
-            spreadsheet_id = sheets_service.create_user_spreadsheet(user["email"])
-
-            # Save the spreadsheet ID to the database
-            success = db_service.save_spreadsheet_id(user["id"], spreadsheet_id)
-            if not success:
-                raise HTTPException(status_code=500, detail="Erro ao salvar ID da planilha no banco de dados")
-
         # Initialize transaction service
         transaction_service = TransactionService(spreadsheet_id)
 
@@ -220,26 +233,14 @@ def get_transacoes_por_categoria(categoria: str, user=Depends(get_current_user))
         )
         raise HTTPException(status_code=500, detail=f"Erro ao obter transações por categoria: {str(e)}")
 
-@router.get("/tipo/{tipo}")
-def get_transacoes_por_tipo(tipo: TransactionType, user=Depends(get_current_user)):
+@router.get("/tipo/{tipo}", dependencies=[Depends(sheets_read_limit)])
+def get_transacoes_por_tipo(
+    tipo: TransactionType,
+    user=Depends(get_current_user),
+    spreadsheet_id: str = Depends(get_user_spreadsheet_id),
+):
     """Get transactions filtered by type (expense or income)."""
     try:
-        # Initialize database service to get user's spreadsheet ID
-        db_service = DatabaseService()
-
-        # Get user's spreadsheet ID from the database
-        spreadsheet_id = db_service.get_spreadsheet_id(user["id"])
-        if not spreadsheet_id:
-            # Create a new spreadsheet if one doesn't exist
-            from backend.services.google_sheets_service import GoogleSheetsService
-            sheets_service = GoogleSheetsService()
-            spreadsheet_id = sheets_service.create_user_spreadsheet(user["email"])
-
-            # Save the spreadsheet ID to the database
-            success = db_service.save_spreadsheet_id(user["id"], spreadsheet_id)
-            if not success:
-                raise HTTPException(status_code=500, detail="Erro ao salvar ID da planilha no banco de dados")
-
         # Initialize transaction service
         transaction_service = TransactionService(spreadsheet_id)
 
@@ -2,15 +2,43 @@
 import logging
 import os
 from typing import List, Dict, Any, Optional
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
 from datetime import datetime
 from backend.models.transaction import TransactionCreate, TransactionType
+from backend.services import ledger
+from backend.utils.cache import MISSING
+from backend.utils.locks import KeyedLock
+from backend.utils.metrics import track_dependency
+from backend.utils.scheduler import FairScheduler, INTERACTIVE, BATCH
+from backend.utils.shared_cache import TieredCache, shared_cache_store
 
 logger = logging.getLogger(__name__)
 
 SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
+# Alternative Sheets API root, e.g. a local stand-in for benchmarks
+GOOGLE_SHEETS_API_ENDPOINT = os.getenv("GOOGLE_SHEETS_API_ENDPOINT")
+
+# Every Sheets call of this worker goes through one fair scheduler, queued per
+# spreadsheet (one per user); reads go before writes
+SHEETS_MAX_CONCURRENCY = int(os.getenv("SHEETS_MAX_CONCURRENCY", "8"))
+SHEETS_BATCH_MAX_WAIT_MS = float(os.getenv("SHEETS_BATCH_MAX_WAIT_MS", "1000"))
+SHEETS_QUEUE_TIMEOUT = float(os.getenv("SHEETS_QUEUE_TIMEOUT", "30"))
+
+sheets_scheduler = FairScheduler(
+    "sheets",
+    max_concurrency=SHEETS_MAX_CONCURRENCY,
+    batch_max_wait=SHEETS_BATCH_MAX_WAIT_MS / 1000,
+    timeout=SHEETS_QUEUE_TIMEOUT,
+)
+
+# Ledger rows by spreadsheet ID, so paging and re-sorting the transaction
+# table doesn't read the sheets again. Rows appended through the app are added
+# to the entry without changing its expiry; edits made in the spreadsheet
+# itself show up within the TTL.
+LEDGER_CACHE_TTL = float(os.getenv("LEDGER_CACHE_TTL", "30"))
+LEDGER_CACHE_SIZE = int(os.getenv("LEDGER_CACHE_SIZE", "1000"))
+
+ledger_cache = TieredCache("ledger", maxsize=LEDGER_CACHE_SIZE, ttl=LEDGER_CACHE_TTL, shared=shared_cache_store)
+_ledger_locks = KeyedLock()
 
 class GoogleSheetsService:
     def __init__(self):
@@ -20,45 +48,54 @@ class GoogleSheetsService:
         if not service_account_file:
             raise ValueError("GOOGLE_SERVICE_ACCOUNT_FILE environment variable not set")
 
+        # Google SDKs are imported on first use to keep them off the startup path
+        from google.oauth2.service_account import Credentials
+        from googleapiclient.discovery import build
+
         # Load credentials from service account file
         credentials = Credentials.from_service_account_file(service_account_file, scopes=SCOPES)
-        self.service = build("sheets", "v4", credentials=credentials)
+        client_options = {"api_endpoint": GOOGLE_SHEETS_API_ENDPOINT} if GOOGLE_SHEETS_API_ENDPOINT else None
+        self.service = build("sheets", "v4", credentials=credentials, client_options=client_options)
 
     def create_user_spreadsheet(self, user_email: str) -> str:
         """Create a new spreadsheet for the user and return the ID."""
         title = f"Fynace - Finanças de {user_email.split('@')[0]}"
-        sheet = self.service.spreadsheets().create(
-            body={"properties": {"title": title}},
-            fields="spreadsheetId"
-        ).execute()
+        with sheets_scheduler.slot(user_email, BATCH), track_dependency("sheets", "create"):
+            sheet = self.service.spreadsheets().create(
+                body={"properties": {"title": title}},
+                fields="spreadsheetId"
+            ).execute()
         spreadsheet_id = sheet.get("spreadsheetId")
 
         # Create sheets
-        self.service.spreadsheets().batchUpdate(
-            spreadsheetId=spreadsheet_id,
-            body={
-                "requests": [
-                    {"addSheet": {"properties": {"title": "Despesas"}}},
-                    {"addSheet": {"properties": {"title": "Ganhos"}}},
-                    {"addSheet": {"properties": {"title": "Resumo"}}},
-                ]
-            }
-        ).execute()
+        with sheets_scheduler.slot(user_email, BATCH), track_dependency("sheets", "batch_update"):
+            self.service.spreadsheets().batchUpdate(
+                spreadsheetId=spreadsheet_id,
+                body={
+                    "requests": [
+                        {"addSheet": {"properties": {"title": "Despesas"}}},
+                        {"addSheet": {"properties": {"title": "Ganhos"}}},
+                        {"addSheet": {"properties": {"title": "Resumo"}}},
+                    ]
+                }
+            ).execute()
 
         # Add basic headers
         for sheet_name in ["Despesas", "Ganhos"]:
-            self.service.spreadsheets().values().update(
-                spreadsheetId=spreadsheet_id,
-                range=f"{sheet_name}!A1:E1",
-                valueInputOption="RAW",
-                body={"values": [["Data", "Descrição", "Categoria", "Valor", "Tipo"]]}
-            ).execute()
+            with sheets_scheduler.slot(user_email, BATCH), track_dependency("sheets", "update"):
+                self.service.spreadsheets().values().update(
+                    spreadsheetId=spreadsheet_id,
+                    range=f"{sheet_name}!A1:E1",
+                    valueInputOption="RAW",
+                    body={"values": [["Data", "Descrição", "Categoria", "Valor", "Tipo"]]}
+                ).execute()
 
         logger.info(f"Spreadsheet created with ID: {spreadsheet_id}")
         return spreadsheet_id
 
-    def append_transaction(self, spreadsheet_id: str, transaction: TransactionCreate) -> bool:
-        """Append a new transaction to the appropriate sheet."""
+    def append_transaction(self, spreadsheet_id: str, transaction: TransactionCreate) -> Optional[List[Any]]:
+        """Append a new transaction to the appropriate sheet and return the row as stored, or None."""
+        from googleapiclient.errors import HttpError
         try:
             sheet_name = "Despesas" if transaction.tipo == TransactionType.expense else "Ganhos"
             values = [
@@ -69,79 +106,95 @@ class GoogleSheetsService:
                 transaction.tipo.value.capitalize()
             ]
 
-            self.service.spreadsheets().values().append(
-                spreadsheetId=spreadsheet_id,
-                range=f"{sheet_name}!A:E",
-                valueInputOption="USER_ENTERED",
-                insertDataOption="INSERT_ROWS",
-                body={"values": [values]}
-            ).execute()
-
+            with sheets_scheduler.slot(spreadsheet_id, BATCH), track_dependency("sheets", "append"):
+                result = self.service.spreadsheets().values().append(
+                    spreadsheetId=spreadsheet_id,
+                    range=f"{sheet_name}!A:E",
+                    valueInputOption="USER_ENTERED",
+                    insertDataOption="INSERT_ROWS",
+                    includeValuesInResponse=True,
+                    body={"values": [values]}
+                ).execute()
+
+            # The row as Sheets stored and formatted it, i.e. as a read would return it
+            stored = result.get("updates", {}).get("updatedData", {}).get("values", [])
+            row = stored[0] if stored else [str(v) for v in values]
+            self._add_to_cached_ledger(spreadsheet_id, transaction.tipo.value, row)
             logger.info(f"Transaction saved to {sheet_name} sheet.")
-            return True
+            return row
         except HttpError as e:
             logger.error(f"Error inserting transaction: {e}")
-            return False
+            return None
+
+    def _add_to_cached_ledger(self, spreadsheet_id: str, tipo: str, row: List[Any]):
+        """Add a just-written row to the cached ledger, so the write's response needs no read."""
+        # Under the key lock, so a read already in flight can't store the old rows after this
+        with _ledger_locks.acquire(spreadsheet_id):
+            # A new dict: requests still using the old rows keep a consistent view
+            ledger_cache.update(spreadsheet_id, lambda rows: {**rows, tipo: rows[tipo] + [row]})
 
     def read_transactions(self, spreadsheet_id: str, sheet_name: str, range_: str = "A2:E") -> List[List[Any]]:
         """Read transactions from a specific sheet."""
+        from googleapiclient.errors import HttpError
         try:
-            result = self.service.spreadsheets().values().get(
-                spreadsheetId=spreadsheet_id,
-                range=f"{sheet_name}!{range_}"
-            ).execute()
+            with sheets_scheduler.slot(spreadsheet_id, INTERACTIVE), track_dependency("sheets", "read"):
+                result = self.service.spreadsheets().values().get(
+                    spreadsheetId=spreadsheet_id,
+                    range=f"{sheet_name}!{range_}"
+                ).execute()
             return result.get("values", [])
         except HttpError as e:
             logger.error(f"Error reading transactions: {e}")
             return []
 
-    def get_summary(self, spreadsheet_id: str) -> Dict[str, float]:
-        """Calculate financial summary from the spreadsheet."""
-        expenses = self.read_transactions(spreadsheet_id, "Despesas")
-        incomes = self.read_transactions(spreadsheet_id, "Ganhos")
-
-        total_expenses = sum(float(row[3]) for row in expenses if len(row) > 3 and row[3].replace('.', '', 1).isdigit())
-        total_incomes = sum(float(row[3]) for row in incomes if len(row) > 3 and row[3].replace('.', '', 1).isdigit())
-
+    def read_ledger(self, spreadsheet_id: str, strict: bool = False,
+                    priority: str = INTERACTIVE) -> Dict[str, List[List[Any]]]:
+        """Rows of the Despesas and Ganhos sheets keyed by type, cached for LEDGER_CACHE_TTL.
+
+        If Sheets returns an error the ledger reads as empty, or raises
+        RuntimeError when strict is set.
+        """
+        rows = ledger_cache.get(spreadsheet_id)
+        if rows is not MISSING:
+            return rows
+        # A page and its prefetched neighbour arriving together share one read
+        with _ledger_locks.acquire(spreadsheet_id):
+            rows = ledger_cache.get(spreadsheet_id)
+            if rows is MISSING:
+                rows = self._batch_get_ledger(spreadsheet_id, priority)
+                if rows is not None:
+                    ledger_cache.set(spreadsheet_id, rows)
+        if rows is None:
+            if strict:
+                raise RuntimeError(f"Could not read the ledger of spreadsheet {spreadsheet_id}")
+            return {tipo: [] for tipo in ledger.LEDGER_SHEETS}
+        return rows
+
+    def _batch_get_ledger(self, spreadsheet_id: str, priority: str = INTERACTIVE,
+                          range_: str = "A2:E") -> Optional[Dict[str, List[List[Any]]]]:
+        """Read both sheets in one batchGet call; None if Sheets returned an error."""
+        from googleapiclient.errors import HttpError
+        ranges = [f"{sheet_name}!{range_}" for sheet_name in ledger.LEDGER_SHEETS.values()]
+        try:
+            with sheets_scheduler.slot(spreadsheet_id, priority), track_dependency("sheets", "batch_get"):
+                result = self.service.spreadsheets().values().batchGet(
+                    spreadsheetId=spreadsheet_id,
+                    ranges=ranges
+                ).execute()
+        except HttpError as e:
+            logger.error(f"Error reading ledger: {e}")
+            return None
+        # Value ranges come back in the order requested; empty ones have no values
+        value_ranges = result.get("valueRanges", [])
         return {
-            "total_ganhos": total_incomes,
-            "total_despesas": total_expenses,
-            "saldo": total_incomes - total_expenses
+            tipo: (value_ranges[i].get("values", []) if i < len(value_ranges) else [])
+            for i, tipo in enumerate(ledger.LEDGER_SHEETS)
         }
 
+    def get_summary(self, spreadsheet_id: str) -> Dict[str, float]:
+        """Calculate financial summary from the spreadsheet."""
+        return ledger.summarize(ledger.to_transactions(self.read_ledger(spreadsheet_id)))
+
     def get_category_breakdown(self, spreadsheet_id: str) -> List[Dict[str, Any]]:
         """Get category breakdown for visualization."""
-        expenses = self.read_transactions(spreadsheet_id, "Despesas")
-        incomes = self.read_transactions(spreadsheet_id, "Ganhos")
-
-        categories = {}
-
-        # Process expenses
-        for row in expenses:
-            if len(row) >= 4:
-                category = row[2] if len(row) > 2 else "Outros"
-                amount = float(row[3]) if row[3].replace('.', '', 1).isdigit() else 0
-                if category not in categories:
-                    categories[category] = {"Despesa": 0, "Ganho": 0}
-                categories[category]["Despesa"] += amount
-
-        # Process incomes
-        for row in incomes:
-            if len(row) >= 4:
-                category = row[2] if len(row) > 2 else "Outros"
-                amount = float(row[3]) if row[3].replace('.', '', 1).isdigit() else 0
-                if category not in categories:
-                    categories[category] = {"Despesa": 0, "Ganho": 0}
-                categories[category]["Ganho"] += amount
-
-        result = []
-        for category, amounts in categories.items():
-            for trans_type, amount in amounts.items():
-                if amount > 0:
-                    result.append({
-                        "Categoria": category,
-                        "Tipo": trans_type,
-                        "Valor": amount
-                    })
-
-        return result
\ No newline at end of file
+        return ledger.category_breakdown(ledger.to_transactions(self.read_ledger(spreadsheet_id)))
@@ -0,0 +1,155 @@
+"""Aggregations over a user's ledger (the Despesas and Ganhos sheets).
+
+Everything here works on rows already read from Google Sheets, so one read
+of the ledger can feed the summary, the category breakdown, the latest
+transactions and the month's figures.
+"""
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
+
+# Sheet holding each transaction type
+LEDGER_SHEETS = {"despesa": "Despesas", "ganho": "Ganhos"}
+
+# Fields transactions can be sorted by
+SORT_FIELDS = ("data", "descricao", "categoria", "valor", "tipo")
+
+
+def parse_amount(value: Any) -> float:
+    """Parse the Valor column; anything that isn't a plain number counts as 0."""
+    value = str(value)
+    return float(value) if value.replace('.', '', 1).isdigit() else 0.0
+
+
+def parse_date(date_str: str) -> Optional[datetime]:
+    """Parse a date string from Google Sheets."""
+    try:
+        # Google Sheets typically returns dates in ISO format
+        parsed = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
+    except ValueError:
+        try:
+            parsed = datetime.strptime(date_str, '%Y-%m-%d')
+        except ValueError:
+            return None
+    # Compare naive and aware dates alike
+    return parsed.replace(tzinfo=None)
+
+
+def to_transactions(rows_by_type: Dict[str, List[List[Any]]]) -> List[Dict[str, Any]]:
+    """Turn ledger rows into transactions, keyed by type ("despesa"/"ganho")."""
+    transactions = []
+    for tipo, rows in rows_by_type.items():
+        for row in rows:
+            if len(row) < 4:
+                continue
+            transactions.append({
+                "data": row[0] or "",
+                "descricao": row[1] or "",
+                "categoria": row[2] or "Outros",
+                "valor": parse_amount(row[3]),
+                "tipo": tipo,
+            })
+    return transactions
+
+
+def summarize(transactions: List[Dict[str, Any]]) -> Dict[str, float]:
+    total_ganhos = sum(t["valor"] for t in transactions if t["tipo"] == "ganho")
+    total_despesas = sum(t["valor"] for t in transactions if t["tipo"] == "despesa")
+    return {
+        "total_ganhos": total_ganhos,
+        "total_despesas": total_despesas,
+        "saldo": total_ganhos - total_despesas,
+    }
+
+
+def category_breakdown(transactions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Totals per category and type, in the shape the dashboard chart expects."""
+    categories: Dict[str, Dict[str, float]] = {}
+    for t in transactions:
+        amounts = categories.setdefault(t["categoria"], {"Despesa": 0, "Ganho": 0})
+        amounts["Despesa" if t["tipo"] == "despesa" else "Ganho"] += t["valor"]
+
+    return [
+        {"Categoria": category, "Tipo": trans_type, "Valor": amount}
+        for category, amounts in categories.items()
+        for trans_type, amount in amounts.items()
+        if amount > 0
+    ]
+
+
+def _date_key(t: Dict[str, Any]) -> datetime:
+    parsed = parse_date(t["data"]) if t["data"] else None
+    return parsed or datetime.min
+
+
+def filter_transactions(transactions: List[Dict[str, Any]], tipo: Optional[str] = None,
+                        categoria: Optional[str] = None, busca: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Keep the transactions of a type and category whose description contains `busca`."""
+    busca = busca.strip().lower() if busca else None
+    return [
+        t for t in transactions
+        if (tipo is None or t["tipo"] == tipo)
+        and (categoria is None or t["categoria"].lower() == categoria.lower())
+        and (not busca or busca in t["descricao"].lower())
+    ]
+
+
+def sort_transactions(transactions: List[Dict[str, Any]], campo: str = "data",
+                      decrescente: bool = True) -> List[Dict[str, Any]]:
+    """Sort by one of SORT_FIELDS; dates are compared as dates, undated ones go last."""
+    if campo == "data":
+        def key(t):
+            parsed = _date_key(t)
+            # Undated sort after the dated ones in either direction
+            return (parsed != datetime.min) == decrescente, parsed
+    elif campo == "valor":
+        key = lambda t: t["valor"]
+    else:
+        key = lambda t: str(t[campo]).lower()
+    return sorted(transactions, key=key, reverse=decrescente)
+
+
+def paginate(items: List[Dict[str, Any]], pagina: int, por_pagina: int) -> Dict[str, Any]:
+    """Slice one page out of items (pages start at 1)."""
+    total = len(items)
+    start = (pagina - 1) * por_pagina
+    return {
+        "items": items[start:start + por_pagina],
+        "pagina": pagina,
+        "por_pagina": por_pagina,
+        "total": total,
+        "paginas": max(1, -(-total // por_pagina)),
+    }
+
+
+def latest(transactions: List[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+    """The most recent transactions first; undated ones go last."""
+    return sort_transactions(transactions, "data", decrescente=True)[:limit]
+
+
+def month_figures(transactions: List[Dict[str, Any]], today: date) -> Dict[str, Any]:
+    """Summary of the transactions dated in the month of `today`."""
+    in_month = []
+    for t in transactions:
+        parsed = parse_date(t["data"]) if t["data"] else None
+        if parsed and (parsed.year, parsed.month) == (today.year, today.month):
+            in_month.append(t)
+    return {"mes": today.strftime("%Y-%m"), "quantidade": len(in_month), **summarize(in_month)}
+
+
+def aggregates(transactions: List[Dict[str, Any]], today: date) -> Dict[str, Any]:
+    """Totals, category breakdown and the month's figures."""
+    return {
+        **summarize(transactions),
+        "detalhes": category_breakdown(transactions),
+        "mes": month_figures(transactions, today),
+    }
+
+
+def build_dashboard(rows_by_type: Dict[str, List[List[Any]]], limit: int, today: date) -> Dict[str, Any]:
+    """Everything the dashboard page shows, from a single read of the ledger."""
+    transactions = to_transactions(rows_by_type)
+    return {
+        **aggregates(transactions, today),
+        "transactions": latest(transactions, limit),
+        "count": len(transactions),
+    }
@@ -0,0 +1,129 @@
+"""Push ledger changes to the users' event streams.
+
+Writes made through the API are published by the route that made them. For
+everything else (writes through another worker, edits made directly in the
+spreadsheet) a background thread re-reads, every LEDGER_SYNC_INTERVAL
+seconds, the ledger of each user with an open stream in this process and
+publishes what changed since the last look.
+
+Events:
+- "transacoes": {"transacoes": [rows appended], "resumo": totals}
+- "resumo": {"resumo": totals}, sent when rows were edited or removed; the
+  client should reload its transaction table.
+"""
+import logging
+import os
+import threading
+from datetime import date
+from typing import Any, Dict, List, Optional
+from backend.services import ledger
+from backend.services.google_sheets_service import GoogleSheetsService, ledger_cache
+from backend.utils.cache import MISSING
+from backend.utils.events import EventBus, event_bus
+from backend.utils.scheduler import BATCH
+
+logger = logging.getLogger(__name__)
+
+LEDGER_SYNC_INTERVAL = float(os.getenv("LEDGER_SYNC_INTERVAL", "30"))
+
+def appended_rows(old: Dict[str, List[List[Any]]], new: Dict[str, List[List[Any]]]) -> Optional[Dict[str, List[List[Any]]]]:
+    """Rows added at the end of each sheet, or None if existing rows changed."""
+    appended = {}
+    for tipo, rows in new.items():
+        previous = old.get(tipo, [])
+        if len(rows) < len(previous) or rows[:len(previous)] != previous:
+            return None
+        appended[tipo] = rows[len(previous):]
+    return appended
+
+class LedgerSync:
+    """Last ledger seen per watched user, and the thread that compares it with Sheets."""
+
+    def __init__(self, bus: EventBus, interval: float = LEDGER_SYNC_INTERVAL):
+        self.bus = bus
+        self.interval = interval
+        # user ID -> {"spreadsheet_id": ..., "rows": ledger last published, or None}
+        self._watched: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._sheets_service = None
+
+    def watch(self, user_id: str, spreadsheet_id: str):
+        """Start comparing a user's ledger with the one cached now (the client just loaded it)."""
+        rows = ledger_cache.get(spreadsheet_id)
+        with self._lock:
+            self._watched.setdefault(
+                user_id, {"spreadsheet_id": spreadsheet_id, "rows": rows if rows is not MISSING else None}
+            )
+
+    def publish_write(self, user_id: str, spreadsheet_id: str, row: Dict[str, Any],
+                      resumo: Optional[Dict[str, Any]]):
+        """Publish a transaction written through the API."""
+        self.bus.publish(user_id, "transacoes", {"transacoes": [row], "resumo": resumo})
+        # The cached ledger already has the row; taking it as the last seen
+        # keeps the next sync from publishing the row a second time
+        rows = ledger_cache.get(spreadsheet_id)
+        with self._lock:
+            watched = self._watched.get(user_id)
+            if watched is not None:
+                watched["rows"] = rows if rows is not MISSING else None
+
+    def sync_once(self):
+        """Compare the ledger of every watched user with open streams and publish changes."""
+        subscribed = set(self.bus.subscribed_users())
+        with self._lock:
+            # Users whose streams all closed stop being watched
+            for user_id in [u for u in self._watched if u not in subscribed]:
+                del self._watched[user_id]
+            watched = [(user_id, dict(entry)) for user_id, entry in self._watched.items()]
+        for user_id, entry in watched:
+            try:
+                self._sync_user(user_id, entry["spreadsheet_id"], entry["rows"])
+            except Exception as e:
+                logger.error(f"Error syncing ledger of user {user_id}: {e}")
+
+    def _sync_user(self, user_id: str, spreadsheet_id: str, previous: Optional[Dict[str, List[List[Any]]]]):
+        rows = self._sheets().read_ledger(spreadsheet_id, strict=True, priority=BATCH)
+        with self._lock:
+            entry = self._watched.get(user_id)
+            if entry is None or entry["rows"] is not previous:
+                # Unwatched, or a write was published while this read was running
+                return
+            entry["rows"] = rows
+        if previous is None or rows == previous:
+            return
+
+        transactions = ledger.to_transactions(rows)
+        resumo = ledger.aggregates(transactions, date.today())
+        appended = appended_rows(previous, rows)
+        if appended is None:
+            self.bus.publish(user_id, "resumo", {"resumo": resumo})
+        else:
+            self.bus.publish(user_id, "transacoes", {"transacoes": ledger.to_transactions(appended), "resumo": resumo})
+
+    def _sheets(self):
+        if self._sheets_service is None:
+            self._sheets_service = GoogleSheetsService()
+        return self._sheets_service
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sync_once()
+
+    def start(self):
+        """Start the background sync thread."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="ledger-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+# Global sync shared by the routes and the background thread
+ledger_sync = LedgerSync(event_bus)
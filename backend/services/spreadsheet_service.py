@@ -0,0 +1,61 @@
+"""Spreadsheet resolution service for Fynace application."""
+import logging
+from typing import Dict, Any
+from fastapi import Depends, HTTPException
+from backend.auth_utils import get_current_user
+from backend.database.database_service import DatabaseService
+from backend.utils.locks import KeyedLock
+
+logger = logging.getLogger(__name__)
+
+class SpreadsheetResolver:
+    """Resolve a user's spreadsheet ID, provisioning it at most once per user."""
+
+    def __init__(self):
+        self._locks = KeyedLock()
+
+    def resolve(self, user: Dict[str, Any]) -> str:
+        """Return the user's spreadsheet ID, creating the spreadsheet if needed."""
+        db_service = DatabaseService()
+
+        # Fast path: cached or already stored in the database
+        spreadsheet_id = db_service.get_spreadsheet_id(user["id"])
+        if spreadsheet_id:
+            return spreadsheet_id
+
+        # Single-flight: concurrent first requests from the same user wait
+        # here instead of each creating their own spreadsheet
+        with self._locks.acquire(user["id"]):
+            spreadsheet_id = db_service.get_spreadsheet_id(user["id"], refresh=True)
+            if spreadsheet_id:
+                return spreadsheet_id
+            return self._provision(db_service, user)
+
+    def _provision(self, db_service: DatabaseService, user: Dict[str, Any]) -> str:
+        """Create a spreadsheet for the user and store its ID."""
+        from backend.services.google_sheets_service import GoogleSheetsService
+        sheets_service = GoogleSheetsService()
+        created_id = sheets_service.create_user_spreadsheet(user["email"])
+
+        # Conditional save guards against other worker processes
+        spreadsheet_id = db_service.claim_spreadsheet_id(user["id"], created_id)
+        if not spreadsheet_id:
+            raise HTTPException(status_code=500, detail="Erro ao salvar ID da planilha no banco de dados")
+        if spreadsheet_id != created_id:
+            logger.warning(
+                f"Spreadsheet {created_id} discarded: user {user['id']} was provisioned concurrently"
+            )
+        return spreadsheet_id
+
+# Global resolver instance shared by all requests of this worker
+spreadsheet_resolver = SpreadsheetResolver()
+
+def get_user_spreadsheet_id(user=Depends(get_current_user)) -> str:
+    """FastAPI dependency returning the authenticated user's spreadsheet ID."""
+    try:
+        return spreadsheet_resolver.resolve(user)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error resolving spreadsheet: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erro ao obter planilha do usuário: {str(e)}")
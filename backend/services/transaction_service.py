@@ -1,10 +1,12 @@
 """Transaction processing service for Fynace application."""
 import logging
 from typing import Dict, Any, List, Optional
-from datetime import datetime
+from datetime import date, datetime
+from fastapi import HTTPException
 from backend.services.google_sheets_service import GoogleSheetsService
 from backend.models.transaction import TransactionCreate, Transaction, TransactionType
-from googleapiclient.errors import HttpError
+from backend.services import ledger
+from backend.services.ledger import parse_date
 
 logger = logging.getLogger(__name__)
 
@@ -14,8 +16,12 @@ class TransactionService:
         # Initialize Google Sheets service with service account credentials
         self.sheets_service = GoogleSheetsService()
 
-    def create_transaction(self, transaction: TransactionCreate) -> bool:
-        """Create a new transaction in Google Sheets."""
+    def create_transaction(self, transaction: TransactionCreate) -> Optional[Dict[str, Any]]:
+        """Create a new transaction in Google Sheets.
+
+        Returns the transaction as stored (parsed from the row Sheets
+        formatted, like a read would return it), or None if it wasn't saved.
+        """
         try:
             # Set the transaction date if not provided
             if not transaction.data:
@@ -23,20 +29,23 @@ class TransactionService:
 
             # Validate transaction data
             if not self._validate_transaction(transaction):
-                return False
+                return None
 
             # Save to Google Sheets
-            success = self.sheets_service.append_transaction(self.spreadsheet_id, transaction)
-
-            if success:
-                logger.info(f"Transaction created successfully: {transaction.descricao}")
-            else:
+            row = self.sheets_service.append_transaction(self.spreadsheet_id, transaction)
+            if row is None:
                 logger.error(f"Failed to create transaction: {transaction.descricao}")
-
-            return success
+                return None
+
+            logger.info(f"Transaction created successfully: {transaction.descricao}")
+            stored = ledger.to_transactions({transaction.tipo.value: [row]})
+            return stored[0] if stored else None
+        except HTTPException:
+            # Sheets scheduler overloaded (503 with Retry-After): not a failed write
+            raise
         except Exception as e:
             logger.error(f"Error creating transaction: {e}")
-            return False
+            return None
 
     def _validate_transaction(self, transaction: TransactionCreate) -> bool:
         """Validate transaction data before processing."""
@@ -62,38 +71,20 @@ class TransactionService:
     def get_all_transactions(self) -> List[Dict[str, Any]]:
         """Get all transactions from both expense and income sheets."""
         try:
-            expenses = self.sheets_service.read_transactions(self.spreadsheet_id, "Despesas")
-            incomes = self.sheets_service.read_transactions(self.spreadsheet_id, "Ganhos")
-
-            transactions = []
-
-            # Process expenses
-            for row in expenses:
-                if len(row) >= 5:  # Ensure we have all required fields
-                    transactions.append({
-                        "data": row[0] if row[0] else "",
-                        "descricao": row[1] if row[1] else "",
-                        "categoria": row[2] if row[2] else "",
-                        "valor": float(row[3]) if row[3] and row[3].replace('.', '', 1).isdigit() else 0,
-                        "tipo": "despesa"
-                    })
-
-            # Process incomes
-            for row in incomes:
-                if len(row) >= 5:  # Ensure we have all required fields
-                    transactions.append({
-                        "data": row[0] if row[0] else "",
-                        "descricao": row[1] if row[1] else "",
-                        "categoria": row[2] if row[2] else "",
-                        "valor": float(row[3]) if row[3] and row[3].replace('.', '', 1).isdigit() else 0,
-                        "tipo": "ganho"
-                    })
-
-            return transactions
+            # Both sheets in one Sheets call, parsed like the dashboard's
+            return ledger.to_transactions(self.sheets_service.read_ledger(self.spreadsheet_id))
+        except HTTPException:
+            # An overloaded Sheets scheduler must not look like an empty ledger
+            raise
         except Exception as e:
             logger.error(f"Error getting all transactions: {e}")
             return []
 
+    def get_aggregates(self) -> Dict[str, Any]:
+        """Totals, category breakdown and this month's figures of the ledger."""
+        rows = self.sheets_service.read_ledger(self.spreadsheet_id, strict=True)
+        return ledger.aggregates(ledger.to_transactions(rows), date.today())
+
     def get_transactions_by_category(self, category: str) -> List[Dict[str, Any]]:
         """Get transactions filtered by category."""
         all_transactions = self.get_all_transactions()
@@ -125,13 +116,4 @@ class TransactionService:
 
     def _parse_date(self, date_str: str) -> Optional[datetime]:
         """Parse date string from Google Sheets."""
-        try:
-            # Google Sheets typically returns dates in ISO format
-            return datetime.fromisoformat(date_str.replace('Z', '+00:00'))
-        except ValueError:
-            try:
-                # Try parsing as a different format if ISO fails
-                return datetime.strptime(date_str, '%Y-%m-%d')
-            except ValueError:
-                # If all parsing fails, return None
-                return None
\ No newline at end of file
+        return parse_date(date_str)
@@ -0,0 +1,101 @@
+"""In-process caching utilities for Fynace application."""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+from backend.utils.metrics import registry
+
+# Marker returned by TTLCache.get() when a key is not cached
+MISSING = object()
+
+# Every cache created in this process, exported by the metrics registry
+_caches: List["TTLCache"] = []
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a time-to-live."""
+
+    def __init__(self, name: str, maxsize: int = 1024, ttl: float = 300.0):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        _caches.append(self)
+
+    def get(self, key: Hashable) -> Any:
+        """Return the cached value for key, or MISSING if absent or expired."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return MISSING
+            value, expires_at = entry
+            if expires_at <= now:
+                del self._data[key]
+                self.misses += 1
+                return MISSING
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Store a value, evicting the least recently used entry when full."""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def update(self, key: Hashable, function: Callable[[Any], Any]):
+        """Replace a cached value with function(value), keeping its expiry; nothing happens if it isn't cached."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                return
+            self._data[key] = (function(entry[0]), entry[1])
+
+    def invalidate(self, key: Hashable):
+        """Remove a single key from the cache."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """Remove every entry from the cache."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss/eviction counters for monitoring."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "name": self.name,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+def _cache_values(attribute: str):
+    return lambda: {(cache.name,): getattr(cache, attribute) for cache in _caches}
+
+registry.callback_counter("fynace_cache_hits_total", "Cache hits.", ["cache"], _cache_values("hits"))
+registry.callback_counter("fynace_cache_misses_total", "Cache misses.", ["cache"], _cache_values("misses"))
+registry.callback_counter("fynace_cache_evictions_total", "Cache LRU evictions.", ["cache"], _cache_values("evictions"))
+registry.gauge(
+    "fynace_cache_entries", "Entries currently cached.", ["cache"],
+    function=lambda: {(cache.name,): len(cache) for cache in _caches},
+)
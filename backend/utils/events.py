@@ -0,0 +1,131 @@
+"""In-process publish/subscribe of per-user events for Server-Sent Events streams.
+
+Each open stream is a Subscription with a bounded queue. Publishing never
+blocks: if a subscriber falls EVENTS_QUEUE_SIZE events behind, its backlog is
+replaced by a single "ressincronizar" event telling the client to fetch the
+state again, so a slow connection costs bounded memory and doesn't hold up
+anyone else. Events are published from request threads and background workers and
+delivered on the event loop of each subscriber.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, List, Optional, Set
+from backend.utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))
+EVENTS_MAX_PER_USER = int(os.getenv("EVENTS_MAX_PER_USER", "5"))
+
+EVENTS_PUBLISHED = registry.counter(
+    "fynace_events_published_total", "Events published to subscribers, by event type.", ["event"]
+)
+EVENTS_DROPPED = registry.counter(
+    "fynace_events_dropped_total", "Events dropped because a subscriber fell behind."
+)
+
+class Subscription:
+    """One open event stream of a user."""
+
+    def __init__(self, user_id: str, loop: asyncio.AbstractEventLoop, maxsize: int):
+        self.user_id = user_id
+        self.loop = loop
+        self.queue: "asyncio.Queue[str]" = asyncio.Queue(maxsize)
+        self.dropped = 0
+
+    def _put(self, message: str):
+        # Runs on the subscriber's event loop
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            backlog = self.queue.qsize()
+            self.dropped += backlog
+            EVENTS_DROPPED.inc(backlog)
+            logger.warning(f"Event stream of user {self.user_id} fell behind; dropped {backlog} events")
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(format_event("ressincronizar", {"motivo": "fila_cheia"}))
+
+    async def next(self, timeout: float) -> Optional[str]:
+        """The next encoded event, or None if none arrived within timeout."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+def format_event(event: str, data: Dict[str, Any], event_id: Optional[int] = None) -> str:
+    """Encode an event in the text/event-stream format."""
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data, default=str, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+class EventBus:
+    """Subscriptions by user ID."""
+
+    def __init__(self, queue_size: int = EVENTS_QUEUE_SIZE, max_per_user: int = EVENTS_MAX_PER_USER):
+        self.queue_size = queue_size
+        self.max_per_user = max_per_user
+        self._subscriptions: Dict[str, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+        self._next_id = 0
+
+    def subscribe(self, user_id: str) -> Optional[Subscription]:
+        """Open a subscription on the running loop; None if the user has too many."""
+        subscription = Subscription(user_id, asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            subscriptions = self._subscriptions.setdefault(user_id, set())
+            if len(subscriptions) >= self.max_per_user:
+                return None
+            subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def publish(self, user_id: str, event: str, data: Dict[str, Any]) -> int:
+        """Send an event to every stream of a user; return how many there were.
+
+        Safe to call from any thread.
+        """
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(user_id, ()))
+            if not subscriptions:
+                return 0
+            self._next_id += 1
+            event_id = self._next_id
+        # Encoded once, however many streams the user has open
+        message = format_event(event, data, event_id)
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._put, message)
+            except RuntimeError:
+                # The subscriber's loop has closed; its stream is gone
+                self.unsubscribe(subscription)
+        EVENTS_PUBLISHED.inc(event=event)
+        return len(subscriptions)
+
+    def subscribed_users(self) -> List[str]:
+        with self._lock:
+            return list(self._subscriptions)
+
+    def subscription_count(self) -> int:
+        with self._lock:
+            return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+# Global bus shared by the routes and background workers of this process
+event_bus = EventBus()
+
+registry.gauge(
+    "fynace_event_subscriptions", "Open event streams.",
+    function=lambda: {(): event_bus.subscription_count()},
+)
@@ -0,0 +1,35 @@
+"""Locking utilities for Fynace application."""
+import threading
+from contextlib import contextmanager
+from typing import Dict, Hashable, Iterator
+
+
+class KeyedLock:
+    """Hands out one lock per key, dropping it once no thread holds or waits on it."""
+
+    def __init__(self):
+        self._locks: Dict[Hashable, list] = {}
+        self._guard = threading.Lock()
+
+    @contextmanager
+    def acquire(self, key: Hashable) -> Iterator[None]:
+        """Hold the lock for key for the duration of the with-block."""
+        with self._guard:
+            entry = self._locks.get(key)
+            if entry is None:
+                # [lock, number of threads holding or waiting]
+                entry = self._locks[key] = [threading.Lock(), 0]
+            entry[1] += 1
+
+        entry[0].acquire()
+        try:
+            yield
+        finally:
+            entry[0].release()
+            with self._guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[key]
+
+    def __len__(self) -> int:
+        return len(self._locks)
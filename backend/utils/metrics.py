@@ -0,0 +1,362 @@
+"""Prometheus-style metrics registry for Fynace application.
+
+Counters, gauges and latency histograms are kept in process memory and
+rendered in the Prometheus text exposition format by the /metrics endpoint.
+
+When uvicorn runs several workers, set METRICS_MULTIPROC_DIR to a directory
+shared by all of them: every worker periodically writes a snapshot of its
+metrics there and /metrics merges the snapshots of all workers, so the answer
+doesn't depend on which worker served the scrape.
+"""
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from backend.utils.profiling import profiled_thread
+from backend.utils.tracing import current_trace
+
+METRICS_MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR")
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+
+# Latency buckets in seconds, tuned for calls to remote APIs
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+
+class Counter(_Metric):
+    """Monotonically increasing value."""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def snapshot(self) -> Dict[LabelValues, float]:
+        with self._lock:
+            return dict(self._values)
+
+
+class Gauge(_Metric):
+    """Value that can go up and down, optionally computed at collection time."""
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 function: Optional[Callable[[], Dict[LabelValues, float]]] = None):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._function = function
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def snapshot(self) -> Dict[LabelValues, float]:
+        if self._function is not None:
+            return dict(self._function())
+        with self._lock:
+            return dict(self._values)
+
+
+class Histogram(_Metric):
+    """Distribution of observed values (typically latencies in seconds)."""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def snapshot(self) -> Dict[LabelValues, List[float]]:
+        with self._lock:
+            return {key: list(series) for key, series in self._values.items()}
+
+
+class CallbackCounter(_Metric):
+    """Counter whose values are read from elsewhere at collection time."""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str],
+                 function: Callable[[], Dict[LabelValues, float]]):
+        super().__init__(name, documentation, labelnames)
+        self._function = function
+
+    def snapshot(self) -> Dict[LabelValues, float]:
+        return dict(self._function())
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class MetricsRegistry:
+    """Collection of named metrics with multiprocess-aware text rendering."""
+
+    def __init__(self, multiproc_dir: Optional[str] = None):
+        self.multiproc_dir = multiproc_dir
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _register(self, metric: _Metric) -> Any:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+              function: Optional[Callable[[], Dict[LabelValues, float]]] = None) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames, function))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback_counter(self, name: str, documentation: str, labelnames: Sequence[str],
+                         function: Callable[[], Dict[LabelValues, float]]) -> CallbackCounter:
+        return self._register(CallbackCounter(name, documentation, labelnames, function))
+
+    def collect(self) -> Dict[str, Dict[str, Any]]:
+        """Return a JSON-serializable snapshot of every metric in this process."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        result = {}
+        for metric in metrics:
+            entry = {
+                "type": metric.type_name,
+                "help": metric.documentation,
+                "labels": list(metric.labelnames),
+                "samples": [[list(key), value] for key, value in metric.snapshot().items()],
+            }
+            if isinstance(metric, Histogram):
+                entry["buckets"] = list(metric.buckets)
+            result[metric.name] = entry
+        return result
+
+    # Multiprocess support
+
+    def _snapshot_path(self, pid: int) -> str:
+        return os.path.join(self.multiproc_dir, f"metrics-{pid}.json")
+
+    def flush(self):
+        """Write this process's snapshot to the shared directory."""
+        if not self.multiproc_dir:
+            return
+        os.makedirs(self.multiproc_dir, exist_ok=True)
+        path = self._snapshot_path(os.getpid())
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.collect(), f)
+        os.replace(tmp_path, path)
+
+    def _read_snapshots(self) -> List[Tuple[bool, Dict[str, Any]]]:
+        snapshots = []
+        for filename in os.listdir(self.multiproc_dir):
+            if not (filename.startswith("metrics-") and filename.endswith(".json")):
+                continue
+            pid = int(filename[len("metrics-"):-len(".json")])
+            try:
+                with open(os.path.join(self.multiproc_dir, filename)) as f:
+                    snapshots.append((_pid_alive(pid), json.load(f)))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    def _merged(self) -> Dict[str, Dict[str, Any]]:
+        if not self.multiproc_dir:
+            return self.collect()
+
+        self.flush()
+        merged: Dict[str, Dict[str, Any]] = {}
+        for alive, snapshot in self._read_snapshots():
+            for name, entry in snapshot.items():
+                # Counters and histograms of exited workers still count;
+                # their gauges no longer describe anything live
+                if entry["type"] == "gauge" and not alive:
+                    continue
+                target = merged.setdefault(name, {**entry, "samples": {}})
+                for key, value in entry["samples"]:
+                    key = tuple(key)
+                    if entry["type"] == "histogram":
+                        current = target["samples"].get(key)
+                        target["samples"][key] = value if current is None else [a + b for a, b in zip(current, value)]
+                    else:
+                        target["samples"][key] = target["samples"].get(key, 0.0) + value
+        for entry in merged.values():
+            entry["samples"] = list(entry["samples"].items())
+        return merged
+
+    def render(self) -> str:
+        """Render all metrics (merged across workers) in text exposition format."""
+        lines = []
+        for name, entry in sorted(self._merged().items()):
+            lines.append(f"# HELP {name} {entry['help']}")
+            lines.append(f"# TYPE {name} {entry['type']}")
+            labelnames = entry["labels"]
+            for key, value in sorted(entry["samples"], key=lambda sample: tuple(sample[0])):
+                if entry["type"] == "histogram":
+                    cumulative = 0.0
+                    bounds = list(entry["buckets"]) + [math.inf]
+                    for bound, count in zip(bounds, value[:-1]):
+                        cumulative += count
+                        labels = _format_labels(labelnames, key, (("le", _format_value(bound)),))
+                        lines.append(f"{name}_bucket{labels} {_format_value(cumulative)}")
+                    labels = _format_labels(labelnames, key)
+                    lines.append(f"{name}_sum{labels} {_format_value(value[-1])}")
+                    lines.append(f"{name}_count{labels} {_format_value(cumulative)}")
+                else:
+                    lines.append(f"{name}{_format_labels(labelnames, key)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def _run(self):
+        while not self._stop.wait(METRICS_FLUSH_INTERVAL):
+            try:
+                self.flush()
+            except OSError:
+                pass
+
+    def start(self):
+        """Periodically flush snapshots when running with several workers."""
+        if not self.multiproc_dir or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="metrics-flush", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the flush thread, writing one last snapshot."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.flush()
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# Global registry instance
+registry = MetricsRegistry(METRICS_MULTIPROC_DIR)
+
+HTTP_REQUESTS = registry.counter(
+    "fynace_http_requests_total", "HTTP requests handled.", ["method", "route", "status"]
+)
+HTTP_LATENCY = registry.histogram(
+    "fynace_http_request_duration_seconds", "HTTP request latency.", ["method", "route"]
+)
+DEPENDENCY_CALLS = registry.counter(
+    "fynace_dependency_calls_total", "Calls to external services.", ["dependency", "operation", "outcome"]
+)
+DEPENDENCY_LATENCY = registry.histogram(
+    "fynace_dependency_call_duration_seconds", "Latency of calls to external services.", ["dependency", "operation"]
+)
+
+
+@contextmanager
+def track_dependency(dependency: str, operation: str) -> Iterator[None]:
+    """Count and time one outbound call (Sheets, Supabase, Mercado Pago, JWKS).
+
+    The call is also added to the current request's trace, if tracing is on,
+    and the calling thread is sampled for its profile during the call, if it
+    is being profiled.
+    """
+    trace = current_trace()
+    start = time.perf_counter()
+    outcome = "success"
+    try:
+        with profiled_thread():
+            yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        DEPENDENCY_CALLS.inc(dependency=dependency, operation=operation, outcome=outcome)
+        DEPENDENCY_LATENCY.observe(elapsed, dependency=dependency, operation=operation)
+        if trace is not None:
+            trace.add(f"{dependency}.{operation}", elapsed)
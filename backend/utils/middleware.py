@@ -0,0 +1,114 @@
+"""ASGI middleware for request logging, timing and security headers."""
+import time
+from typing import List, Tuple
+from backend.utils.metrics import HTTP_REQUESTS, HTTP_LATENCY
+from backend.utils.monitoring import monitoring_service
+from backend.utils.security import SecurityMiddleware
+from backend.utils.tracing import start_trace, end_trace, current_trace
+from backend.utils.profiling import PROFILE_HEADER, start_profile, finish_profile
+
+class RequestMonitoringMiddleware:
+    """Pure ASGI middleware that logs, times and secures every HTTP response.
+
+    Unlike a BaseHTTPMiddleware function it doesn't wrap the response in a
+    streaming proxy: it only edits the headers of the http.response.start
+    message, using a header list built once at startup.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        # Security headers never change, so encode them once
+        self.static_headers: List[Tuple[bytes, bytes]] = [
+            (name.lower().encode("latin-1"), value.encode("latin-1"))
+            for name, value in SecurityMiddleware.SECURITY_HEADERS.items()
+        ]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        method = scope["method"]
+        path = scope["path"]
+
+        # Single pass over the raw request headers
+        authorization = user_agent = content_type = profile_header = None
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                authorization = value
+            elif name == b"user-agent":
+                user_agent = value
+            elif name == b"content-type":
+                content_type = value
+            elif name == PROFILE_HEADER:
+                profile_header = value
+
+        # The token is only validated by the routes; here we just note its presence
+        user_id = "authenticated_user" if authorization and authorization.startswith(b"Bearer ") else "unknown"
+        client = scope.get("client")
+
+        # Log the incoming request
+        monitoring_service.log_api_call(
+            user_id=user_id,
+            endpoint=path,
+            method=method,
+            success=True,
+            details={
+                "client_host": client[0] if client else "unknown",
+                "user_agent": user_agent.decode("latin-1") if user_agent else "unknown",
+                "content_type": content_type.decode("latin-1") if content_type else "unknown"
+            }
+        )
+
+        # Collect outbound call timings for this request (no-op unless enabled)
+        trace_token = start_trace()
+        trace = current_trace()
+        # Sample the request's stacks when profiling picks it (no-op unless enabled)
+        profile, profile_token = start_profile(method, path, profile_header)
+        status_code = 500
+
+        async def send_with_headers(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                process_time = time.perf_counter() - start_time
+                headers = list(message.get("headers", ()))
+                headers.append((b"x-process-time", str(process_time).encode("latin-1")))
+                if trace is not None:
+                    headers.append((b"server-timing", trace.server_timing(process_time).encode("latin-1")))
+                if profile is not None and profile.requested:
+                    headers.append((b"x-fynace-profile-id", profile.id.encode("latin-1")))
+                headers.extend(self.static_headers)
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            end_trace(trace_token)
+            process_time = time.perf_counter() - start_time
+
+            # Record request metrics by route template to keep label cardinality bounded
+            route = getattr(scope.get("route"), "path", "unmatched")
+            finish_profile(profile, profile_token, route, process_time)
+            HTTP_REQUESTS.inc(method=method, route=route, status=status_code)
+            HTTP_LATENCY.observe(process_time, method=method, route=route)
+
+            if trace is not None:
+                monitoring_service.log_request_trace(
+                    user_id=user_id,
+                    endpoint=path,
+                    method=method,
+                    total_ms=process_time * 1000,
+                    spans=trace.as_dict()
+                )
+
+            # Log the response
+            monitoring_service.log_api_response(
+                user_id=user_id,
+                endpoint=path,
+                method=method,
+                status_code=status_code,
+                process_time=process_time
+            )
@@ -1,11 +1,15 @@
 """Comprehensive logging and monitoring configuration for Fynace application."""
 import logging
+import queue
 import sys
 import os
+import threading
 from datetime import datetime
-from typing import Dict, Any
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Any, List, Optional
 from pydantic import BaseModel
 import json
+from backend.utils.metrics import registry
 
 class LogConfig:
     """Configuration for logging."""
@@ -20,6 +24,11 @@ class LogConfig:
     LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", "10485760"))  # 10MB
     LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
 
+    # Monitoring events are written by a background thread
+    MONITORING_ASYNC = os.getenv("MONITORING_ASYNC", "true").lower() == "true"
+    MONITORING_QUEUE_SIZE = int(os.getenv("MONITORING_QUEUE_SIZE", "10000"))
+    MONITORING_BATCH_SIZE = int(os.getenv("MONITORING_BATCH_SIZE", "100"))
+
 def setup_logging():
     """Set up comprehensive logging configuration."""
     from logging.handlers import RotatingFileHandler
@@ -79,63 +88,173 @@ class MonitoringEvent(BaseModel):
     details: Dict[str, Any] = {}
     success: bool = True
 
+class EventPayload:
+    """Monitoring event data, JSON-encoded only when the log record is formatted."""
+
+    __slots__ = ("data",)
+
+    def __init__(self, data: Dict[str, Any]):
+        self.data = data
+
+    def __str__(self) -> str:
+        data = dict(self.data)
+        data["timestamp"] = data["timestamp"].isoformat()
+        return json.dumps(data, default=str)
+
+class DroppingQueueHandler(QueueHandler):
+    """Queue handler that never blocks: records are dropped when the queue is full."""
+
+    def __init__(self, queue_: queue.Queue):
+        super().__init__(queue_)
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Leave formatting (and JSON encoding) to the listener thread
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+class BatchingQueueListener(QueueListener):
+    """Queue listener that drains records in batches and writes each batch at once."""
+
+    def __init__(self, queue_: queue.Queue, *handlers: logging.Handler, batch_size: int = 100):
+        super().__init__(queue_, *handlers, respect_handler_level=True)
+        self.batch_size = batch_size
+
+    def enqueue_sentinel(self):
+        # Wait for room instead of failing when the queue is full at shutdown
+        self.queue.put(self._sentinel)
+
+    def _monitor(self):
+        q = self.queue
+        while True:
+            batch = [q.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(q.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = batch[-1] is self._sentinel
+            records = [r for r in batch if r is not self._sentinel]
+            if records:
+                self.handle_batch(records)
+            for _ in batch:
+                q.task_done()
+            if stop:
+                break
+
+    def handle_batch(self, records: List[logging.LogRecord]):
+        """Hand a batch of records to every handler."""
+        for handler in self.handlers:
+            accepted = [r for r in records if r.levelno >= handler.level and handler.filter(r)]
+            if not accepted:
+                continue
+            # Plain stream handlers get one write and one flush per batch
+            if type(handler) is logging.StreamHandler:
+                try:
+                    text = "".join(handler.format(r) + handler.terminator for r in accepted)
+                    with handler.lock:
+                        handler.stream.write(text)
+                        handler.flush()
+                except Exception:
+                    handler.handleError(accepted[0])
+            else:
+                for record in accepted:
+                    handler.handle(record)
+
 class MonitoringService:
     """Service for application monitoring and metrics."""
     
     def __init__(self):
         self.logger = get_logger("monitoring")
+        self._queue_handler: Optional[DroppingQueueHandler] = None
+        self._listener: Optional[BatchingQueueListener] = None
+
+    def start(self, handlers: Optional[List[logging.Handler]] = None):
+        """Move event writing to a background thread.
+
+        Events are queued by the request path and written by a listener thread
+        to the given handlers (by default the root logger's handlers). Until
+        started, events are logged synchronously.
+        """
+        if self._listener is not None or not LogConfig.MONITORING_ASYNC:
+            return
+        if handlers is None:
+            handlers = list(logging.getLogger().handlers)
+
+        event_queue = queue.Queue(maxsize=LogConfig.MONITORING_QUEUE_SIZE)
+        self._queue_handler = DroppingQueueHandler(event_queue)
+        self._listener = BatchingQueueListener(
+            event_queue, *handlers, batch_size=LogConfig.MONITORING_BATCH_SIZE
+        )
+        self._listener.start()
+        self.logger.addHandler(self._queue_handler)
+        self.logger.propagate = False
+
+    def stop(self):
+        """Flush queued events and go back to synchronous logging."""
+        if self._listener is None:
+            return
+        self.logger.removeHandler(self._queue_handler)
+        self.logger.propagate = True
+        self._listener.stop()
+        self._listener = None
+
+    @property
+    def dropped_events(self) -> int:
+        """Number of events dropped because the queue was full."""
+        return self._queue_handler.dropped if self._queue_handler else 0
+
+    def _emit(self, event_type: str, user_id: Optional[str], action: str, details: Dict[str, Any], success: bool):
+        payload = EventPayload({
+            "timestamp": datetime.now(),
+            "event_type": event_type,
+            "user_id": user_id,
+            "action": action,
+            "details": details,
+            "success": success
+        })
+        level = logging.INFO if success else logging.WARNING
+        if self.logger.isEnabledFor(level):
+            self.logger.log(level, "MONITORING_EVENT: %s", payload)
     
     def log_event(self, event: MonitoringEvent):
         """Log a monitoring event."""
-        log_data = {
-            "timestamp": event.timestamp.isoformat(),
-            "event_type": event.event_type,
-            "user_id": event.user_id,
-            "action": event.action,
-            "details": event.details,
-            "success": event.success
-        }
-        
-        if event.success:
-            self.logger.info(f"MONITORING_EVENT: {json.dumps(log_data)}")
-        else:
-            self.logger.warning(f"MONITORING_EVENT: {json.dumps(log_data)}")
+        self._emit(event.event_type, event.user_id, event.action, event.details, event.success)
     
     def log_api_call(self, user_id: str, endpoint: str, method: str, success: bool, details: Dict[str, Any] = None):
         """Log an API call event."""
-        event = MonitoringEvent(
-            timestamp=datetime.now(),
-            event_type="api_call",
-            user_id=user_id,
-            action=f"{method} {endpoint}",
-            details=details or {},
-            success=success
-        )
-        self.log_event(event)
+        self._emit("api_call", user_id, f"{method} {endpoint}", details or {}, success)
+
+    def log_api_response(self, user_id: str, endpoint: str, method: str, status_code: int, process_time: float):
+        """Log an API response event."""
+        details = {"status_code": status_code, "process_time": process_time}
+        self._emit("api_response", user_id, f"{method} {endpoint}", details, status_code < 400)
+    
+    def log_request_trace(self, user_id: str, endpoint: str, method: str, total_ms: float, spans: Dict[str, Any]):
+        """Log the outbound call timings of one request."""
+        details = {"total_ms": round(total_ms, 3), "spans": spans}
+        self._emit("request_trace", user_id, f"{method} {endpoint}", details, True)
     
     def log_transaction_operation(self, user_id: str, operation: str, success: bool, details: Dict[str, Any] = None):
         """Log a transaction operation event."""
-        event = MonitoringEvent(
-            timestamp=datetime.now(),
-            event_type="transaction_operation",
-            user_id=user_id,
-            action=operation,
-            details=details or {},
-            success=success
-        )
-        self.log_event(event)
+        self._emit("transaction_operation", user_id, operation, details or {}, success)
     
     def log_auth_event(self, user_id: str, event_type: str, success: bool, details: Dict[str, Any] = None):
         """Log an authentication event."""
-        event = MonitoringEvent(
-            timestamp=datetime.now(),
-            event_type="auth_event",
-            user_id=user_id,
-            action=event_type,
-            details=details or {},
-            success=success
-        )
-        self.log_event(event)
+        self._emit("auth_event", user_id, event_type, details or {}, success)
 
 # Global monitoring service instance
-monitoring_service = MonitoringService()
\ No newline at end of file
+monitoring_service = MonitoringService()
+
+registry.callback_counter(
+    "fynace_monitoring_events_dropped_total", "Monitoring events dropped because the queue was full.", [],
+    lambda: {(): monitoring_service.dropped_events},
+)
\ No newline at end of file
@@ -0,0 +1,221 @@
+"""Opt-in per-request sampling profiler for Fynace application.
+
+With PROFILING_ENABLED set, a request is profiled when it carries the
+X-Fynace-Profile header matching PROFILE_TOKEN (the header is ignored while no
+token is configured) or is picked at random with probability
+PROFILE_SAMPLE_RATE. While it runs, a background thread samples every
+PROFILE_INTERVAL_MS the stacks of the threads inside one of its traced spans
+or outbound calls; a thread stops being sampled when it leaves them, so work
+done for other requests isn't mixed in. The result is written to PROFILE_DIR
+in the collapsed stack format read by flamegraph.pl and speedscope, tagged
+with the route and a hash of the user.
+
+Sampled requests faster than PROFILE_MIN_DURATION_MS are discarded, so a
+sample rate of 1 with a threshold keeps profiles of slow requests only.
+"""
+import hashlib
+import hmac
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+PROFILE_HEADER = b"x-fynace-profile"
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_MIN_DURATION_MS = float(os.getenv("PROFILE_MIN_DURATION_MS", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+# Upper bound on requests profiled at the same time, to cap the overhead
+PROFILE_MAX_ACTIVE = int(os.getenv("PROFILE_MAX_ACTIVE", "4"))
+PROFILE_MAX_DEPTH = 128
+
+# Waits that mean a thread is idle rather than working on the request
+_IDLE_FRAMES = {("selectors.py", "select"), ("queue.py", "get")}
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def _is_idle(frame) -> bool:
+    for _ in range(3):
+        if frame is None:
+            return False
+        if (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in _IDLE_FRAMES:
+            return True
+        frame = frame.f_back
+    return False
+
+def _collapse(frame) -> str:
+    names = []
+    while frame is not None and len(names) < PROFILE_MAX_DEPTH:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    names.reverse()
+    return ";".join(names)
+
+class RequestProfile:
+    """Stack samples collected for one request."""
+
+    def __init__(self, method: str, path: str, requested: bool):
+        self.id = uuid.uuid4().hex[:12]
+        self.method = method
+        self.path = path
+        self.requested = requested
+        self.user_hash = "anonymous"
+        # Thread ID -> nesting depth of the blocks it is sampled for
+        self.thread_ids: Counter = Counter()
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._lock = threading.Lock()
+
+    def attach(self, thread_id: int):
+        with self._lock:
+            self.thread_ids[thread_id] += 1
+
+    def detach(self, thread_id: int):
+        with self._lock:
+            self.thread_ids[thread_id] -= 1
+            if self.thread_ids[thread_id] <= 0:
+                del self.thread_ids[thread_id]
+
+    def add_sample(self, frames):
+        with self._lock:
+            thread_ids = list(self.thread_ids)
+        for thread_id in thread_ids:
+            frame = frames.get(thread_id)
+            if frame is None or _is_idle(frame):
+                continue
+            stack = _collapse(frame)
+            with self._lock:
+                self.stacks[stack] += 1
+                self.samples += 1
+
+    def collapsed(self) -> str:
+        """Return the samples in the collapsed stack format."""
+        with self._lock:
+            return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+class SamplingProfiler:
+    """Background thread sampling the stacks of threads serving profiled requests."""
+
+    def __init__(self, interval: float, max_active: int):
+        self.interval = interval
+        self.max_active = max_active
+        self._active: List[RequestProfile] = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def begin(self, profile: RequestProfile) -> bool:
+        """Start sampling for a profile; False if too many are already running."""
+        with self._lock:
+            if len(self._active) >= self.max_active:
+                return False
+            self._active.append(profile)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+        return True
+
+    def end(self, profile: RequestProfile):
+        with self._lock:
+            if profile in self._active:
+                self._active.remove(profile)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                active = list(self._active)
+                if not active:
+                    self._wakeup.clear()
+            if not active:
+                self._wakeup.wait()
+                continue
+            frames = sys._current_frames()
+            for profile in active:
+                profile.add_sample(frames)
+            del frames
+            time.sleep(self.interval)
+
+profiler = SamplingProfiler(PROFILE_INTERVAL_MS / 1000, PROFILE_MAX_ACTIVE)
+
+_current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("fynace_request_profile", default=None)
+
+def start_profile(method: str, path: str, header: Optional[bytes]) -> Tuple[Optional[RequestProfile], Optional[Token]]:
+    """Decide whether to profile this request and, if so, start sampling it."""
+    if not PROFILING_ENABLED:
+        return None, None
+    # Without a token anyone could force profiles (and files in PROFILE_DIR)
+    requested = (
+        header is not None and PROFILE_TOKEN is not None
+        and hmac.compare_digest(header.decode("latin-1"), PROFILE_TOKEN)
+    )
+    if not requested and random.random() >= PROFILE_SAMPLE_RATE:
+        return None, None
+
+    profile = RequestProfile(method, path, requested)
+    if not profiler.begin(profile):
+        logger.debug(f"Profiler busy, not profiling {method} {path}")
+        return None, None
+    # Threads join only while inside profiled_thread(): the event loop and
+    # the threadpool also serve other requests
+    return profile, _current_profile.set(profile)
+
+@contextmanager
+def profiled_thread() -> Iterator[None]:
+    """Sample the calling thread as part of the current request's profile during the with-block."""
+    profile = _current_profile.get()
+    if profile is None:
+        yield
+        return
+    thread_id = threading.get_ident()
+    profile.attach(thread_id)
+    try:
+        yield
+    finally:
+        profile.detach(thread_id)
+
+def tag_user(user_id: Optional[str]):
+    """Tag the current request's profile with a hash of the authenticated user."""
+    profile = _current_profile.get()
+    if profile is not None and user_id:
+        profile.user_hash = hashlib.sha256(user_id.encode()).hexdigest()[:12]
+
+def finish_profile(profile: Optional[RequestProfile], token: Optional[Token], route: str, duration: float):
+    """Stop sampling and write the profile if it should be kept."""
+    if profile is None:
+        return
+    _current_profile.reset(token)
+    profiler.end(profile)
+
+    duration_ms = duration * 1000
+    # Explicitly requested profiles are always kept
+    if not profile.samples or (not profile.requested and duration_ms < PROFILE_MIN_DURATION_MS):
+        return
+
+    route_tag = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+    file_name = (
+        f"{time.strftime('%Y%m%dT%H%M%S')}-{profile.method}-{route_tag}-"
+        f"{profile.user_hash}-{duration_ms:.0f}ms-{profile.id}.collapsed"
+    )
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        with open(os.path.join(PROFILE_DIR, file_name), "w") as f:
+            f.write(profile.collapsed())
+    except OSError as e:
+        logger.warning(f"Erro ao salvar perfil da requisição: {e}")
+        return
+    logger.info(f"Request profile saved: {file_name} ({profile.samples} samples)")
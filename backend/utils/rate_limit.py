@@ -0,0 +1,215 @@
+"""Per-user admission control for Fynace application.
+
+Every Google Sheets call goes through one service account, so its quota is
+shared by all users. Routes that call Sheets declare a RateLimiter as a route
+dependency: it runs right after authentication, before the spreadsheet is
+resolved, and rejects a user over their sliding-window budget with 429 and a
+Retry-After header.
+
+The window lives in process memory by default. With RATE_LIMIT_BACKEND=sqlite
+the workers of one host share it through a SQLite file instead.
+"""
+import logging
+import math
+import re
+import threading
+import time
+from collections import Counter, deque
+from typing import Deque, Dict, List, Optional, Tuple
+from fastapi import Depends, HTTPException, status
+from backend.auth_utils import get_current_user
+from backend.config_modules.security_config import get_security_config
+from backend.utils.metrics import registry
+from backend.utils.sqlite import SQLiteDatabase
+
+logger = logging.getLogger(__name__)
+
+_UNITS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+_RATE = re.compile(r"^\s*(\d+)\s*/\s*(\d*)\s*(second|minute|hour|day)s?\s*$")
+
+def parse_rate(rate: str) -> Tuple[int, float]:
+    """Parse "10/minute" or "100/2hours" into (limit, window seconds)."""
+    match = _RATE.match(rate.lower())
+    if not match:
+        raise ValueError(f"Invalid rate limit: {rate!r}")
+    limit, multiplier, unit = match.groups()
+    return int(limit), int(multiplier or 1) * _UNITS[unit]
+
+class MemoryBackend:
+    """Sliding-window log of admitted requests per key, held in process memory."""
+
+    # Drop keys idle for a full window (their own) every this many hits
+    SWEEP_EVERY = 1000
+
+    def __init__(self):
+        self._hits: Dict[str, Deque[float]] = {}
+        # Window of each key; limiters with different windows share the backend
+        self._windows: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._calls = 0
+
+    def hit(self, key: str, limit: int, window: float, cost: int = 1) -> Tuple[bool, float]:
+        """Record cost hits for key if they fit; return (allowed, retry_after)."""
+        now = time.monotonic()
+        with self._lock:
+            self._calls += 1
+            if self._calls % self.SWEEP_EVERY == 0:
+                self._sweep(now)
+            hits = self._hits.setdefault(key, deque())
+            self._windows[key] = window
+            while hits and hits[0] <= now - window:
+                hits.popleft()
+            if len(hits) + cost > limit:
+                # Wait until enough of the oldest hits leave the window
+                index = min(len(hits), len(hits) + cost - limit) - 1
+                return False, hits[index] + window - now if index >= 0 else window
+            hits.extend([now] * cost)
+            return True, 0.0
+
+    def _sweep(self, now: float):
+        idle = [k for k, hits in self._hits.items() if not hits or hits[-1] <= now - self._windows[k]]
+        for key in idle:
+            del self._hits[key]
+            del self._windows[key]
+
+class SQLiteBackend:
+    """Sliding-window log shared by every worker that opens the same SQLite file."""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS rate_limit_hits (key TEXT NOT NULL, ts REAL NOT NULL);
+    CREATE INDEX IF NOT EXISTS rate_limit_hits_key_ts ON rate_limit_hits (key, ts);
+    """
+
+    def __init__(self, path: str):
+        self.db = SQLiteDatabase(path, self.SCHEMA)
+        self.db.connect()
+
+    def hit(self, key: str, limit: int, window: float, cost: int = 1) -> Tuple[bool, float]:
+        # Wall clock, since monotonic clocks aren't comparable across processes
+        now = time.time()
+        with self.db.transaction() as conn:
+            conn.execute("DELETE FROM rate_limit_hits WHERE key = ? AND ts <= ?", (key, now - window))
+            timestamps = [row[0] for row in conn.execute(
+                "SELECT ts FROM rate_limit_hits WHERE key = ? ORDER BY ts", (key,)
+            )]
+            if len(timestamps) + cost > limit:
+                index = min(len(timestamps), len(timestamps) + cost - limit) - 1
+                return False, timestamps[index] + window - now if index >= 0 else window
+            conn.executemany("INSERT INTO rate_limit_hits (key, ts) VALUES (?, ?)", [(key, now)] * cost)
+            return True, 0.0
+
+class RateLimitSettings:
+    """Process-wide limiter configuration, set by setup_rate_limiting()."""
+
+    def __init__(self):
+        # Limiters admit everything until rate limiting is set up
+        self.enabled = False
+        self.backend = MemoryBackend()
+
+settings = RateLimitSettings()
+
+def configure_rate_limiting(enabled: bool = True, backend: str = "memory", sqlite_path: Optional[str] = None):
+    """Turn limiters on and choose where their windows are stored."""
+    if backend == "sqlite":
+        if not sqlite_path:
+            raise ValueError("RATE_LIMIT_SQLITE_PATH is required for the sqlite rate limit backend")
+        settings.backend = SQLiteBackend(sqlite_path)
+    elif backend == "memory":
+        settings.backend = MemoryBackend()
+    else:
+        raise ValueError(f"Unknown rate limit backend: {backend!r}")
+    settings.enabled = enabled
+    logger.info(f"Rate limiting {'enabled' if enabled else 'disabled'} ({backend} backend)")
+
+DECISIONS = registry.counter(
+    "fynace_rate_limit_decisions_total", "Admission decisions of per-user rate limiters.", ["limiter", "decision"]
+)
+
+_limiters: List["RateLimiter"] = []
+
+class RateLimiter:
+    """Per-user request budget shared by a group of routes.
+
+    The instance is itself a FastAPI dependency spending one unit per request;
+    costing(n) gives one for routes that make n Sheets calls per request.
+    """
+
+    def __init__(self, name: str, rate: str):
+        self.name = name
+        self.rate = rate
+        self.limit, self.window = parse_rate(rate)
+        # Admitted units per user in the current window period, for fairness metrics
+        self._admitted: Counter = Counter()
+        self._period_start = time.monotonic()
+        self._lock = threading.Lock()
+        _limiters.append(self)
+
+    def __call__(self, user=Depends(get_current_user)):
+        self.check(user, 1)
+
+    def costing(self, cost: int):
+        """A dependency spending cost units of this budget per request."""
+        if cost > self.limit:
+            # Such a request could never be admitted, whatever Retry-After says
+            raise ValueError(f"Cost {cost} exceeds the {self.name} limit of {self.rate}")
+        def dependency(user=Depends(get_current_user)):
+            self.check(user, cost)
+        return dependency
+
+    def check(self, user: Dict[str, str], cost: int = 1):
+        """Admit the request or raise 429 with the seconds to wait in Retry-After."""
+        if not settings.enabled:
+            return
+        user_id = user.get("id") or "unknown"
+        allowed, retry_after = settings.backend.hit(f"{self.name}:{user_id}", self.limit, self.window, cost)
+        if not allowed:
+            DECISIONS.inc(limiter=self.name, decision="rejected")
+            retry_after = max(1, math.ceil(retry_after))
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=f"Limite de requisições excedido. Tente novamente em {retry_after} segundos.",
+                headers={"Retry-After": str(retry_after)},
+            )
+        DECISIONS.inc(limiter=self.name, decision="admitted")
+        self._record(user_id, cost)
+
+    def _record(self, user_id: str, cost: int):
+        with self._lock:
+            now = time.monotonic()
+            if now - self._period_start >= self.window:
+                self._admitted.clear()
+                self._period_start = now
+            self._admitted[user_id] += cost
+
+    def fairness(self) -> Tuple[float, float]:
+        """Jain's fairness index and the busiest user's share of admitted units.
+
+        The index is 1.0 when every active user got the same share and falls
+        towards 1/n as one user takes everything.
+        """
+        with self._lock:
+            counts = list(self._admitted.values())
+        total = sum(counts)
+        if not total:
+            return 1.0, 0.0
+        return total * total / (len(counts) * sum(c * c for c in counts)), max(counts) / total
+
+def _fairness_values(index: int):
+    return lambda: {(limiter.name,): limiter.fairness()[index] for limiter in _limiters}
+
+registry.gauge(
+    "fynace_rate_limit_fairness_index",
+    "Jain's fairness index of admitted requests across users in the current window.",
+    ["limiter"], function=_fairness_values(0),
+)
+registry.gauge(
+    "fynace_rate_limit_top_user_share",
+    "Share of admitted requests taken by the busiest user in the current window.",
+    ["limiter"], function=_fairness_values(1),
+)
+
+_config = get_security_config()
+# Routes reading from the user's spreadsheet
+sheets_read_limit = RateLimiter("sheets_read", _config["RATE_LIMIT_SHEETS_READ"])
+# Routes writing to the user's spreadsheet
+sheets_write_limit = RateLimiter("sheets_write", _config["RATE_LIMIT_TRANSACTIONS"])
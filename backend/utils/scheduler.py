@@ -0,0 +1,173 @@
+"""Fair scheduling of outbound calls for Fynace application."""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Hashable, Iterator, List, Optional
+from fastapi import HTTPException
+from backend.utils.metrics import registry
+from backend.utils.tracing import current_trace
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+PRIORITIES = (INTERACTIVE, BATCH)
+
+QUEUE_WAIT = registry.histogram(
+    "fynace_scheduler_queue_wait_seconds", "Time calls waited for a scheduler slot.", ["scheduler", "priority"]
+)
+
+_schedulers: List["FairScheduler"] = []
+
+class _Waiter:
+    __slots__ = ("key", "priority", "cost", "enqueued_at", "event", "granted")
+
+    def __init__(self, key: Hashable, priority: str, cost: int):
+        self.key = key
+        self.priority = priority
+        self.cost = cost
+        self.enqueued_at = time.monotonic()
+        self.event = threading.Event()
+        self.granted = False
+
+class _PriorityClass:
+    """Deficit round robin over per-key queues of one priority."""
+
+    def __init__(self, quantum: int):
+        self.quantum = quantum
+        self.queues: Dict[Hashable, Deque[_Waiter]] = {}
+        self.ring: Deque[Hashable] = deque()
+        self.deficit: Dict[Hashable, int] = {}
+        # Whether the key at the head of the ring already got its quantum
+        self.turn_started = False
+        self.waiting = 0
+
+    def push(self, waiter: _Waiter):
+        queue = self.queues.get(waiter.key)
+        if queue is None:
+            queue = self.queues[waiter.key] = deque()
+            self.ring.append(waiter.key)
+            self.deficit[waiter.key] = 0
+        queue.append(waiter)
+        self.waiting += 1
+
+    def oldest(self) -> Optional[float]:
+        """Enqueue time of the longest-waiting call at the head of any queue."""
+        return min((queue[0].enqueued_at for queue in self.queues.values()), default=None)
+
+    def pop(self) -> Optional[_Waiter]:
+        while self.ring:
+            key = self.ring[0]
+            queue = self.queues[key]
+            if not self.turn_started:
+                self.deficit[key] += self.quantum
+                self.turn_started = True
+            if queue[0].cost <= self.deficit[key]:
+                waiter = queue.popleft()
+                self.deficit[key] -= waiter.cost
+                self.waiting -= 1
+                if not queue:
+                    self._drop(key)
+                return waiter
+            # Not enough credit left: next key's turn
+            self.ring.rotate(-1)
+            self.turn_started = False
+        return None
+
+    def remove(self, waiter: _Waiter):
+        queue = self.queues.get(waiter.key)
+        if queue is None or waiter not in queue:
+            return
+        queue.remove(waiter)
+        self.waiting -= 1
+        if not queue:
+            self._drop(waiter.key)
+
+    def _drop(self, key: Hashable):
+        if self.ring[0] == key:
+            self.turn_started = False
+        del self.queues[key]
+        del self.deficit[key]
+        self.ring.remove(key)
+
+class FairScheduler:
+    """Caps concurrent outbound calls and hands free slots out fairly.
+
+    Calls queue per key (one key per user), and keys take turns by deficit
+    round robin, so one user's burst can't hold every slot while others wait.
+    Interactive calls go before batch calls, except that a batch call waiting
+    longer than batch_max_wait is served next so batch work never starves.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, quantum: int = 1,
+                 batch_max_wait: float = 1.0, timeout: float = 30.0):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.batch_max_wait = batch_max_wait
+        self.timeout = timeout
+        self.in_flight = 0
+        self._classes = {priority: _PriorityClass(quantum) for priority in PRIORITIES}
+        self._lock = threading.Lock()
+        _schedulers.append(self)
+
+    @contextmanager
+    def slot(self, key: Hashable, priority: str = INTERACTIVE, cost: int = 1) -> Iterator[None]:
+        """Wait for a slot for key, hold it for the with-block, then release it."""
+        waiter = _Waiter(key, priority, cost)
+        with self._lock:
+            self._classes[priority].push(waiter)
+            self._dispatch()
+
+        if not waiter.event.wait(self.timeout):
+            with self._lock:
+                if not waiter.granted:
+                    self._classes[priority].remove(waiter)
+                    raise HTTPException(
+                        status_code=503,
+                        detail="Serviço do Google Sheets ocupado. Tente novamente em instantes.",
+                        headers={"Retry-After": "5"},
+                    )
+
+        waited = time.monotonic() - waiter.enqueued_at
+        QUEUE_WAIT.observe(waited, scheduler=self.name, priority=priority)
+        trace = current_trace()
+        if trace is not None:
+            trace.add(f"{self.name}.queue", waited)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                self._dispatch()
+
+    def _dispatch(self):
+        """Grant free slots to queued calls. Caller holds the lock."""
+        while self.in_flight < self.max_concurrency:
+            waiter = self._next()
+            if waiter is None:
+                return
+            waiter.granted = True
+            self.in_flight += 1
+            waiter.event.set()
+
+    def _next(self) -> Optional[_Waiter]:
+        interactive = self._classes[INTERACTIVE]
+        batch = self._classes[BATCH]
+        oldest_batch = batch.oldest()
+        if oldest_batch is not None and time.monotonic() - oldest_batch >= self.batch_max_wait:
+            return batch.pop()
+        return interactive.pop() or batch.pop()
+
+    def queued(self, priority: str) -> int:
+        return self._classes[priority].waiting
+
+registry.gauge(
+    "fynace_scheduler_queued_calls", "Calls waiting for a scheduler slot.", ["scheduler", "priority"],
+    function=lambda: {
+        (scheduler.name, priority): scheduler.queued(priority)
+        for scheduler in _schedulers for priority in PRIORITIES
+    },
+)
+registry.gauge(
+    "fynace_scheduler_in_flight_calls", "Calls currently holding a scheduler slot.", ["scheduler"],
+    function=lambda: {(scheduler.name,): scheduler.in_flight for scheduler in _schedulers},
+)
@@ -3,9 +3,6 @@ import os
 import secrets
 import hashlib
 import base64
-from cryptography.fernet import Fernet
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from typing import Optional
 import logging
 
@@ -22,6 +19,9 @@ class SecurityUtils:
     @staticmethod
     def hash_data(data: str, salt: Optional[bytes] = None) -> tuple[str, str]:
         """Hash sensitive data with salt."""
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+
         if salt is None:
             salt = os.urandom(32)  # 32 bytes salt
         
@@ -49,6 +49,8 @@ class SecurityUtils:
     @staticmethod
     def encrypt_data(data: str, key: Optional[bytes] = None) -> tuple[str, str]:
         """Encrypt sensitive data using Fernet encryption."""
+        from cryptography.fernet import Fernet
+
         if key is None:
             key = Fernet.generate_key()
         
@@ -60,6 +62,8 @@ class SecurityUtils:
     @staticmethod
     def decrypt_data(encrypted_data: str, key: str) -> str:
         """Decrypt sensitive data."""
+        from cryptography.fernet import Fernet
+
         f = Fernet(key.encode())
         decrypted_data = f.decrypt(encrypted_data.encode())
         return decrypted_data.decode()
@@ -89,21 +93,23 @@ class SecurityUtils:
 
 class SecurityMiddleware:
     """Security middleware for FastAPI."""
+
+    SECURITY_HEADERS = {
+        # Prevent XSS attacks
+        "X-Content-Type-Options": "nosniff",
+        "X-Frame-Options": "DENY",
+        "X-XSS-Protection": "1; mode=block",
+        # Enable HSTS
+        "Strict-Transport-Security": "max-age=31536000; includeSubDomains",
+        # Content Security Policy
+        "Content-Security-Policy": "default-src 'self'; script-src 'self' 'unsafe-inline'; style-src 'self' 'unsafe-inline'; img-src 'self' data: https:;",
+    }
     
     @staticmethod
     def add_security_headers(response):
         """Add security headers to response."""
-        # Prevent XSS attacks
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers["X-Frame-Options"] = "DENY"
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        
-        # Enable HSTS
-        response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
-        
-        # Content Security Policy
-        response.headers["Content-Security-Policy"] = "default-src 'self'; script-src 'self' 'unsafe-inline'; style-src 'self' 'unsafe-inline'; img-src 'self' data: https:;"
-        
+        for name, value in SecurityMiddleware.SECURITY_HEADERS.items():
+            response.headers[name] = value
         return response
 
 class DataValidator:
@@ -0,0 +1,293 @@
+"""Cache tier shared by the worker processes of one host.
+
+With several uvicorn workers each process has its own in-memory caches, so a
+user whose requests land on different workers keeps missing. With
+CACHE_BACKEND=sqlite, TieredCache keeps its in-process TTLCache in front of a
+SQLite file (WAL mode) that every worker opens:
+
+- a local miss is looked up in the file and, if found, copied locally for
+  what remains of its TTL;
+- every write stores the value with a new version and appends the key to an
+  invalidation log. Each worker reads the log at most every
+  SHARED_CACHE_SYNC_INTERVAL seconds and drops the keys other workers
+  changed, so a local copy is stale for at most that long;
+- update() is a compare-and-set on the version, so two workers changing the
+  same entry can't overwrite each other.
+
+With the default CACHE_BACKEND=memory a TieredCache is a plain TTLCache.
+Keys must be strings and values JSON serializable.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional, Tuple
+from backend.utils.cache import MISSING, TTLCache
+from backend.utils.metrics import registry
+from backend.utils.sqlite import SQLiteDatabase
+
+logger = logging.getLogger(__name__)
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH", "data/shared_cache.db")
+SHARED_CACHE_SYNC_INTERVAL = float(os.getenv("SHARED_CACHE_SYNC_INTERVAL", "0.5"))
+# Expired entries and old log rows are deleted this often
+SHARED_CACHE_PRUNE_INTERVAL = float(os.getenv("SHARED_CACHE_PRUNE_INTERVAL", "60"))
+SHARED_CACHE_LOG_RETENTION = float(os.getenv("SHARED_CACHE_LOG_RETENTION", "300"))
+
+SHARED_LOOKUPS = registry.counter(
+    "fynace_shared_cache_lookups_total", "Local cache misses looked up in the shared tier.", ["cache", "result"]
+)
+SHARED_INVALIDATIONS = registry.counter(
+    "fynace_shared_cache_invalidations_total", "Local entries dropped because another worker changed them.",
+    ["cache"],
+)
+SHARED_CONFLICTS = registry.counter(
+    "fynace_shared_cache_conflicts_total", "Updates retried because another worker changed the entry first.",
+    ["cache"],
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE TABLE IF NOT EXISTS cache_invalidations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    origin TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+class SharedCacheStore:
+    """Versioned entries and the invalidation log in a SQLite file."""
+
+    def __init__(self, path: str, sync_interval: float = SHARED_CACHE_SYNC_INTERVAL):
+        self.db = SQLiteDatabase(path, _SCHEMA)
+        self.sync_interval = sync_interval
+        # Identifies this process's rows in the log, so it skips its own writes
+        self.origin = uuid.uuid4().hex
+        self._caches: Dict[str, "TieredCache"] = {}
+        self._sync_lock = threading.Lock()
+        self._cursor: Optional[int] = None
+        self._next_sync = 0.0
+        self._last_sync = time.time()
+        self._next_prune = 0.0
+
+    def register(self, cache: "TieredCache"):
+        self._caches[cache.name] = cache
+
+    def get(self, namespace: str, key: str) -> Tuple[Any, int, float]:
+        """(value, version, expires_at); value is MISSING if absent or expired."""
+        row = self.db.connect().execute(
+            "SELECT value, version, expires_at FROM cache_entries WHERE namespace = ? AND key = ?",
+            (namespace, key),
+        ).fetchone()
+        if row is None:
+            return MISSING, 0, 0.0
+        value, version, expires_at = row
+        if expires_at <= time.time():
+            return MISSING, version, 0.0
+        return json.loads(value), version, expires_at
+
+    def put(self, namespace: str, key: str, value: Any, ttl: float,
+            expected_version: Optional[int] = None) -> bool:
+        """Store a value with the next version; with expected_version, only if the entry still has it."""
+        now = time.time()
+        data = json.dumps(value, separators=(",", ":"))
+        with self.db.transaction() as conn:
+            row = conn.execute(
+                "SELECT version FROM cache_entries WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+            current = row[0] if row else 0
+            if expected_version is not None and current != expected_version:
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (namespace, key, value, version, expires_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (namespace, key, data, current + 1, now + ttl),
+            )
+            self._log(conn, namespace, key, current + 1, now)
+        return True
+
+    def delete(self, namespace: str, key: str):
+        now = time.time()
+        with self.db.transaction() as conn:
+            row = conn.execute(
+                "SELECT version FROM cache_entries WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+            if row is None:
+                return
+            # Keep the row, expired, so versions keep increasing
+            conn.execute(
+                "UPDATE cache_entries SET version = version + 1, expires_at = 0 WHERE namespace = ? AND key = ?",
+                (namespace, key),
+            )
+            self._log(conn, namespace, key, row[0] + 1, now)
+
+    def clear(self, namespace: str):
+        with self.db.transaction() as conn:
+            conn.execute("UPDATE cache_entries SET version = version + 1, expires_at = 0 WHERE namespace = ?",
+                         (namespace,))
+            # An empty key stands for the whole namespace
+            self._log(conn, namespace, "", 0, time.time())
+
+    def _log(self, conn, namespace: str, key: str, version: int, now: float):
+        conn.execute(
+            "INSERT INTO cache_invalidations (namespace, key, version, origin, created_at) VALUES (?, ?, ?, ?, ?)",
+            (namespace, key, version, self.origin, now),
+        )
+
+    def sync(self):
+        """Drop local entries other workers changed since the last sync; rate limited."""
+        if time.monotonic() < self._next_sync or not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            self._sync_locked()
+        except Exception as e:
+            # A busy or unreadable file must not fail the request; local
+            # entries still expire on their own TTL
+            logger.warning(f"Shared cache sync failed: {e}")
+        finally:
+            self._next_sync = time.monotonic() + self.sync_interval
+            self._sync_lock.release()
+
+    def _sync_locked(self):
+        conn = self.db.connect()
+        now = time.time()
+        if self._cursor is None:
+            # Nothing is cached locally yet, so earlier changes don't matter
+            self._cursor = conn.execute("SELECT COALESCE(MAX(id), 0) FROM cache_invalidations").fetchone()[0]
+        elif now - self._last_sync > SHARED_CACHE_LOG_RETENTION:
+            # Idle for longer than the log is kept: changes may have been pruned
+            for cache in self._caches.values():
+                cache.clear_local()
+            self._cursor = conn.execute("SELECT COALESCE(MAX(id), 0) FROM cache_invalidations").fetchone()[0]
+        else:
+            rows = conn.execute(
+                "SELECT id, namespace, key, origin FROM cache_invalidations WHERE id > ? ORDER BY id",
+                (self._cursor,),
+            ).fetchall()
+            for row_id, namespace, key, origin in rows:
+                self._cursor = row_id
+                cache = self._caches.get(namespace)
+                if cache is None or origin == self.origin:
+                    continue
+                if key:
+                    cache.drop_local(key)
+                else:
+                    cache.clear_local()
+        self._last_sync = now
+
+        if time.monotonic() >= self._next_prune:
+            self._next_prune = time.monotonic() + SHARED_CACHE_PRUNE_INTERVAL
+            with self.db.transaction() as conn:
+                conn.execute("DELETE FROM cache_entries WHERE expires_at <= ?", (now,))
+                conn.execute("DELETE FROM cache_invalidations WHERE created_at <= ?",
+                             (now - SHARED_CACHE_LOG_RETENTION,))
+
+class TieredCache(TTLCache):
+    """TTLCache backed by a store shared with the host's other workers, if any."""
+
+    def __init__(self, name: str, maxsize: int = 1024, ttl: float = 300.0,
+                 shared: Optional[SharedCacheStore] = None):
+        super().__init__(name, maxsize=maxsize, ttl=ttl)
+        self.shared = shared
+        if shared is not None:
+            shared.register(self)
+
+    def get(self, key: str) -> Any:
+        if self.shared is None:
+            return super().get(key)
+        self.shared.sync()
+        value = super().get(key)
+        if value is not MISSING:
+            return value
+        try:
+            value, _, expires_at = self.shared.get(self.name, key)
+        except Exception as e:
+            logger.warning(f"Shared cache {self.name} read failed: {e}")
+            return MISSING
+        SHARED_LOOKUPS.inc(cache=self.name, result="miss" if value is MISSING else "hit")
+        if value is not MISSING:
+            super().set(key, value, ttl=min(self.ttl, expires_at - time.time()))
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        super().set(key, value, ttl=ttl)
+        if self.shared is not None:
+            try:
+                self.shared.put(self.name, key, value, ttl)
+            except Exception as e:
+                logger.warning(f"Shared cache {self.name} write failed: {e}")
+
+    def update(self, key: str, function: Callable[[Any], Any], attempts: int = 3):
+        """Replace a cached value with function(value); nothing happens if it isn't cached.
+
+        The entry keeps its expiry, so changes made at the source still show
+        up within the TTL however often it is updated. Across workers this is
+        a compare-and-set on the entry's version; if it keeps losing to other
+        writers the entry is dropped instead, so the next read goes to the
+        source.
+        """
+        if self.shared is None:
+            super().update(key, function)
+            return
+        for _ in range(attempts):
+            try:
+                value, version, expires_at = self.shared.get(self.name, key)
+                if value is MISSING:
+                    super().invalidate(key)
+                    return
+                new_value = function(value)
+                ttl = expires_at - time.time()
+                if self.shared.put(self.name, key, new_value, ttl, expected_version=version):
+                    super().set(key, new_value, ttl=min(self.ttl, ttl))
+                    return
+            except Exception as e:
+                logger.warning(f"Shared cache {self.name} update failed: {e}")
+                break
+            SHARED_CONFLICTS.inc(cache=self.name)
+        self.invalidate(key)
+
+    def invalidate(self, key: str):
+        super().invalidate(key)
+        if self.shared is not None:
+            try:
+                self.shared.delete(self.name, key)
+            except Exception as e:
+                logger.warning(f"Shared cache {self.name} invalidation failed: {e}")
+
+    def clear(self):
+        super().clear()
+        if self.shared is not None:
+            self.shared.clear(self.name)
+
+    def drop_local(self, key: str):
+        """Drop the local copy of an entry another worker changed."""
+        super().invalidate(key)
+        SHARED_INVALIDATIONS.inc(cache=self.name)
+
+    def clear_local(self):
+        super().clear()
+
+def _create_store() -> Optional[SharedCacheStore]:
+    if CACHE_BACKEND == "memory":
+        return None
+    if CACHE_BACKEND != "sqlite":
+        raise ValueError(f"Unknown cache backend: {CACHE_BACKEND!r}")
+    logger.info(f"Caches shared between workers through {SHARED_CACHE_PATH}")
+    return SharedCacheStore(SHARED_CACHE_PATH)
+
+# Global store shared by this process's caches; None with CACHE_BACKEND=memory
+shared_cache_store = _create_store()
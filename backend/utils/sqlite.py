@@ -0,0 +1,47 @@
+"""Local SQLite storage helpers for Fynace application."""
+import os
+import sqlite3
+import threading
+
+class SQLiteDatabase:
+    """One autocommit connection per thread to a WAL-mode SQLite file.
+
+    WAL lets readers run alongside a writer, so the worker processes of one
+    host can share the file. Multi-statement changes go through
+    BEGIN IMMEDIATE ... COMMIT via transaction().
+    """
+
+    def __init__(self, path: str, schema: str = ""):
+        self.path = path
+        self.schema = schema
+        self._local = threading.local()
+
+    def connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            if self.schema:
+                conn.executescript(self.schema)
+            self._local.conn = conn
+        return conn
+
+    def transaction(self) -> "_Transaction":
+        """Context manager holding the write lock until the block ends."""
+        return _Transaction(self.connect())
+
+class _Transaction:
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
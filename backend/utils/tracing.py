@@ -0,0 +1,84 @@
+"""Per-request tracing of outbound calls for Fynace application.
+
+When TRACING_ENABLED is set, each request collects the time spent in every
+outbound call (aggregated by span name) and the middleware reports it in a
+Server-Timing header and one structured log line. When disabled, span() only
+costs a context variable lookup.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Dict, Iterator, List, Optional
+from backend.utils.profiling import profiled_thread
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+
+class RequestTrace:
+    """Span timings collected while handling one request."""
+
+    def __init__(self):
+        # span name -> [call count, total seconds]
+        self.spans: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float):
+        # Sync endpoints and dependencies run in worker threads
+        with self._lock:
+            entry = self.spans.get(name)
+            if entry is None:
+                self.spans[name] = [1, seconds]
+            else:
+                entry[0] += 1
+                entry[1] += seconds
+
+    def server_timing(self, total_seconds: Optional[float] = None) -> str:
+        """Format the spans as a Server-Timing header value."""
+        with self._lock:
+            parts = [
+                f'{name};dur={seconds * 1000:.1f};desc="{int(count)}x"'
+                for name, (count, seconds) in self.spans.items()
+            ]
+        if total_seconds is not None:
+            parts.append(f"total;dur={total_seconds * 1000:.1f}")
+        return ", ".join(parts)
+
+    def as_dict(self) -> Dict[str, Dict[str, float]]:
+        """Return the spans as {name: {"count": n, "ms": total}}."""
+        with self._lock:
+            return {
+                name: {"count": int(count), "ms": round(seconds * 1000, 3)}
+                for name, (count, seconds) in self.spans.items()
+            }
+
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("fynace_request_trace", default=None)
+
+def start_trace() -> Optional[Token]:
+    """Start collecting spans for the current request, if tracing is enabled."""
+    if not TRACING_ENABLED:
+        return None
+    return _current_trace.set(RequestTrace())
+
+def current_trace() -> Optional[RequestTrace]:
+    """Return the trace of the request being handled, if any."""
+    return _current_trace.get()
+
+def end_trace(token: Optional[Token]):
+    """Stop collecting spans started by start_trace()."""
+    if token is not None:
+        _current_trace.reset(token)
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time a block and add it to the current request's trace."""
+    with profiled_thread():
+        trace = _current_trace.get()
+        if trace is None:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            trace.add(name, time.perf_counter() - start)
@@ -0,0 +1,168 @@
+"""Benchmark: raw GET /saudez throughput through the request middleware.
+
+Compares the previous @app.middleware("http") logger (BaseHTTPMiddleware)
+with RequestMonitoringMiddleware. Both apps get the same CORS/TrustedHost
+setup and the same /saudez route; requests are driven straight through the
+ASGI interface so only in-process overhead is measured.
+
+Usage:
+    python -m benchmarks.bench_asgi_middleware --requests 20000 --concurrency 50
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+
+os.environ.setdefault("ALLOWED_HOSTS", "localhost,127.0.0.1")
+
+from fastapi import FastAPI, Request
+
+from backend.config_modules.security_config import setup_security_headers
+from backend.utils.metrics import HTTP_REQUESTS, HTTP_LATENCY
+from backend.utils.middleware import RequestMonitoringMiddleware
+from backend.utils.monitoring import monitoring_service
+from backend.utils.tracing import start_trace, end_trace, current_trace
+
+
+def _legacy_app() -> FastAPI:
+    """The app as it was wired before the pure ASGI middleware."""
+    app = FastAPI()
+    setup_security_headers(app)
+
+    @app.middleware("http")
+    async def log_requests(request: Request, call_next):
+        start_time = time.time()
+        user_id = "unknown"
+        try:
+            auth_header = request.headers.get("authorization")
+            if auth_header and auth_header.startswith("Bearer "):
+                user_id = "authenticated_user"
+        except:
+            pass
+        monitoring_service.log_api_call(
+            user_id=user_id,
+            endpoint=request.url.path,
+            method=request.method,
+            success=True,
+            details={
+                "client_host": request.client.host,
+                "user_agent": request.headers.get("user-agent", "unknown"),
+                "content_type": request.headers.get("content-type", "unknown")
+            }
+        )
+        trace_token = start_trace()
+        try:
+            response = await call_next(request)
+            trace = current_trace()
+        finally:
+            end_trace(trace_token)
+        process_time = time.time() - start_time
+        response.headers["X-Process-Time"] = str(process_time)
+        if trace is not None:
+            response.headers["Server-Timing"] = trace.server_timing(process_time)
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        HTTP_REQUESTS.inc(method=request.method, route=route, status=response.status_code)
+        HTTP_LATENCY.observe(process_time, method=request.method, route=route)
+        from backend.utils.security import SecurityMiddleware
+        response = SecurityMiddleware.add_security_headers(response)
+        from backend.utils.monitoring import MonitoringEvent
+        from datetime import datetime
+        monitoring_service.log_event(
+            MonitoringEvent(
+                timestamp=datetime.now(),
+                event_type="api_response",
+                user_id=user_id,
+                action=f"{request.method} {request.url.path}",
+                details={"status_code": response.status_code, "process_time": process_time},
+                success=response.status_code < 400
+            )
+        )
+        return response
+
+    @app.get("/saudez")
+    def health():
+        return {"status": "ok"}
+
+    return app
+
+
+def _asgi_app() -> FastAPI:
+    app = FastAPI()
+    setup_security_headers(app)
+    app.add_middleware(RequestMonitoringMiddleware)
+
+    @app.get("/saudez")
+    def health():
+        return {"status": "ok"}
+
+    return app
+
+
+_SCOPE = {
+    "type": "http",
+    "asgi": {"version": "3.0"},
+    "http_version": "1.1",
+    "method": "GET",
+    "scheme": "http",
+    "path": "/saudez",
+    "raw_path": b"/saudez",
+    "root_path": "",
+    "query_string": b"",
+    "headers": [(b"host", b"localhost"), (b"user-agent", b"bench"), (b"authorization", b"Bearer x")],
+    "client": ("127.0.0.1", 50000),
+    "server": ("localhost", 80),
+}
+
+
+async def _request(app):
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    status = 0
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(dict(_SCOPE, headers=list(_SCOPE["headers"])), receive, send)
+    assert status == 200, status
+
+
+async def _run(app, requests: int, concurrency: int) -> float:
+    # Warm up (builds the middleware stack)
+    for _ in range(100):
+        await _request(app)
+
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            await _request(app)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=10000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    # Keep the monitoring pipeline in the loop but write it nowhere
+    monitoring_service.start(handlers=[logging.StreamHandler(open(os.devnull, "w"))])
+    try:
+        for label, app in (("base_http_middleware", _legacy_app()), ("pure_asgi_middleware", _asgi_app())):
+            rps = asyncio.run(_run(app, args.requests, args.concurrency))
+            print(f"{label:<22} {rps:10.0f} req/s")
+    finally:
+        monitoring_service.stop()
+
+
+if __name__ == "__main__":
+    main()
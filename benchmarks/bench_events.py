@@ -0,0 +1,205 @@
+"""Benchmark and load check: /eventos with hundreds of concurrent subscribers.
+
+Serves the events router with uvicorn on a local port (auth and spreadsheet
+resolution are replaced by a header naming the user), opens --subscribers
+SSE connections and then
+- publishes --rounds events to every user from another thread and measures
+  the publish-to-receive latency and that every stream got every event;
+- stays idle long enough for each stream to get a heartbeat;
+- checks that a subscriber that stops reading keeps a bounded queue ending
+  in a "ressincronizar" event;
+- checks the per-user connection limit and that closed streams unsubscribe.
+Exits non-zero if any check fails.
+
+Usage:
+    python -m benchmarks.bench_events --subscribers 500 --rounds 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+
+os.environ.setdefault("EVENTS_HEARTBEAT", "1")
+os.environ.setdefault("EVENTS_QUEUE_SIZE", "50")
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+
+from backend.auth_utils import get_current_user
+from backend.routes import eventos
+from backend.services.spreadsheet_service import get_user_spreadsheet_id
+from backend.utils.events import EVENTS_QUEUE_SIZE, event_bus
+
+
+def _bench_user(request: Request) -> dict:
+    return {"id": request.headers["x-bench-user"], "email": "bench@example.com"}
+
+
+def _bench_spreadsheet(request: Request) -> str:
+    return f"sheet-{request.headers['x-bench-user']}"
+
+
+def _serve(port: int) -> uvicorn.Server:
+    app = FastAPI()
+    app.include_router(eventos.router, prefix="/eventos")
+    app.dependency_overrides[get_current_user] = _bench_user
+    app.dependency_overrides[get_user_spreadsheet_id] = _bench_spreadsheet
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="off"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _rss_kb() -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+class _Client:
+    def __init__(self, user: str):
+        self.user = user
+        self.connected = asyncio.Event()
+        self.latencies = []
+        self.received = 0
+        self.pings = 0
+
+    async def run(self, client: httpx.AsyncClient, base_url: str):
+        async with client.stream("GET", f"{base_url}/eventos/", headers={"x-bench-user": self.user}) as response:
+            event = None
+            async for line in response.aiter_lines():
+                if line.startswith(": ping"):
+                    self.pings += 1
+                elif line.startswith("event: "):
+                    event = line[7:]
+                elif line.startswith("data: ") and event == "conectado":
+                    self.connected.set()
+                elif line.startswith("data: ") and event == "transacoes":
+                    data = json.loads(line[6:])
+                    self.latencies.append(time.perf_counter() - data["sent"])
+                    self.received += 1
+
+
+async def _overflow_check() -> dict:
+    subscription = event_bus.subscribe("slow-user")
+    for i in range(EVENTS_QUEUE_SIZE * 10):
+        event_bus.publish("slow-user", "transacoes", {"i": i})
+    await asyncio.sleep(0.1)
+    size = subscription.queue.qsize()
+    messages = [subscription.queue.get_nowait() for _ in range(size)]
+    event_bus.unsubscribe(subscription)
+    return {
+        "queue_size_limit": EVENTS_QUEUE_SIZE,
+        "max_queued": size,
+        "dropped": subscription.dropped,
+        "resync_sent": any(m.startswith("event: ressincronizar") for m in messages),
+    }
+
+
+async def run(args) -> dict:
+    port = _free_port()
+    server = _serve(port)
+    base_url = f"http://127.0.0.1:{port}"
+    results = {"subscribers": args.subscribers, "rounds": args.rounds, "checks": {}}
+
+    # A few users with several tabs open, the rest with one
+    users = [f"user-{i // 2}" if i < 20 else f"user-{i}" for i in range(args.subscribers)]
+    clients = [_Client(user) for user in users]
+    limits = httpx.Limits(max_connections=args.subscribers + 10, max_keepalive_connections=0)
+    rss_before = _rss_kb()
+    async with httpx.AsyncClient(timeout=httpx.Timeout(30, read=None), limits=limits) as client:
+        tasks = [asyncio.create_task(c.run(client, base_url)) for c in clients]
+        started = time.perf_counter()
+        await asyncio.wait_for(asyncio.gather(*(c.connected.wait() for c in clients)), 60)
+        results["connect_seconds"] = round(time.perf_counter() - started, 3)
+        results["open_subscriptions"] = event_bus.subscription_count()
+        results["rss_kb_per_connection"] = round((_rss_kb() - rss_before) / args.subscribers, 1)
+
+        # Publish from a thread other than the server's loop, as the routes do
+        distinct_users = sorted(set(users))
+        def publish_rounds():
+            for _ in range(args.rounds):
+                for user in distinct_users:
+                    event_bus.publish(user, "transacoes", {"sent": time.perf_counter(), "transacoes": [], "resumo": None})
+                time.sleep(args.interval)
+        started = time.perf_counter()
+        await asyncio.to_thread(publish_rounds)
+        deadline = time.perf_counter() + 10
+        while sum(c.received for c in clients) < args.rounds * len(clients) and time.perf_counter() < deadline:
+            await asyncio.sleep(0.05)
+        results["publish_seconds"] = round(time.perf_counter() - started, 3)
+
+        latencies = sorted(l for c in clients for l in c.latencies)
+        results["events_expected"] = args.rounds * len(clients)
+        results["events_received"] = len(latencies)
+        results["latency_ms"] = {
+            "p50": round(statistics.median(latencies) * 1000, 2),
+            "p99": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+            "max": round(latencies[-1] * 1000, 2),
+        }
+        results["checks"]["every_event_delivered"] = len(latencies) == results["events_expected"]
+
+        # Idle: every stream should get heartbeats
+        await asyncio.sleep(float(os.environ["EVENTS_HEARTBEAT"]) * 2.5)
+        results["checks"]["heartbeats"] = all(c.pings > 0 for c in clients)
+
+        # Per-user limit: user-0 already has two streams; fill it up and go over
+        extra = []
+        for _ in range(event_bus.max_per_user - 2):
+            extra_client = _Client("user-0")
+            extra.append(asyncio.create_task(extra_client.run(client, base_url)))
+            await asyncio.wait_for(extra_client.connected.wait(), 10)
+        over = await client.get(f"{base_url}/eventos/", headers={"x-bench-user": "user-0"})
+        results["checks"]["per_user_limit"] = over.status_code == 429
+
+        for task in tasks + extra:
+            task.cancel()
+        await asyncio.gather(*tasks, *extra, return_exceptions=True)
+
+    deadline = time.perf_counter() + 5
+    while event_bus.subscription_count() and time.perf_counter() < deadline:
+        await asyncio.sleep(0.05)
+    results["checks"]["unsubscribed_on_close"] = event_bus.subscription_count() == 0
+
+    overflow = await _overflow_check()
+    results["overflow"] = overflow
+    results["checks"]["bounded_queue"] = overflow["max_queued"] <= EVENTS_QUEUE_SIZE and overflow["resync_sent"]
+
+    server.should_exit = True
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--subscribers", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=0.05, help="Seconds between publish rounds")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if not all(results["checks"].values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
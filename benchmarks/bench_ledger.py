@@ -0,0 +1,141 @@
+"""Micro-benchmark: ledger parsing and aggregation at realistic sizes.
+
+Generates ledgers with benchmarks/ledger_gen.py and, for each size, times the
+functions every Sheets-backed request runs over the whole ledger:
+GoogleSheetsService.get_summary and get_category_breakdown,
+TransactionService.get_all_transactions and _parse_date (over every date
+in the ledger), and DataValidator.validate_transaction_data, which
+POST /transacoes runs on every body (over a payload per row, sanitization
+check included). The ledger is served from the ledger cache, so only the Python work is measured.
+
+Time is the median and minimum of --repeat runs; allocations are measured in
+a separate run under tracemalloc (peak and retained bytes above the starting
+point, and allocated blocks still alive at the end).
+
+Usage:
+    python -m benchmarks.bench_ledger --sizes 1000 10000 100000 1000000 --output ledger.json
+"""
+import argparse
+import json
+import statistics
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+from backend.services import ledger
+from backend.services.google_sheets_service import GoogleSheetsService, ledger_cache
+from backend.services.transaction_service import TransactionService
+from backend.utils.security import DataValidator
+from benchmarks.ledger_gen import generate_ledger
+
+
+def _services(spreadsheet_id: str):
+    # No Sheets client is needed: every read is answered by the ledger cache
+    sheets = GoogleSheetsService.__new__(GoogleSheetsService)
+    transactions = TransactionService.__new__(TransactionService)
+    transactions.spreadsheet_id = spreadsheet_id
+    transactions.sheets_service = sheets
+    return sheets, transactions
+
+
+def _payloads(rows: Dict[str, List[List[str]]]) -> List[Dict[str, Any]]:
+    # What the POST body would carry for each row
+    return [
+        {"descricao": row[1], "valor": ledger.parse_amount(row[3]) if len(row) > 3 else 0,
+         "tipo": tipo, "categoria": row[2]}
+        for tipo, sheet in rows.items() for row in sheet
+    ]
+
+
+def _validate_all(payloads: List[Dict[str, Any]]) -> int:
+    invalid = 0
+    for payload in payloads:
+        is_valid, _ = DataValidator.validate_transaction_data(payload)
+        if not is_valid:
+            invalid += 1
+    return invalid
+
+
+def _cases(size: int, seed: int) -> Dict[str, Callable[[], Any]]:
+    rows = generate_ledger(size, seed)
+    spreadsheet_id = f"bench-{size}"
+    ledger_cache.set(spreadsheet_id, rows, ttl=24 * 3600)
+    sheets, transactions = _services(spreadsheet_id)
+    dates = [row[0] for sheet in rows.values() for row in sheet]
+    payloads = _payloads(rows)
+    return {
+        "get_summary": lambda: sheets.get_summary(spreadsheet_id),
+        "get_category_breakdown": lambda: sheets.get_category_breakdown(spreadsheet_id),
+        "get_all_transactions": transactions.get_all_transactions,
+        "_parse_date": lambda: [transactions._parse_date(d) for d in dates],
+        "DataValidator.validate_transaction_data": lambda: _validate_all(payloads),
+    }
+
+
+def _time(function: Callable[[], Any], repeat: int) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def _allocations(function: Callable[[], Any]) -> Dict[str, float]:
+    tracemalloc.start()
+    try:
+        start, _ = tracemalloc.get_traced_memory()
+        result = function()
+        current, peak = tracemalloc.get_traced_memory()
+        blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+    finally:
+        tracemalloc.stop()
+    del result
+    return {
+        "peak_kb": round((peak - start) / 1024, 1),
+        "retained_kb": round((current - start) / 1024, 1),
+        "live_blocks": blocks,
+    }
+
+
+def run(sizes: List[int], repeat: int, seed: int) -> Dict[str, Any]:
+    results = {"seed": seed, "repeat": repeat, "sizes": {}}
+    for size in sizes:
+        cases = _cases(size, seed)
+        by_function = {}
+        for name, function in cases.items():
+            # One untimed call first, so lazy imports and caches don't count
+            function()
+            samples = _time(function, repeat)
+            median = statistics.median(samples)
+            by_function[name] = {
+                "median_ms": round(median * 1000, 3),
+                "min_ms": round(min(samples) * 1000, 3),
+                "ns_per_row": round(median / size * 1e9, 1),
+                **_allocations(function),
+            }
+            print(
+                f"{size:>8} rows  {name:40} {by_function[name]['median_ms']:10.3f} ms"
+                f"  {by_function[name]['ns_per_row']:8.1f} ns/row  peak {by_function[name]['peak_kb']:10.1f} KiB"
+            )
+        results["sizes"][str(size)] = by_function
+        ledger_cache.invalidate(f"bench-{size}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.repeat, args.seed)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""Benchmark: payment reconciliation against local Supabase and Mercado Pago stand-ins.
+
+Seeds N pending profiles and matching payments, then measures
+- per_profile: the manual fix, one payment lookup and one profile update per
+  profile (run on the first --baseline-profiles profiles and extrapolated);
+- bulk: PaymentReconciler, a concurrent payments search plus one upsert per
+  page of profiles, at each --concurrency level.
+
+Usage:
+    python -m benchmarks.bench_reconciliation --profiles 5000 --latency-ms 40 --concurrency 1 4 8
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+os.environ.setdefault("SUPABASE_ANON_KEY", "benchmark-anon-key")
+os.environ.setdefault("SUPABASE_JWT_SECRET", "benchmark-secret")
+os.environ.setdefault("MERCADOPAGO_ACCESS_TOKEN", "benchmark-token")
+os.environ.setdefault("PAYMENT_STATUS_PATH", os.path.join(tempfile.mkdtemp(), "payment_status.db"))
+
+STATUSES = ["approved", "approved", "approved", "rejected", "pending", "cancelled"]
+
+
+class _State:
+    def __init__(self, profiles: int, latency: float):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.requests = {"mercadopago": 0, "supabase": 0}
+        self.profiles = {}
+        self.payments = []
+        for i in range(profiles):
+            user_id = str(uuid.uuid4())
+            self.profiles[user_id] = {"user_id": user_id, "pagamento_status": "initiated", "pagamento_id": f"pref-{i}"}
+            # One in five users never completed a payment
+            if random.random() < 0.8:
+                self.payments.append({
+                    "id": 10_000_000 + i,
+                    "status": random.choice(STATUSES),
+                    "external_reference": f"{user_id}-order-{i}",
+                    "date_last_updated": f"2026-01-01T00:00:{i % 60:02d}.000-03:00",
+                })
+        self.payments_by_pref = {p["external_reference"].rsplit("-", 1)[1]: p for p in self.payments}
+
+    def reset(self):
+        for profile in self.profiles.values():
+            profile["pagamento_status"] = "initiated"
+        self.requests = {"mercadopago": 0, "supabase": 0}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def _reply(self, body, status=200):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"null")
+
+    def _count(self, service):
+        state = self.server.state
+        with state.lock:
+            state.requests[service] += 1
+        # Simulated network round trip to the real service
+        time.sleep(state.latency)
+
+    def do_GET(self):
+        state = self.server.state
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        if url.path == "/v1/payments/search":
+            self._count("mercadopago")
+            offset, limit = int(query.get("offset", 0)), int(query.get("limit", 30))
+            self._reply({
+                "paging": {"total": len(state.payments), "offset": offset, "limit": limit},
+                "results": state.payments[offset:offset + limit],
+            })
+        elif url.path.startswith("/v1/payments/"):
+            self._count("mercadopago")
+            payment = state.payments_by_pref.get(url.path.rsplit("/", 1)[1])
+            self._reply(payment or {"status": "pending", "external_reference": ""}, 200 if payment else 404)
+        elif url.path == "/rest/v1/user_profiles":
+            self._count("supabase")
+            statuses = query.get("pagamento_status", "in.()")[4:-1].split(",")
+            after = query.get("user_id", "gt.")[3:]
+            limit = int(query.get("limit", 1000))
+            with state.lock:
+                rows = sorted(
+                    (p for p in state.profiles.values() if p["pagamento_status"] in statuses and p["user_id"] > after),
+                    key=lambda p: p["user_id"],
+                )[:limit]
+                self._reply([dict(row) for row in rows])
+        else:
+            self._reply({"message": "not found"}, 404)
+
+    def do_POST(self):
+        # Upsert of a page of profiles
+        self._count("supabase")
+        rows = self._body()
+        state = self.server.state
+        with state.lock:
+            for row in rows:
+                state.profiles[row["user_id"]].update(row)
+        self._reply(rows, 201)
+
+    def do_PATCH(self):
+        self._count("supabase")
+        row = self._body()
+        user_id = parse_qs(urlparse(self.path).query)["user_id"][0][3:]
+        state = self.server.state
+        with state.lock:
+            state.profiles[user_id].update(row)
+        self._reply([row])
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _mercado_pago_service(base_url: str):
+    import mercadopago
+    from backend.payments.http_client import PooledHttpClient
+    from backend.payments.mercado_pago_service import MercadoPagoService
+
+    class _LocalHttpClient(PooledHttpClient):
+        def request(self, method, url, maxretries=None, **kwargs):
+            url = url.replace("https://api.mercadopago.com", base_url)
+            return super().request(method, url, maxretries, **kwargs)
+
+    service = MercadoPagoService()
+    service.http_client = _LocalHttpClient(pool_maxsize=32)
+    service.sdk = mercadopago.SDK(service.access_token, http_client=service.http_client)
+    return service
+
+
+def run_per_profile(state, supabase, mercado_pago, limit: int) -> dict:
+    from backend.payments.payment_status import plan_for_status
+    profiles = sorted(state.profiles.values(), key=lambda p: p["user_id"])[:limit]
+    started = time.perf_counter()
+    for profile in profiles:
+        # The payment lookup a support person would do for each stuck profile
+        payment = mercado_pago.get_payment_status(profile["pagamento_id"].split("-")[1])
+        if payment.get("external_reference"):
+            supabase.table("user_profiles").update({
+                "plano": plan_for_status(payment["status"]),
+                "pagamento_status": payment["status"],
+            }).eq("user_id", profile["user_id"]).execute()
+    elapsed = time.perf_counter() - started
+    return {"mode": "per_profile", "profiles": len(profiles), "seconds": elapsed,
+            "profiles_per_second": len(profiles) / elapsed, **state.requests}
+
+
+def run_bulk(state, supabase, mercado_pago, concurrency: int) -> dict:
+    from backend.payments.reconciliation import PaymentReconciler
+    stats = PaymentReconciler(supabase, mercado_pago, concurrency=concurrency, page_size=500).run()
+    pending_left = sum(1 for p in state.profiles.values() if p["pagamento_status"] == "initiated")
+    return {"mode": f"bulk_c{concurrency}", "profiles": stats["profiles_scanned"], "seconds": stats["elapsed_seconds"],
+            "profiles_per_second": stats["profiles_per_second"], "updated": stats["profiles_updated"],
+            "left_initiated": pending_left, **state.requests}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--profiles", type=int, default=5000)
+    parser.add_argument("--baseline-profiles", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=40.0)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    state = _State(args.profiles, args.latency_ms / 1000)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.daemon_threads = True
+    server.state = state
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ["SUPABASE_URL"] = base_url
+
+    from backend.database.database_service import create_supabase_client
+    supabase = create_supabase_client()
+    mercado_pago = _mercado_pago_service(base_url)
+
+    results = [run_per_profile(state, supabase, mercado_pago, args.baseline_profiles)]
+    for concurrency in args.concurrency:
+        state.reset()
+        results.append(run_bulk(state, supabase, mercado_pago, concurrency))
+    server.shutdown()
+
+    for row in results:
+        print(
+            f"{row['mode']:<12} profiles={row['profiles']:<6} {row['seconds']:8.2f}s "
+            f"{row['profiles_per_second']:9.1f} profiles/s  mp_calls={row['mercadopago']:<5} "
+            f"supabase_calls={row['supabase']}"
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Startup benchmark: import cost and time-to-first-request of the backend.
+
+Runs `python -X importtime -c "import backend.main"` to break down import cost
+(and check that the heavy SDKs stay off the startup path), then starts uvicorn
+repeatedly and measures the time until GET /saudez first answers 200.
+
+Usage:
+    python -m benchmarks.bench_startup --runs 5 --output startup.json
+"""
+import argparse
+import json
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+# SDKs that should only be imported when first used
+HEAVY_MODULES = ["supabase", "googleapiclient", "mercadopago", "slowapi", "httpx", "requests"]
+
+_IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def _benchmark_env() -> dict:
+    env = dict(os.environ)
+    env.setdefault("SUPABASE_URL", "http://127.0.0.1:9")
+    env.setdefault("SUPABASE_ANON_KEY", "benchmark-anon-key")
+    env.setdefault("SUPABASE_JWT_SECRET", "benchmark-secret")
+    if "JWKS_FILE" not in env:
+        # Keep the background JWKS load off the network
+        jwks_file = os.path.join(tempfile.gettempdir(), "fynace-bench-jwks.json")
+        with open(jwks_file, "w") as f:
+            json.dump({"keys": []}, f)
+        env["JWKS_FILE"] = jwks_file
+    return env
+
+
+def measure_imports(env: dict, top: int) -> dict:
+    """Parse -X importtime output for backend.main."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import backend.main"],
+        env=env, capture_output=True, text=True, check=True,
+    )
+    modules = {}
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules[name] = {
+                "self_ms": int(self_us) / 1000,
+                "cumulative_ms": int(cumulative_us) / 1000,
+                "depth": len(indent) // 2,
+            }
+
+    slowest = sorted(modules.items(), key=lambda item: item[1]["cumulative_ms"], reverse=True)
+    return {
+        "total_ms": modules.get("backend.main", {}).get("cumulative_ms", 0.0),
+        "modules_imported": len(modules),
+        "heavy_modules_at_startup": [name for name in HEAVY_MODULES if name in modules],
+        "slowest": [{"module": name, **timing} for name, timing in slowest[:top]],
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_first_request(env: dict, timeout: float = 30.0) -> float:
+    """Seconds from spawning uvicorn until /saudez answers."""
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/saudez"
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError(f"backend did not answer {url} within {timeout}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest imports to show")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    env = _benchmark_env()
+    imports = measure_imports(env, args.top)
+    samples = [measure_first_request(env) for _ in range(args.runs)]
+    results = {
+        "imports": imports,
+        "time_to_first_request_ms": {
+            "runs": [s * 1000 for s in samples],
+            "median": statistics.median(samples) * 1000,
+            "min": min(samples) * 1000,
+        },
+    }
+
+    print(f"import backend.main: {imports['total_ms']:.1f} ms ({imports['modules_imported']} modules)")
+    print(f"heavy SDKs imported at startup: {', '.join(imports['heavy_modules_at_startup']) or 'none'}")
+    for row in imports["slowest"]:
+        print(f"  {row['cumulative_ms']:8.1f} ms  {row['module']}")
+    ttfr = results["time_to_first_request_ms"]
+    print(f"time to first request: median {ttfr['median']:.0f} ms, min {ttfr['min']:.0f} ms over {args.runs} runs")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
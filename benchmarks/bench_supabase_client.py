@@ -0,0 +1,120 @@
+"""Micro-benchmark: per-request Supabase client vs. the shared pooled client.
+
+Starts a local PostgREST stand-in and times the spreadsheet ID lookup made by
+every authenticated request, once creating a new client per request (the old
+behaviour) and once reusing the shared client from DatabaseService.
+
+Usage:
+    python -m benchmarks.bench_supabase_client --requests 500 --connect-latency-ms 20
+"""
+import argparse
+import json
+import os
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Credentials the Supabase client needs; any value works against the stand-in
+os.environ.setdefault("SUPABASE_ANON_KEY", "benchmark-anon-key")
+os.environ.setdefault("SUPABASE_JWT_SECRET", "benchmark-secret")
+
+
+class _PostgrestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    body = json.dumps([{"spreadsheet_id": "bench-spreadsheet"}]).encode()
+
+    def setup(self):
+        # Runs once per TCP connection: simulates connect + TLS handshake cost
+        self.server.connections += 1
+        if self.server.connect_latency:
+            time.sleep(self.server.connect_latency)
+        super().setup()
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _start_server(connect_latency: float) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _PostgrestHandler)
+    server.daemon_threads = True
+    server.connections = 0
+    server.connect_latency = connect_latency
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _lookup(client):
+    client.table("user_profiles").select("spreadsheet_id").eq("id", "bench-user").limit(1).execute()
+
+
+def _summarize(label: str, samples: list, connections: int) -> dict:
+    samples = sorted(samples)
+    return {
+        "mode": label,
+        "requests": len(samples),
+        "mean_ms": statistics.fmean(samples) * 1000,
+        "p50_ms": samples[len(samples) // 2] * 1000,
+        "p99_ms": samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000,
+        "tcp_connections": connections,
+    }
+
+
+def run(requests: int, connect_latency_ms: float) -> list:
+    server = _start_server(connect_latency_ms / 1000)
+    os.environ["SUPABASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}"
+
+    from supabase import create_client
+    from backend.database import database_service
+
+    results = []
+
+    # Before: a new client (and new connections) for every request
+    samples = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        client = create_client(os.environ["SUPABASE_URL"], os.environ["SUPABASE_ANON_KEY"])
+        _lookup(client)
+        samples.append(time.perf_counter() - start)
+        client.postgrest.session.close()
+    results.append(_summarize("create_client_per_request", samples, server.connections))
+
+    # After: one long-lived client with a keep-alive pool
+    server.connections = 0
+    database_service.init_supabase_client()
+    samples = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        _lookup(database_service.get_supabase_client())
+        samples.append(time.perf_counter() - start)
+    database_service.close_supabase_client()
+    results.append(_summarize("shared_client", samples, server.connections))
+
+    server.shutdown()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--connect-latency-ms", type=float, default=0.0,
+                        help="Simulated cost of opening a connection (TLS handshake)")
+    args = parser.parse_args()
+
+    for row in run(args.requests, args.connect_latency_ms):
+        print(
+            f"{row['mode']:<28} mean={row['mean_ms']:.3f}ms p50={row['p50_ms']:.3f}ms "
+            f"p99={row['p99_ms']:.3f}ms connections={row['tcp_connections']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,434 @@
+"""Local stand-ins for Google Sheets, Supabase (PostgREST and JWKS) and Mercado Pago.
+
+One threaded HTTP server answers the subset of each API the backend uses,
+from in-memory data seeded per benchmark user. Every service has its own
+latency, jitter, error rate and per-minute quota, and every call is counted
+by service and operation, so a benchmark can report outbound calls per
+request.
+
+The backend is pointed at it through its usual settings (see
+FakeServices.environment()): SUPABASE_URL, SUPABASE_AUTH_URL,
+GOOGLE_SHEETS_API_ENDPOINT with a service account file whose token_uri is
+local, and MERCADOPAGO_API_URL.
+"""
+import base64
+import collections
+import json
+import random
+import re
+import tempfile
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlparse
+
+from backend.services.ledger import LEDGER_SHEETS
+from benchmarks.ledger_gen import generate_ledger
+
+SERVICES = ("sheets", "google_oauth", "supabase", "jwks", "mercadopago")
+
+@dataclass
+class ServiceConfig:
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    # Share of calls answered with a 503
+    error_rate: float = 0.0
+    # Calls allowed per rolling minute before answering 429; 0 is unlimited
+    quota_per_minute: int = 0
+
+
+class _Service:
+    def __init__(self, config: ServiceConfig):
+        self.config = config
+        self.lock = threading.Lock()
+        self.calls: collections.Counter = collections.Counter()
+        self.errors: collections.Counter = collections.Counter()
+        self.window: collections.deque = collections.deque()
+
+    def admit(self, operation: str) -> Optional[int]:
+        """Count a call and apply the configured behaviour; return an error status or None."""
+        now = time.monotonic()
+        with self.lock:
+            self.calls[operation] += 1
+            if self.config.quota_per_minute:
+                while self.window and self.window[0] <= now - 60:
+                    self.window.popleft()
+                if len(self.window) >= self.config.quota_per_minute:
+                    self.errors["quota"] += 1
+                    return 429
+                self.window.append(now)
+        delay = self.config.latency_ms + random.uniform(-1, 1) * self.config.jitter_ms
+        if delay > 0:
+            time.sleep(delay / 1000)
+        if self.config.error_rate and random.random() < self.config.error_rate:
+            with self.lock:
+                self.errors["injected"] += 1
+            return 503
+        return None
+
+
+def _b64(number: int) -> str:
+    data = number.to_bytes((number.bit_length() + 7) // 8, "big")
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+class FakeServices:
+    """The stand-in server and the data behind it."""
+
+    def __init__(self, users: int = 50, ledger_rows: int = 500, configs: Optional[Dict[str, ServiceConfig]] = None):
+        configs = configs or {}
+        self.services = {name: _Service(configs.get(name, ServiceConfig())) for name in SERVICES}
+        self.lock = threading.Lock()
+        self._key_pem, self.jwks = self._signing_key()
+        self.kid = self.jwks["keys"][0]["kid"]
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.server.daemon_threads = True
+        self.server.fakes = self
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.auth_url = f"{self.base_url}/auth/v1"
+
+        # Seeded data: one profile and spreadsheet per user, with an approved
+        # payment and one still pending
+        self.users: List[Dict[str, str]] = []
+        self.profiles: Dict[str, Dict[str, Any]] = {}
+        self.sheets: Dict[str, Dict[str, List[List[Any]]]] = {}
+        self.payments: Dict[str, Dict[str, Any]] = {}
+        for i in range(users):
+            user_id = str(uuid.uuid4())
+            spreadsheet_id = f"sheet-{i}"
+            payment_id = str(90_000_000 + i)
+            pending_payment_id = str(91_000_000 + i)
+            self.users.append({
+                "id": user_id, "email": f"user{i}@example.com", "spreadsheet_id": spreadsheet_id,
+                "payment_id": payment_id, "pending_payment_id": pending_payment_id,
+            })
+            self.profiles[user_id] = {"id": user_id, "user_id": user_id, "spreadsheet_id": spreadsheet_id}
+            self.sheets[spreadsheet_id] = self._ledger(ledger_rows, seed=i)
+            self.payments[payment_id] = {
+                "id": int(payment_id), "status": "approved",
+                "external_reference": f"{user_id}-plano-premium", "date_last_updated": "2026-01-01T00:00:00.000-03:00",
+            }
+            self.payments[pending_payment_id] = {
+                "id": int(pending_payment_id), "status": "pending",
+                "external_reference": f"{user_id}-plano-premium", "date_last_updated": "2026-01-01T00:00:00.000-03:00",
+            }
+        self._next_id = 0
+
+    def _signing_key(self) -> Tuple[bytes, Dict[str, Any]]:
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.hazmat.primitives.asymmetric import rsa
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        pem = key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        )
+        numbers = key.public_key().public_numbers()
+        jwks = {"keys": [{
+            "kty": "RSA", "alg": "RS256", "use": "sig", "kid": "bench-key",
+            "n": _b64(numbers.n), "e": _b64(numbers.e),
+        }]}
+        return pem, jwks
+
+    @staticmethod
+    def _ledger(rows: int, seed: int) -> Dict[str, List[List[Any]]]:
+        rows_by_type = generate_ledger(rows, seed, end=date.today())
+        return {LEDGER_SHEETS[tipo]: sheet for tipo, sheet in rows_by_type.items()}
+
+    def token(self, user: Dict[str, str], ttl: int = 3600) -> str:
+        """A Supabase-style access token for a seeded user, signed with the published key."""
+        from jose import jwt
+        now = int(time.time())
+        claims = {
+            "sub": user["id"], "email": user["email"], "aud": "authenticated",
+            "iss": self.auth_url, "iat": now, "exp": now + ttl, "role": "authenticated",
+        }
+        return jwt.encode(claims, self._key_pem.decode(), algorithm="RS256", headers={"kid": self.kid})
+
+    def service_account_file(self) -> str:
+        """A service account key file whose token endpoint is this server."""
+        data = {
+            "type": "service_account", "project_id": "bench", "private_key_id": "bench",
+            "private_key": self._key_pem.decode(), "client_email": "bench@bench.iam.gserviceaccount.com",
+            "client_id": "1", "token_uri": f"{self.base_url}/token",
+        }
+        path = tempfile.NamedTemporaryFile("w", suffix=".json", delete=False).name
+        with open(path, "w") as f:
+            json.dump(data, f)
+        return path
+
+    def environment(self) -> Dict[str, str]:
+        """Settings that point the backend at these stand-ins."""
+        return {
+            "SUPABASE_URL": self.base_url,
+            "SUPABASE_ANON_KEY": "bench-anon-key",
+            "SUPABASE_JWT_SECRET": "bench-secret",
+            "SUPABASE_AUTH_URL": self.auth_url,
+            "GOOGLE_SHEETS_API_ENDPOINT": self.base_url + "/",
+            "GOOGLE_SERVICE_ACCOUNT_FILE": self.service_account_file(),
+            "MERCADOPAGO_ACCESS_TOKEN": "bench-token",
+            "MERCADOPAGO_API_URL": self.base_url,
+        }
+
+    def next_id(self) -> int:
+        with self.lock:
+            self._next_id += 1
+            return self._next_id
+
+    def calls(self) -> Dict[str, Dict[str, int]]:
+        """Calls so far by service and operation."""
+        result = {}
+        for name, service in self.services.items():
+            with service.lock:
+                result[name] = dict(service.calls)
+        return result
+
+    def errors(self) -> Dict[str, Dict[str, int]]:
+        result = {}
+        for name, service in self.services.items():
+            with service.lock:
+                result[name] = dict(service.errors)
+        return result
+
+    def start(self) -> "FakeServices":
+        threading.Thread(target=self.server.serve_forever, name="fake-services", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    # --- plumbing ---
+
+    @property
+    def fakes(self) -> FakeServices:
+        return self.server.fakes
+
+    def _reply(self, body: Any, status: int = 200):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self) -> Any:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        if not raw:
+            return None
+        if self.headers.get("Content-Type", "").startswith("application/x-www-form-urlencoded"):
+            return {k: v[0] for k, v in parse_qs(raw.decode()).items()}
+        return json.loads(raw)
+
+    def _dispatch(self, method: str):
+        url = urlparse(self.path)
+        path = unquote(url.path)
+        query = parse_qs(url.query)
+        body = self._body() if method in ("POST", "PATCH", "PUT") else None
+        route = self._route(method, path)
+        if route is None:
+            self._reply({"message": f"no stand-in for {method} {path}"}, 404)
+            return
+        service, operation, handler, params = route
+        error = self.fakes.services[service].admit(operation)
+        if error is not None:
+            self._reply({"error": {"code": error, "message": "stand-in error"}}, error)
+            return
+        status, reply = handler(query, body, *params)
+        self._reply(reply, status)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PATCH(self):
+        self._dispatch("PATCH")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def log_message(self, format, *args):
+        pass
+
+    _ROUTES = [
+        ("GET", r"/auth/v1/\.well-known/jwks\.json", "jwks", "fetch", "_jwks"),
+        ("POST", r"/token", "google_oauth", "token", "_oauth_token"),
+        ("GET", r"/v4/spreadsheets/([^/]+)/values:batchGet", "sheets", "batch_get", "_sheets_batch_get"),
+        ("POST", r"/v4/spreadsheets/([^/]+)/values/(.+):append", "sheets", "append", "_sheets_append"),
+        ("GET", r"/v4/spreadsheets/([^/]+)/values/(.+)", "sheets", "read", "_sheets_read"),
+        ("PUT", r"/v4/spreadsheets/([^/]+)/values/(.+)", "sheets", "update", "_sheets_update"),
+        ("POST", r"/v4/spreadsheets/([^/]+):batchUpdate", "sheets", "batch_update", "_sheets_batch_update"),
+        ("POST", r"/v4/spreadsheets", "sheets", "create", "_sheets_create"),
+        ("GET", r"/rest/v1/user_profiles", "supabase", "select", "_profiles_select"),
+        ("PATCH", r"/rest/v1/user_profiles", "supabase", "update", "_profiles_update"),
+        ("POST", r"/rest/v1/user_profiles", "supabase", "upsert", "_profiles_upsert"),
+        ("POST", r"/checkout/preferences", "mercadopago", "create_preference", "_mp_preference"),
+        ("GET", r"/v1/payments/search", "mercadopago", "search_payments", "_mp_search"),
+        ("GET", r"/v1/payments/([^/]+)", "mercadopago", "get_payment", "_mp_payment"),
+    ]
+
+    def _route(self, method: str, path: str):
+        for route_method, pattern, service, operation, handler in self._ROUTES:
+            if route_method != method:
+                continue
+            match = re.fullmatch(pattern, path)
+            if match:
+                return service, operation, getattr(self, handler), match.groups()
+        return None
+
+    # --- Supabase auth and Google OAuth ---
+
+    def _jwks(self, query, body):
+        return 200, self.fakes.jwks
+
+    def _oauth_token(self, query, body):
+        return 200, {"access_token": f"bench-{uuid.uuid4().hex}", "expires_in": 3600, "token_type": "Bearer"}
+
+    # --- Google Sheets ---
+
+    @staticmethod
+    def _sheet_name(range_: str) -> str:
+        return range_.split("!", 1)[0].strip("'")
+
+    def _sheet(self, spreadsheet_id: str) -> Optional[Dict[str, List[List[Any]]]]:
+        return self.fakes.sheets.get(spreadsheet_id)
+
+    def _values(self, spreadsheet_id: str, range_: str) -> Dict[str, Any]:
+        rows = self._sheet(spreadsheet_id).get(self._sheet_name(range_), [])
+        value_range = {"range": range_, "majorDimension": "ROWS"}
+        if rows:
+            value_range["values"] = [list(row) for row in rows]
+        return value_range
+
+    def _sheets_batch_get(self, query, body, spreadsheet_id):
+        if self._sheet(spreadsheet_id) is None:
+            return 404, {"error": {"code": 404, "message": "Requested entity was not found."}}
+        return 200, {
+            "spreadsheetId": spreadsheet_id,
+            "valueRanges": [self._values(spreadsheet_id, r) for r in query.get("ranges", [])],
+        }
+
+    def _sheets_read(self, query, body, spreadsheet_id, range_):
+        if self._sheet(spreadsheet_id) is None:
+            return 404, {"error": {"code": 404, "message": "Requested entity was not found."}}
+        return 200, self._values(spreadsheet_id, range_)
+
+    def _sheets_append(self, query, body, spreadsheet_id, range_):
+        sheet = self._sheet(spreadsheet_id)
+        if sheet is None:
+            return 404, {"error": {"code": 404, "message": "Requested entity was not found."}}
+        rows = [[str(value) for value in row] for row in body.get("values", [])]
+        with self.fakes.lock:
+            sheet.setdefault(self._sheet_name(range_), []).extend(rows)
+        updates = {"spreadsheetId": spreadsheet_id, "updatedRows": len(rows)}
+        if query.get("includeValuesInResponse", ["false"])[0] == "true":
+            updates["updatedData"] = {"range": range_, "values": rows}
+        return 200, {"spreadsheetId": spreadsheet_id, "updates": updates}
+
+    def _sheets_update(self, query, body, spreadsheet_id, range_):
+        return 200, {"spreadsheetId": spreadsheet_id, "updatedRange": range_}
+
+    def _sheets_batch_update(self, query, body, spreadsheet_id):
+        return 200, {"spreadsheetId": spreadsheet_id, "replies": [{} for _ in body.get("requests", [])]}
+
+    def _sheets_create(self, query, body):
+        spreadsheet_id = f"created-{self.fakes.next_id()}"
+        with self.fakes.lock:
+            self.fakes.sheets[spreadsheet_id] = {"Despesas": [], "Ganhos": []}
+        return 200, {"spreadsheetId": spreadsheet_id}
+
+    # --- Supabase PostgREST (user_profiles) ---
+
+    @staticmethod
+    def _condition(profile: Dict[str, Any], column: str, value: str) -> bool:
+        op, _, operand = value.partition(".")
+        current = profile.get(column)
+        if op == "eq":
+            return current is not None and str(current) == operand
+        if op == "is" and operand == "null":
+            return current is None
+        if op == "gt":
+            return current is not None and str(current) > operand
+        if op == "in":
+            return str(current) in operand.strip("()").split(",")
+        return True
+
+    def _matches(self, profile: Dict[str, Any], query: Dict[str, List[str]]) -> bool:
+        for column, values in query.items():
+            if column in ("select", "limit", "order", "on_conflict", "offset"):
+                continue
+            for value in values:
+                if column == "or":
+                    # or=(column.op.operand,column.op.operand)
+                    conditions = [c.partition(".") for c in value.strip("()").split(",")]
+                    if not any(self._condition(profile, c, rest) for c, _, rest in conditions):
+                        return False
+                elif not self._condition(profile, column, value):
+                    return False
+        return True
+
+    def _select(self, profile: Dict[str, Any], query) -> Dict[str, Any]:
+        columns = query.get("select", ["*"])[0]
+        if columns == "*":
+            return dict(profile)
+        return {c.strip(): profile.get(c.strip()) for c in columns.split(",")}
+
+    def _profiles_select(self, query, body):
+        with self.fakes.lock:
+            rows = [self._select(p, query) for p in self.fakes.profiles.values() if self._matches(p, query)]
+        if "limit" in query:
+            rows = rows[:int(query["limit"][0])]
+        if "vnd.pgrst.object" in self.headers.get("Accept", ""):
+            if len(rows) != 1:
+                return 406, {"message": "JSON object requested, multiple (or no) rows returned"}
+            return 200, rows[0]
+        return 200, rows
+
+    def _profiles_update(self, query, body):
+        with self.fakes.lock:
+            updated = []
+            for profile in self.fakes.profiles.values():
+                if self._matches(profile, query):
+                    profile.update(body)
+                    updated.append(dict(profile))
+        return 200, updated
+
+    def _profiles_upsert(self, query, body):
+        rows = body if isinstance(body, list) else [body]
+        with self.fakes.lock:
+            for row in rows:
+                key = row.get("user_id") or row.get("id")
+                profile = self.fakes.profiles.setdefault(key, {"id": key, "user_id": key})
+                profile.update(row)
+        return 201, rows
+
+    # --- Mercado Pago ---
+
+    def _mp_preference(self, query, body):
+        preference_id = f"pref-{self.fakes.next_id()}"
+        return 201, {"id": preference_id, "init_point": f"https://www.mercadopago.com.br/checkout?pref_id={preference_id}"}
+
+    def _mp_payment(self, query, body, payment_id):
+        payment = self.fakes.payments.get(payment_id)
+        if payment is None:
+            return 404, {"message": "Payment not found", "status": 404}
+        return 200, payment
+
+    def _mp_search(self, query, body):
+        offset = int(query.get("offset", ["0"])[0])
+        limit = int(query.get("limit", ["30"])[0])
+        payments = list(self.fakes.payments.values())
+        return 200, {
+            "paging": {"total": len(payments), "offset": offset, "limit": limit},
+            "results": payments[offset:offset + limit],
+        }
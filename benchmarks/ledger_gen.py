@@ -0,0 +1,135 @@
+"""Deterministic generator of realistic ledgers, as Google Sheets returns them.
+
+Rows are lists of strings (Sheets' formatted values) keyed by type like
+GoogleSheetsService.read_ledger returns them, with what real spreadsheets
+accumulate: dates typed as ISO, ISO with time, UTC timestamps and pt-BR
+dd/mm/yyyy; amounts with a decimal point, whole numbers, pt-BR decimal commas
+and currency prefixes; empty categories and short rows. The same rows and seed
+always give the same ledger.
+
+Usage:
+    python -m benchmarks.ledger_gen --rows 100000 --seed 1 --output ledger.json
+"""
+import argparse
+import json
+import random
+from datetime import date, timedelta
+from typing import Any, Dict, List
+
+# Categories with the relative frequency they get, per type
+CATEGORIES = {
+    "despesa": {
+        "Alimentação": 30, "Moradia": 12, "Transporte": 15, "Saúde": 8, "Educação": 5,
+        "Lazer": 10, "Assinaturas": 6, "Vestuário": 4, "Impostos": 2, "Outros": 8,
+    },
+    "ganho": {"Salário": 55, "Freelance": 20, "Investimentos": 15, "Reembolso": 5, "Outros": 5},
+}
+
+DESCRIPTIONS = {
+    "Alimentação": ["Supermercado", "Padaria", "Restaurante", "iFood", "Feira"],
+    "Moradia": ["Aluguel", "Condomínio", "Conta de luz", "Conta de água", "Internet"],
+    "Transporte": ["Uber", "Combustível", "Estacionamento", "Bilhete único", "Pedágio"],
+    "Saúde": ["Farmácia", "Plano de saúde", "Consulta", "Academia"],
+    "Educação": ["Curso online", "Livros", "Mensalidade"],
+    "Lazer": ["Cinema", "Show", "Viagem", "Bar"],
+    "Assinaturas": ["Netflix", "Spotify", "Celular", "Nuvem"],
+    "Vestuário": ["Roupas", "Calçados"],
+    "Impostos": ["IPVA", "IPTU", "Imposto de renda"],
+    "Salário": ["Salário", "Adiantamento", "13º salário", "Férias"],
+    "Freelance": ["Projeto freelance", "Consultoria", "Aulas particulares"],
+    "Investimentos": ["Dividendos", "Rendimento CDB", "Resgate Tesouro"],
+    "Reembolso": ["Reembolso empresa", "Estorno cartão"],
+    "Outros": ["Pix recebido", "Transferência", "Diversos"],
+}
+
+# Share of rows with each date and amount format; ISO and plain decimals dominate
+DATE_FORMATS = [("iso", 70), ("iso_time", 12), ("utc", 8), ("br", 8), ("empty", 2)]
+AMOUNT_FORMATS = [("decimal", 75), ("integer", 12), ("br", 8), ("currency", 4), ("empty", 1)]
+
+# Share of expenses among the rows
+EXPENSE_SHARE = 0.8
+
+
+def _weighted(rng: random.Random, choices) -> Any:
+    items, weights = zip(*(choices.items() if isinstance(choices, dict) else choices))
+    return rng.choices(items, weights)[0]
+
+
+def _format_date(rng: random.Random, day: date, style: str) -> str:
+    if style == "iso":
+        return day.isoformat()
+    if style == "iso_time":
+        return f"{day.isoformat()}T{rng.randrange(24):02d}:{rng.randrange(60):02d}:00"
+    if style == "utc":
+        return f"{day.isoformat()}T{rng.randrange(24):02d}:{rng.randrange(60):02d}:00Z"
+    if style == "br":
+        return day.strftime("%d/%m/%Y")
+    return ""
+
+
+def _format_amount(amount: float, style: str) -> str:
+    if style == "decimal":
+        return f"{amount:.2f}"
+    if style == "integer":
+        return str(round(amount))
+    if style == "br":
+        return f"{amount:,.2f}".replace(",", "_").replace(".", ",").replace("_", ".")
+    if style == "currency":
+        return "R$ " + f"{amount:.2f}".replace(".", ",")
+    return ""
+
+
+def _amount(rng: random.Random, tipo: str, category: str) -> float:
+    if tipo == "ganho":
+        return rng.uniform(2500, 12000) if category == "Salário" else rng.uniform(50, 3000)
+    if category in ("Moradia", "Impostos"):
+        return rng.uniform(150, 3500)
+    # Most expenses are small, a few are large
+    return min(rng.lognormvariate(4, 1), 20000)
+
+
+def generate_ledger(rows: int, seed: int = 0, end: date = date(2026, 1, 31),
+                    days: int = 730) -> Dict[str, List[List[str]]]:
+    """A ledger of `rows` transactions dated over the `days` up to `end`, keyed by type."""
+    rng = random.Random(seed)
+    ledger: Dict[str, List[List[str]]] = {"despesa": [], "ganho": []}
+    for _ in range(rows):
+        tipo = "despesa" if rng.random() < EXPENSE_SHARE else "ganho"
+        category = _weighted(rng, CATEGORIES[tipo])
+        day = end - timedelta(days=rng.randrange(days))
+        amount = _amount(rng, tipo, category)
+        row = [
+            _format_date(rng, day, _weighted(rng, DATE_FORMATS)),
+            rng.choice(DESCRIPTIONS[category]),
+            # Rows typed by hand sometimes miss the category
+            category if rng.random() > 0.01 else "",
+            _format_amount(amount, _weighted(rng, AMOUNT_FORMATS)),
+            "Despesa" if tipo == "despesa" else "Ganho",
+        ]
+        # Sheets drops trailing empty cells, so some rows come back short
+        roll = rng.random()
+        if roll < 0.005:
+            row = row[:3]
+        elif roll < 0.02:
+            row = row[:4]
+        ledger[tipo].append(row)
+    return ledger
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the ledger as JSON to this file (default: a summary on stdout)")
+    args = parser.parse_args()
+
+    ledger = generate_ledger(args.rows, args.seed)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(ledger, f, ensure_ascii=False)
+    else:
+        print(json.dumps({tipo: len(rows) for tipo, rows in ledger.items()}))
+
+
+if __name__ == "__main__":
+    main()
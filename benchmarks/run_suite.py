@@ -0,0 +1,378 @@
+"""Benchmark suite: every route of the real app against local stand-ins.
+
+Starts the stand-ins of benchmarks/fakes.py (Google Sheets, Supabase
+PostgREST and JWKS, Mercado Pago), points the backend at them, serves the
+real FastAPI app (lifespan, middleware, auth and rate limiting included)
+with uvicorn on a local port, and drives each scenario at --concurrency
+with tokens signed by the fake JWKS. For each scenario it records
+throughput, p50/p99 latency, status codes and the calls made to each
+stand-in per request, and writes everything to a JSON file so runs can be
+compared between commits.
+
+With --workers N the app runs as N uvicorn worker processes sharing their
+caches through SQLite (CACHE_BACKEND=sqlite), as manage.py --workers does.
+
+Stand-in behaviour is set per service (sheets, google_oauth, supabase,
+jwks, mercadopago) with name=value lists.
+
+Usage:
+    python -m benchmarks.run_suite --requests 500 --concurrency 16 --output results.json
+    python -m benchmarks.run_suite --latency sheets=80 supabase=20 --error-rate sheets=0.02
+    python -m benchmarks.run_suite --scenarios dashboard transacoes_criar --quota sheets=300
+    python -m benchmarks.run_suite --workers 4 --output workers.json
+    python -m benchmarks.run_suite --compare baseline.json results.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from collections import Counter
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.fakes import SERVICES, FakeServices, ServiceConfig
+
+
+def _pairs(values: Optional[List[str]], cast: Callable) -> Dict[str, Any]:
+    result = {}
+    for value in values or []:
+        name, _, setting = value.partition("=")
+        if name not in SERVICES:
+            raise SystemExit(f"Unknown service {name!r}; expected one of {', '.join(SERVICES)}")
+        result[name] = cast(setting)
+    return result
+
+
+def _configs(args) -> Dict[str, ServiceConfig]:
+    latency = _pairs(args.latency, float)
+    jitter = _pairs(args.jitter, float)
+    error_rate = _pairs(args.error_rate, float)
+    quota = _pairs(args.quota, int)
+    return {
+        name: ServiceConfig(
+            latency_ms=latency.get(name, 0.0), jitter_ms=jitter.get(name, 0.0),
+            error_rate=error_rate.get(name, 0.0), quota_per_minute=quota.get(name, 0),
+        )
+        for name in SERVICES
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return None
+
+
+def _serve(port: int):
+    # Imported only now: the backend reads its settings at import time
+    import uvicorn
+    from backend.main import app
+    # Request logs and monitoring events would dominate the run
+    logging.disable(logging.WARNING)
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, name="uvicorn", daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    def stop():
+        server.should_exit = True
+    return stop
+
+
+def _serve_workers(port: int, workers: int):
+    # Separate processes; the stand-ins still count their calls here
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--workers", str(workers),
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://localhost:{port}/saudez", timeout=1):
+                break
+        except OSError:
+            time.sleep(0.1)
+    return process.terminate
+
+
+class Scenario:
+    def __init__(self, name: str, request: Callable, after: Optional[Callable] = None):
+        self.name = name
+        # async (client, user, i) -> status code
+        self.request = request
+        # Waited for after the timed requests (e.g. background processing)
+        self.after = after
+
+
+def _scenarios(fakes: FakeServices) -> Dict[str, Scenario]:
+    def get(path: str):
+        async def request(client, user, i):
+            return (await client.get(path, headers=user["headers"])).status_code
+        return request
+
+    async def criar_transacao(client, user, i):
+        body = {
+            "data": date.today().isoformat(), "descricao": f"Benchmark {i}", "categoria": "Lazer",
+            "valor": 12.5, "tipo": "despesa" if i % 3 else "ganho",
+        }
+        return (await client.post("/transacoes/", json=body, headers=user["headers"])).status_code
+
+    async def eventos(client, user, i):
+        # Connect, wait for the first event and hang up
+        async with client.stream("GET", "/eventos/", headers=user["headers"]) as response:
+            if response.status_code != 200:
+                return response.status_code
+            async for line in response.aiter_lines():
+                if line.startswith("event: conectado"):
+                    break
+            return response.status_code
+
+    async def criar_pagamento(client, user, i):
+        body = {
+            "title": "Plano Premium", "unit_price": 19.9, "quantity": 1, "email": user["email"],
+            "success_url": "http://localhost:8501/?pagamento=sucesso",
+            "failure_url": "http://localhost:8501/?pagamento=falha",
+            "pending_url": "http://localhost:8501/?pagamento=pendente",
+            "external_reference": f"plano-premium-{i}",
+        }
+        return (await client.post("/pagamentos/criar", json=body, headers=user["headers"])).status_code
+
+    def status_pagamento(path: str):
+        async def request(client, user, i):
+            return (await client.get(path.format(user["payment_id"]), headers=user["headers"])).status_code
+        return request
+
+    async def webhook(client, user, i):
+        # A payment that isn't final yet, so every notification is processed
+        body = {"topic": "payment", "resource_id": user["pending_payment_id"]}
+        return (await client.post("/pagamentos/webhook", json=body)).status_code
+
+    async def webhook_drained():
+        # Calls made by the queue workers count towards the webhook requests
+        from backend.payments.webhook_queue import webhook_queue
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            counts = webhook_queue.counts()
+            if not counts.get("pending") and not counts.get("processing"):
+                return
+            await asyncio.sleep(0.05)
+
+    scenarios = [
+        Scenario("resumo", get("/resumo/")),
+        Scenario("dashboard", get("/dashboard/")),
+        Scenario("transacoes_lista", get("/transacoes/")),
+        Scenario("transacoes_pagina", get("/transacoes/?pagina=1&por_pagina=50&ordenar=data&ordem=desc")),
+        Scenario("transacoes_categoria", get("/transacoes/categoria/Lazer")),
+        Scenario("transacoes_tipo", get("/transacoes/tipo/despesa")),
+        Scenario("transacoes_criar", criar_transacao),
+        Scenario("eventos_conectar", eventos),
+        Scenario("pagamentos_criar", criar_pagamento),
+        Scenario("pagamentos_status", status_pagamento("/pagamentos/status/{}")),
+        Scenario("pagamentos_aguardar", status_pagamento("/pagamentos/status/{}/aguardar?timeout=0")),
+        Scenario("pagamentos_webhook", webhook, after=webhook_drained),
+    ]
+    return {s.name: s for s in scenarios}
+
+
+def _calls_delta(before: Dict[str, Dict[str, int]], after: Dict[str, Dict[str, int]]) -> Dict[str, Dict[str, int]]:
+    delta = {}
+    for service, operations in after.items():
+        changed = {op: n - before.get(service, {}).get(op, 0) for op, n in operations.items()}
+        changed = {op: n for op, n in changed.items() if n}
+        if changed:
+            delta[service] = changed
+    return delta
+
+
+async def _run_scenario(scenario: Scenario, client, users: List[Dict[str, Any]], fakes: FakeServices,
+                        requests: int, concurrency: int, warmup: int) -> Dict[str, Any]:
+    statuses: Counter = Counter()
+    errors: Counter = Counter()
+    latencies: List[float] = []
+    async def worker(indexes, record: bool):
+        for i in indexes:
+            user = users[i % len(users)]
+            started = time.perf_counter()
+            try:
+                status = await scenario.request(client, user, i)
+            except Exception as e:
+                status = "error"
+                errors[type(e).__name__] += 1
+            if record:
+                latencies.append(time.perf_counter() - started)
+                statuses[str(status)] += 1
+
+    # Warm-up requests fill the caches and connection pools, and aren't recorded
+    indexes = iter(range(warmup))
+    await asyncio.gather(*(worker(indexes, False) for _ in range(concurrency)))
+    if scenario.after:
+        await scenario.after()
+
+    calls_before = fakes.calls()
+    indexes = iter(range(warmup, warmup + requests))
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(indexes, True) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    if scenario.after:
+        await scenario.after()
+    calls = _calls_delta(calls_before, fakes.calls())
+
+    latencies.sort()
+    ms = lambda seconds: round(seconds * 1000, 2)
+    return {
+        "requests": requests,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 1),
+        "latency_ms": {
+            "p50": ms(statistics.median(latencies)),
+            "p99": ms(latencies[max(0, int(len(latencies) * 0.99) - 1)]),
+            "mean": ms(statistics.fmean(latencies)),
+            "max": ms(latencies[-1]),
+        },
+        "status": dict(statuses),
+        "client_errors": dict(errors),
+        "outbound_calls": calls,
+        "outbound_per_request": {
+            service: round(sum(ops.values()) / requests, 3) for service, ops in calls.items()
+        },
+    }
+
+
+async def run(args) -> Dict[str, Any]:
+    import httpx
+
+    fakes = FakeServices(users=args.users, ledger_rows=args.ledger_rows, configs=_configs(args)).start()
+    data_dir = tempfile.mkdtemp()
+    os.environ.update(fakes.environment())
+    os.environ.setdefault("WEBHOOK_QUEUE_PATH", os.path.join(data_dir, "webhook_queue.db"))
+    os.environ.setdefault("PAYMENT_STATUS_PATH", os.path.join(data_dir, "payment_status.db"))
+    os.environ.setdefault("WEBHOOK_POLL_INTERVAL", "0.05")
+    os.environ["RATE_LIMIT_ENABLED"] = "true" if args.rate_limits else "false"
+
+    if args.workers > 1:
+        # Caches, rate limit windows and metrics shared by the workers, as manage.py --workers sets up
+        os.environ.setdefault("CACHE_BACKEND", "sqlite")
+        os.environ.setdefault("SHARED_CACHE_PATH", os.path.join(data_dir, "shared_cache.db"))
+        os.environ.setdefault("RATE_LIMIT_BACKEND", "sqlite")
+        os.environ.setdefault("RATE_LIMIT_SQLITE_PATH", os.path.join(data_dir, "rate_limit.db"))
+        os.environ.setdefault("METRICS_MULTIPROC_DIR", os.path.join(data_dir, "metrics"))
+
+    port = _free_port()
+    stop_server = _serve_workers(port, args.workers) if args.workers > 1 else _serve(port)
+    scenarios = _scenarios(fakes)
+    selected = args.scenarios or list(scenarios)
+
+    users = [
+        {**user, "headers": {"Authorization": f"Bearer {fakes.token(user)}"}}
+        for user in fakes.users
+    ]
+    results: Dict[str, Any] = {
+        "commit": _git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": {
+            "requests": args.requests, "concurrency": args.concurrency, "warmup": args.warmup,
+            "users": args.users, "ledger_rows": args.ledger_rows, "rate_limits": args.rate_limits,
+            "workers": args.workers, "cache_backend": os.environ.get("CACHE_BACKEND", "memory"),
+            "services": {name: vars(config) for name, config in _configs(args).items()},
+        },
+        "scenarios": {},
+    }
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency * 2)
+    timeout = httpx.Timeout(60)
+    async with httpx.AsyncClient(base_url=f"http://localhost:{port}", limits=limits, timeout=timeout) as client:
+        for name in selected:
+            if name not in scenarios:
+                raise SystemExit(f"Unknown scenario {name!r}; expected one of {', '.join(scenarios)}")
+            result = await _run_scenario(
+                scenarios[name], client, users, fakes, args.requests, args.concurrency, args.warmup
+            )
+            results["scenarios"][name] = result
+            print(
+                f"{name:22} {result['throughput_rps']:8.1f} req/s  p50 {result['latency_ms']['p50']:7.2f} ms"
+                f"  p99 {result['latency_ms']['p99']:7.2f} ms  {result['outbound_per_request']}"
+            )
+
+    results["stand_in_errors"] = fakes.errors()
+    stop_server()
+    fakes.stop()
+    return results
+
+
+def compare(baseline_path: str, current_path: str):
+    """Print the change of each scenario's figures between two result files."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    with open(current_path) as f:
+        current = json.load(f)
+    print(f"{baseline.get('commit')} -> {current.get('commit')}")
+
+    def change(old: float, new: float) -> str:
+        if not old:
+            return f"{new}"
+        return f"{new} ({(new - old) / old * 100:+.1f}%)"
+
+    for name, result in current["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        if before is None:
+            print(f"{name}: new scenario")
+            continue
+        calls_before = sum(before["outbound_per_request"].values())
+        calls_now = sum(result["outbound_per_request"].values())
+        print(
+            f"{name:22} req/s {change(before['throughput_rps'], result['throughput_rps'])}"
+            f"  p50 {change(before['latency_ms']['p50'], result['latency_ms']['p50'])}"
+            f"  p99 {change(before['latency_ms']['p99'], result['latency_ms']['p99'])}"
+            f"  calls/req {change(round(calls_before, 3), round(calls_now, 3))}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200, help="Timed requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=20, help="Untimed requests per scenario before timing")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Serve the app with this many uvicorn worker processes")
+    parser.add_argument("--ledger-rows", type=int, default=500, help="Transactions per seeded spreadsheet")
+    parser.add_argument("--scenarios", nargs="+", help="Scenarios to run (default: all)")
+    parser.add_argument("--latency", nargs="+", metavar="SERVICE=MS", help="Added latency per call")
+    parser.add_argument("--jitter", nargs="+", metavar="SERVICE=MS", help="Random +/- latency per call")
+    parser.add_argument("--error-rate", nargs="+", metavar="SERVICE=RATE", help="Share of calls answered 503")
+    parser.add_argument("--quota", nargs="+", metavar="SERVICE=N", help="Calls per minute before answering 429")
+    parser.add_argument("--rate-limits", action="store_true", help="Keep the app's per-user rate limits on")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"),
+                        help="Compare two result files instead of running")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    results = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,13 +2,17 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import streamlit.components.v1 as components
-import requests
-import os
+import time
 
-from utils.api_client import get_resumo, post_transacao
+from utils.api_client import (
+    API_CACHE_TTL, get_dashboard, get_transacoes_pagina, post_transacao, prefetch_transacoes_pagina
+)
 
 st.set_page_config(page_title="Fynace", layout="wide")
 
+# Transactions shown per page of the table
+POR_PAGINA = 50
+
 # --- Captura token da URL ---
 query_params = st.query_params
 token = query_params.get("token", [None])[0] if "token" in query_params else None
@@ -50,6 +54,46 @@ st.title("📊 Fynace - Dashboard Financeiro")
 st.sidebar.header("Status do Usuário")
 st.sidebar.info(f"Usuário: {st.session_state.get('user_email', 'Desconhecido')}")
 
+# --- Estado do painel ---
+def carregar_painel():
+    """The dashboard as last fetched, with this session's writes applied."""
+    painel = st.session_state.get("painel")
+    if painel is None or painel["expira"] < time.time():
+        painel = {"dados": get_dashboard(st.session_state["token"]), "expira": time.time() + API_CACHE_TTL}
+        st.session_state["painel"] = painel
+    return painel["dados"]
+
+
+def aplicar_transacao(resposta: dict):
+    """Apply a write's response to the state held by this session, without reading anything back."""
+    painel = st.session_state.get("painel")
+    if painel is not None:
+        if resposta.get("resumo"):
+            painel["dados"] = {**painel["dados"], **resposta["resumo"]}
+        else:
+            # The backend couldn't compute the totals; read them on this run
+            st.session_state.pop("painel")
+
+    # The row as Sheets stored it, formatted like the rows already in the table
+    nova = resposta["transaction"]
+    linha = {campo: nova[campo] for campo in ["data", "descricao", "categoria", "valor", "tipo"]}
+    atual = st.session_state.get("transacoes_pagina")
+    if atual is not None:
+        pagina_atual, consulta_atual = atual["chave"][0], dict(atual["chave"][1])
+        busca_atual = consulta_atual["busca"].strip().lower()
+        if (consulta_atual["tipo"] in ("", linha["tipo"])) and busca_atual in linha["descricao"].lower():
+            dados = dict(atual["dados"])
+            dados["total"] += 1
+            dados["paginas"] = max(1, -(-dados["total"] // consulta_atual["por_pagina"]))
+            # Newest first, the row goes on top of page 1; in other orders it
+            # shows up the next time the table is queried
+            if pagina_atual == 1 and consulta_atual["ordenar"] == "data" and consulta_atual["ordem"] == "desc":
+                dados["transactions"] = [linha] + dados["transactions"][:consulta_atual["por_pagina"] - 1]
+                dados["count"] = len(dados["transactions"])
+            atual["dados"] = dados
+    # The prefetched page may have shifted by one row
+    st.session_state.pop("transacoes_proxima", None)
+
 # --- Adicionar Transação ---
 st.sidebar.header("Adicionar Transação")
 descricao = st.sidebar.text_input("Descrição")
@@ -64,7 +108,7 @@ categoria = st.sidebar.selectbox(
 
 if st.sidebar.button("Adicionar"):
     try:
-        post_transacao(
+        resposta = post_transacao(
             {
                 "descricao": descricao,
                 "valor": valor,
@@ -73,15 +117,22 @@ if st.sidebar.button("Adicionar"):
             },
             st.session_state["token"]
         )
+        # The rest of this run renders the updated state; no rerun, no reads
+        aplicar_transacao(resposta)
         st.success("Transação adicionada com sucesso!")
-        st.rerun()
     except Exception as e:
         st.error(f"Erro ao adicionar transação: {str(e)}")
 
 # --- Resumo ---
 st.header("Resumo do Mês")
 try:
-    resumo = get_resumo(st.session_state["token"])
+    resumo = carregar_painel()
+    mes = resumo["mes"]
+
+    col_ganhos, col_despesas, col_saldo = st.columns(3)
+    col_ganhos.metric("Ganhos no mês", f"R$ {mes['total_ganhos']:.2f}")
+    col_despesas.metric("Despesas no mês", f"R$ {mes['total_despesas']:.2f}")
+    col_saldo.metric("Saldo do mês", f"R$ {mes['saldo']:.2f}")
 
     # Create a simple card component using HTML
     card_html = f"""
@@ -128,27 +179,69 @@ except Exception as e:
     st.error(f"Erro ao carregar resumo: {str(e)}")
 
 # --- Visualização de Transações ---
-st.header("Transações Recentes")
-try:
-    api_url = os.getenv("API_URL", "http://127.0.0.1:8000")
-    response = requests.get(
-        f"{api_url}/transacoes",
-        headers={
-            "Authorization": f"Bearer {st.session_state['token']}",
-            "Content-Type": "application/json"
-        }
-    )
-    if response.status_code == 200:
-        transacoes_data = response.json()
-        transacoes = transacoes_data.get("transactions", [])
+st.header("Transações")
+col_ordenar, col_ordem, col_tipo, col_busca = st.columns(4)
+ordenar = col_ordenar.selectbox(
+    "Ordenar por", ["data", "valor", "categoria", "descricao"],
+    format_func={"data": "Data", "valor": "Valor", "categoria": "Categoria", "descricao": "Descrição"}.get
+)
+ordem = col_ordem.radio("Ordem", ["desc", "asc"], format_func={"desc": "Decrescente", "asc": "Crescente"}.get, horizontal=True)
+filtro_tipo = col_tipo.selectbox("Tipo", ["", "despesa", "ganho"], format_func=lambda t: t.capitalize() or "Todos")
+busca = col_busca.text_input("Buscar na descrição")
+
+# Sorting and filtering happen on the backend; only the visible page is kept
+consulta = {"por_pagina": POR_PAGINA, "ordenar": ordenar, "ordem": ordem, "tipo": filtro_tipo, "busca": busca}
+if st.session_state.get("transacoes_consulta") != consulta:
+    st.session_state["transacoes_consulta"] = consulta
+    st.session_state["transacoes_pagina_atual"] = 1
+pagina = st.session_state["transacoes_pagina_atual"]
+
+
+def carregar_pagina(pagina: int):
+    chave = (pagina, tuple(consulta.items()))
+    atual = st.session_state.get("transacoes_pagina")
+    if atual and atual["chave"] == chave:
+        return atual["dados"]
+
+    dados = None
+    proxima = st.session_state.pop("transacoes_proxima", None)
+    if proxima and proxima["chave"] == chave:
+        try:
+            dados = proxima["futuro"].result()
+        except Exception:
+            # The prefetch failed; fetch the page again below
+            dados = None
+    if dados is None:
+        dados = get_transacoes_pagina(st.session_state["token"], pagina, **consulta)
+    st.session_state["transacoes_pagina"] = {"chave": chave, "dados": dados}
+    return dados
+
+
+def mudar_pagina(delta: int):
+    st.session_state["transacoes_pagina_atual"] += delta
 
-        if transacoes:
-            df_transacoes = pd.DataFrame(transacoes)
-            st.dataframe(df_transacoes, use_container_width=True)
-        else:
-            st.info("Nenhuma transação registrada ainda.")
+
+try:
+    dados = carregar_pagina(pagina)
+    transacoes = dados.get("transactions", [])
+
+    if transacoes:
+        df_transacoes = pd.DataFrame(transacoes)
+        st.dataframe(df_transacoes, use_container_width=True, hide_index=True)
+
+        col_anterior, col_info, col_proxima = st.columns([1, 3, 1])
+        col_anterior.button("← Anterior", on_click=mudar_pagina, args=(-1,), disabled=pagina <= 1)
+        col_info.caption(f"Página {dados['pagina']} de {dados['paginas']} · {dados['total']} transações")
+        col_proxima.button("Próxima →", on_click=mudar_pagina, args=(1,), disabled=pagina >= dados["paginas"])
+
+        # Fetch the next page while this one is being read
+        if pagina < dados["paginas"] and "transacoes_proxima" not in st.session_state:
+            st.session_state["transacoes_proxima"] = {
+                "chave": (pagina + 1, tuple(consulta.items())),
+                "futuro": prefetch_transacoes_pagina(st.session_state["token"], pagina + 1, **consulta),
+            }
     else:
-        st.error("Erro ao carregar transações")
+        st.info("Nenhuma transação encontrada.")
 except Exception as e:
     st.error(f"Erro ao carregar transações: {str(e)}")
 
@@ -1,7 +1,25 @@
 import os
 import requests
+import streamlit as st
+from concurrent.futures import Future, ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 
 API_URL = os.getenv("API_URL", "http://127.0.0.1:8000")
+API_TIMEOUT = float(os.getenv("API_TIMEOUT", "15"))
+# How long dashboard data is reused across reruns before asking the backend again
+API_CACHE_TTL = int(os.getenv("API_CACHE_TTL", "60"))
+# Transactions listed on the dashboard
+DASHBOARD_LATEST = int(os.getenv("DASHBOARD_LATEST", "10"))
+
+
+@st.cache_resource
+def _session() -> requests.Session:
+    # One keep-alive connection pool shared by every rerun and browser session
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=int(os.getenv("API_POOL_SIZE", "10")))
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
 
 
 def _headers(token: str):
@@ -11,20 +29,94 @@ def _headers(token: str):
     }
 
 
+# Widget interactions rerun the whole script; cached per token, they don't
+# reach the backend until the TTL passes or the data is invalidated
+@st.cache_data(ttl=API_CACHE_TTL, show_spinner=False)
 def get_resumo(token: str):
-    response = requests.get(
-        f"{API_URL}/resumo",
-        headers=_headers(token)
+    response = _session().get(
+        f"{API_URL}/resumo/",
+        headers=_headers(token),
+        timeout=API_TIMEOUT
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+@st.cache_data(ttl=API_CACHE_TTL, show_spinner=False)
+def get_transacoes(token: str):
+    response = _session().get(
+        f"{API_URL}/transacoes/",
+        headers=_headers(token),
+        timeout=API_TIMEOUT
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+@st.cache_data(ttl=API_CACHE_TTL, show_spinner=False)
+def get_dashboard(token: str):
+    """Summary, breakdown, month figures and latest transactions in one call."""
+    response = _session().get(
+        f"{API_URL}/dashboard/",
+        params={"limite": DASHBOARD_LATEST},
+        headers=_headers(token),
+        timeout=API_TIMEOUT
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+def _fetch_transacoes_pagina(session: requests.Session, token: str, pagina: int, por_pagina: int,
+                             ordenar: str, ordem: str, tipo: str, busca: str):
+    params = {"pagina": pagina, "por_pagina": por_pagina, "ordenar": ordenar, "ordem": ordem}
+    if tipo:
+        params["tipo"] = tipo
+    if busca:
+        params["busca"] = busca
+    response = session.get(
+        f"{API_URL}/transacoes/",
+        params=params,
+        headers=_headers(token),
+        timeout=API_TIMEOUT
     )
     response.raise_for_status()
     return response.json()
 
 
+def get_transacoes_pagina(token: str, pagina: int, por_pagina: int = 50, ordenar: str = "data",
+                          ordem: str = "desc", tipo: str = None, busca: str = None):
+    """One page of transactions, filtered and sorted by the backend."""
+    return _fetch_transacoes_pagina(_session(), token, pagina, por_pagina, ordenar, ordem, tipo, busca)
+
+
+@st.cache_resource
+def _prefetch_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=int(os.getenv("API_PREFETCH_WORKERS", "4")), thread_name_prefix="prefetch")
+
+
+def prefetch_transacoes_pagina(token: str, pagina: int, por_pagina: int = 50, ordenar: str = "data",
+                               ordem: str = "desc", tipo: str = None, busca: str = None) -> Future:
+    """Start fetching a page in the background, so it's ready when the user gets there."""
+    # Streamlit caches are only touched here, on the script thread
+    return _prefetch_executor().submit(
+        _fetch_transacoes_pagina, _session(), token, pagina, por_pagina, ordenar, ordem, tipo, busca
+    )
+
+
+def invalidate(token: str):
+    """Drop the cached data of this token so the next run fetches it again."""
+    get_dashboard.clear(token)
+    get_resumo.clear(token)
+    get_transacoes.clear(token)
+
+
 def post_transacao(data: dict, token: str):
-    response = requests.post(
-        f"{API_URL}/transacoes",
+    response = _session().post(
+        f"{API_URL}/transacoes/",
         json=data,
-        headers=_headers(token)
+        headers=_headers(token),
+        timeout=API_TIMEOUT
     )
     response.raise_for_status()
+    invalidate(token)
     return response.json()
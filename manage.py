@@ -1,3 +1,4 @@
+import argparse
 import subprocess
 import time
 import os
@@ -8,10 +9,31 @@ load_dotenv()
 FASTAPI_HOST = "127.0.0.1"
 FASTAPI_PORT = "8000"
 
-print("🚀 Iniciando backend (FastAPI)...")
-backend = subprocess.Popen(
-    ["uvicorn", "backend.main:app", "--reload", "--host", FASTAPI_HOST, "--port", FASTAPI_PORT]
+parser = argparse.ArgumentParser(description="Inicia o backend (FastAPI) e o frontend (Streamlit)")
+parser.add_argument(
+    "--workers", type=int, default=1,
+    help="Processos do backend; com mais de um, caches, limites de uso e métricas são compartilhados entre eles",
 )
+args = parser.parse_args()
+
+backend_env = dict(os.environ)
+if args.workers > 1:
+    # Workers of one host share caches and rate limit windows through SQLite
+    # files, and /metrics merges the snapshots every worker writes to a
+    # directory; --reload can't be combined with --workers
+    backend_env.setdefault("CACHE_BACKEND", "sqlite")
+    backend_env.setdefault("RATE_LIMIT_BACKEND", "sqlite")
+    backend_env.setdefault("RATE_LIMIT_SQLITE_PATH", "data/rate_limit.db")
+    backend_env.setdefault("METRICS_MULTIPROC_DIR", "data/metrics")
+    backend_command = [
+        "uvicorn", "backend.main:app", "--workers", str(args.workers),
+        "--host", FASTAPI_HOST, "--port", FASTAPI_PORT,
+    ]
+else:
+    backend_command = ["uvicorn", "backend.main:app", "--reload", "--host", FASTAPI_HOST, "--port", FASTAPI_PORT]
+
+print(f"🚀 Iniciando backend (FastAPI) com {args.workers} worker(s)...")
+backend = subprocess.Popen(backend_command, env=backend_env)
 
 time.sleep(3)
 